@@ -0,0 +1,138 @@
+"""Per-message Mongo writes vs the write-behind `MessageWriter`.
+
+Needs a local mongod. Writes `BENCH_TURNS` chat turns (user message + reply) across `BENCH_SESSIONS`
+sessions into `BENCH_DB` (dropped afterwards), `BENCH_CONCURRENCY` turns in flight:
+
+- per-message: `insert_one` plus a `sessions` `update_one` (`$inc`, `$max`) per message, awaited
+  on the request path (what a naive implementation would do);
+- write-behind: `MessageWriter.submit` per turn, timed until `stop()` has drained the queue, so the
+  figure includes the time for every message to reach Mongo.
+
+Reports turns/s, mean request-path latency per turn and Mongo write round trips. The recent-messages
+cache is replaced with a no-op so only Mongo is measured.
+
+Usage (from repo root):
+
+    docker compose up -d mongo
+    python -m scripts.bench_message_writer
+    BENCH_TURNS=50000 BENCH_CONCURRENCY=200 python -m scripts.bench_message_writer
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+from typing import Any
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+
+from services.common.message_writer import MessageWriter, message_doc
+
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+BENCH_DB = os.getenv("BENCH_DB", "ira_bench_message_writer")
+N_TURNS = int(os.getenv("BENCH_TURNS", "20000"))
+N_SESSIONS = int(os.getenv("BENCH_SESSIONS", "2000"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "100"))
+
+
+class _Writes(monitoring.CommandListener):
+    def __init__(self) -> None:
+        self.count = 0
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name in {"insert", "update"}:
+            self.count += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
+
+
+class _NoCache:
+    async def append(self, session_id: str, messages: list[dict[str, Any]]) -> None:
+        return None
+
+
+def _turn(session_id: str) -> list[dict[str, Any]]:
+    common = {"session_id": session_id, "user_id": f"u-{session_id}", "tier": "free"}
+    return [
+        message_doc(**common, role="user", content="hey ira, quick question about my plan"),
+        message_doc(**common, role="assistant", content="Sure, tell me more."),
+    ]
+
+
+async def _reset(db: AsyncIOMotorDatabase) -> None:
+    await db.messages.drop()
+    await db.sessions.drop()
+    await db.sessions.insert_many([{"_id": f"s{i}", "message_count": 0} for i in range(N_SESSIONS)])
+    await db.messages.create_index([("session_id", 1), ("created_at", -1)])
+
+
+async def _per_message(db: AsyncIOMotorDatabase, turns: list[list[dict[str, Any]]]) -> list[float]:
+    sem = asyncio.Semaphore(CONCURRENCY)
+    latencies: list[float] = []
+
+    async def one(docs: list[dict[str, Any]]) -> None:
+        async with sem:
+            start = time.perf_counter()
+            for doc in docs:
+                await db.messages.insert_one(doc)
+                await db.sessions.update_one(
+                    {"_id": doc["session_id"]},
+                    {"$inc": {"message_count": 1}, "$max": {"last_activity_at": doc["created_at"]}},
+                )
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(t) for t in turns))
+    return latencies
+
+
+async def _write_behind(db: AsyncIOMotorDatabase, turns: list[list[dict[str, Any]]]) -> list[float]:
+    writer = MessageWriter(db, cache=_NoCache())  # type: ignore[arg-type]
+    await writer.start()
+    sem = asyncio.Semaphore(CONCURRENCY)
+    latencies: list[float] = []
+
+    async def one(docs: list[dict[str, Any]]) -> None:
+        async with sem:
+            start = time.perf_counter()
+            await writer.submit(docs)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(t) for t in turns))
+    await writer.stop()
+    assert writer.dropped == 0, "queue overflowed; raise max_queue for the benchmark"
+    return latencies
+
+
+async def main() -> None:
+    listener = _Writes()
+    client = AsyncIOMotorClient(MONGO_URI, event_listeners=[listener])
+    db = client[BENCH_DB]
+    rng = random.Random(7)
+    try:
+        print(f"turns={N_TURNS} sessions={N_SESSIONS} concurrency={CONCURRENCY}")
+        print(f"{'variant':<14}{'turns/s':>10}{'mean ms/turn':>15}{'write cmds':>12}{'messages':>10}")
+        for name, fn in (("per-message", _per_message), ("write-behind", _write_behind)):
+            await _reset(db)
+            turns = [_turn(f"s{rng.randrange(N_SESSIONS)}") for _ in range(N_TURNS)]
+            before = listener.count
+            start = time.perf_counter()
+            latencies = await fn(db, turns)
+            elapsed = time.perf_counter() - start
+            written = await db.messages.estimated_document_count()
+            mean_ms = sum(latencies) / len(latencies) * 1000.0
+            print(f"{name:<14}{N_TURNS / elapsed:>10.0f}{mean_ms:>15.2f}{listener.count - before:>12}{written:>10}")
+    finally:
+        await client.drop_database(BENCH_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""Before/after microbenchmark for the request-context middleware.
+
+Runs `GET /healthz` in-process (httpx.ASGITransport, no sockets, no lifespan) against the real
+router and worker apps, once with the pure-ASGI `RequestContextMiddleware` and once with the
+previous `@app.middleware("http")` (BaseHTTPMiddleware) implementation swapped in.
+
+Usage (from repo root):
+
+    python -m scripts.bench_middleware
+    BENCH_REQUESTS=5000 BENCH_CONCURRENCY=20 python -m scripts.bench_middleware
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import os
+import statistics
+import time
+import uuid
+from typing import Callable, Optional
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from services.common.http import CORRELATION_ID_HEADER, RequestContextMiddleware
+from services.common.logging import get_logger
+from services.common.request_context import RequestContext, ServiceName, set_request_context
+
+
+N_REQUESTS = int(os.getenv("BENCH_REQUESTS", "3000"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "1"))
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "5"))
+
+APPS: list[tuple[ServiceName, str]] = [
+    ("router", "services.router.app.main"),
+    ("worker-priority", "services.worker_priority.app.main"),
+    ("worker-standard", "services.worker_standard.app.main"),
+    ("worker-overflow", "services.worker_overflow.app.main"),
+]
+
+
+def _legacy_middleware(service: ServiceName, slow_ms_threshold: float = 250.0) -> Middleware:
+    """The BaseHTTPMiddleware version this repo used before the pure-ASGI rewrite."""
+    log = get_logger(f"{service}.http")
+
+    async def dispatch(request: Request, call_next: Callable) -> Response:
+        incoming = request.headers.get(CORRELATION_ID_HEADER)
+        correlation_id = incoming if incoming and len(incoming) <= 128 else str(uuid.uuid4())
+        set_request_context(RequestContext(correlation_id=correlation_id, service=service))
+
+        start = time.perf_counter()
+        response: Optional[Response] = None
+        try:
+            response = await call_next(request)
+            return response
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            if response is not None:
+                response.headers[CORRELATION_ID_HEADER] = correlation_id
+            if elapsed_ms >= slow_ms_threshold:
+                log.warning("slow_request", extra={"extra": {"elapsed_ms": round(elapsed_ms, 2)}})
+
+    return Middleware(BaseHTTPMiddleware, dispatch=dispatch)
+
+
+def _use_middleware(app: FastAPI, service: ServiceName, variant: str) -> None:
+    others = [m for m in app.user_middleware if m.cls is not RequestContextMiddleware and m.cls is not BaseHTTPMiddleware]
+    mw = (
+        _legacy_middleware(service)
+        if variant == "before"
+        else Middleware(RequestContextMiddleware, service=service)
+    )
+    app.user_middleware = [mw, *others]
+    app.middleware_stack = None  # rebuilt lazily on next call
+
+
+async def _round(app: FastAPI) -> float:
+    """Return mean microseconds per request for one round."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        sem = asyncio.Semaphore(CONCURRENCY)
+
+        async def one() -> None:
+            async with sem:
+                r = await client.get("/healthz")
+                assert r.status_code == 200 and CORRELATION_ID_HEADER in r.headers
+
+        start = time.perf_counter()
+        if CONCURRENCY <= 1:
+            for _ in range(N_REQUESTS):
+                await one()
+        else:
+            await asyncio.gather(*(one() for _ in range(N_REQUESTS)))
+        return (time.perf_counter() - start) / N_REQUESTS * 1e6
+
+
+async def main() -> None:
+    print(f"requests={N_REQUESTS} concurrency={CONCURRENCY} rounds={ROUNDS} (median us/request, GET /healthz)")
+    print(f"{'service':<18}{'before':>10}{'after':>10}{'delta':>9}")
+    for service, module in APPS:
+        app: FastAPI = importlib.import_module(module).app
+        results: dict[str, float] = {}
+        for variant in ("before", "after"):
+            _use_middleware(app, service, variant)
+            await _round(app)  # warm-up
+            results[variant] = statistics.median([await _round(app) for _ in range(ROUNDS)])
+        delta = (results["after"] - results["before"]) / results["before"] * 100.0
+        print(f"{service:<18}{results['before']:>10.1f}{results['after']:>10.1f}{delta:>8.1f}%")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
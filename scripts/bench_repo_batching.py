@@ -0,0 +1,107 @@
+"""Round trips and throughput of repo point lookups, unbatched vs batched (`BatchLoader`).
+
+Needs a local mongod. Seeds `BENCH_USERS` users and one personality each into `BENCH_DB` (dropped
+afterwards), then issues `BENCH_LOOKUPS` random lookups with `BENCH_CONCURRENCY` in flight. Round
+trips are counted with a pymongo command listener, so they are what the server actually saw.
+"Unbatched" uses `max_batch=1`: every key is its own query, single-flight still applies.
+
+Usage (from repo root):
+
+    docker compose up -d mongo
+    python -m scripts.bench_repo_batching
+    BENCH_CONCURRENCY=500 MONGO_BATCH_WINDOW_MS=1 python -m scripts.bench_repo_batching
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timezone
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+
+from services.common.repos import BatchLoader, PersonalitiesRepo, UsersRepo
+
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+BENCH_DB = os.getenv("BENCH_DB", "ira_bench_batching")
+N_USERS = int(os.getenv("BENCH_USERS", "20000"))
+N_LOOKUPS = int(os.getenv("BENCH_LOOKUPS", "20000"))
+CONCURRENCIES = [int(c) for c in os.getenv("BENCH_CONCURRENCY", "10,100,1000").split(",")]
+WINDOW_S = float(os.getenv("MONGO_BATCH_WINDOW_MS", "0")) / 1000.0
+MAX_BATCH = int(os.getenv("MONGO_BATCH_MAX_KEYS", "100"))
+
+
+class _RoundTrips(monitoring.CommandListener):
+    def __init__(self) -> None:
+        self.count = 0
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name in {"find", "aggregate", "getMore"}:
+            self.count += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
+
+
+async def _seed(db: AsyncIOMotorDatabase) -> None:
+    await db.client.drop_database(BENCH_DB)
+    now = datetime.now(timezone.utc)
+    await db.users.insert_many([{"_id": f"u{i}", "tier": "free", "created_at": now} for i in range(N_USERS)])
+    await db.personalities.insert_many(
+        [{"user_id": f"u{i}", "tone": "warm", "updated_at": now} for i in range(N_USERS)]
+    )
+    await db.personalities.create_index([("user_id", 1), ("updated_at", -1)])
+
+
+async def _run(db: AsyncIOMotorDatabase, listener: _RoundTrips, *, batched: bool, concurrency: int) -> tuple[float, int]:
+    users, personalities = UsersRepo(db), PersonalitiesRepo(db)
+    max_batch = MAX_BATCH if batched else 1
+    # Install loaders for this variant (normally built from env in the repo constructor).
+    users._loader = BatchLoader("users", users._find_many, window_s=WINDOW_S, max_batch=max_batch)
+    personalities._loader = BatchLoader(
+        "personalities", personalities._find_latest_many, window_s=WINDOW_S, max_batch=max_batch
+    )
+    rng = random.Random(7)
+    keys = [f"u{rng.randrange(N_USERS)}" for _ in range(N_LOOKUPS)]
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(uid: str) -> None:
+        async with sem:
+            await users.get_by_id(uid)
+            await personalities.get_latest_for_user(uid)
+
+    before = listener.count
+    start = time.perf_counter()
+    await asyncio.gather(*(one(k) for k in keys))
+    elapsed = time.perf_counter() - start
+    return N_LOOKUPS / elapsed, listener.count - before
+
+
+async def main() -> None:
+    listener = _RoundTrips()
+    client = AsyncIOMotorClient(MONGO_URI, event_listeners=[listener])
+    db = client[BENCH_DB]
+    try:
+        await _seed(db)
+        print(f"users={N_USERS} lookups={N_LOOKUPS} (user + personality each) window_ms={WINDOW_S * 1000:g} max_batch={MAX_BATCH}")
+        print(f"{'concurrency':>12}{'variant':>11}{'lookups/s':>12}{'round trips':>13}")
+        for concurrency in CONCURRENCIES:
+            for batched in (False, True):
+                await _run(db, listener, batched=batched, concurrency=concurrency)  # warm-up
+                rate, trips = await _run(db, listener, batched=batched, concurrency=concurrency)
+                variant = "batched" if batched else "unbatched"
+                print(f"{concurrency:>12}{variant:>11}{rate:>12.0f}{trips:>13}")
+    finally:
+        await client.drop_database(BENCH_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
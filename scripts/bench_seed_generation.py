@@ -0,0 +1,46 @@
+"""Seeder document generation: default dict path vs the columnar/raw BSON path, per collection.
+
+No Mongo needed: measures one process generating `BENCH_DOCS` documents per collection and encoding
+them to BSON (what pymongo would do on insert for the dict path; the raw path is pre-encoded).
+Multiply by `SEED_PROCESSES` for the seeder's generation ceiling.
+
+Usage (from repo root):
+
+    python -m scripts.bench_seed_generation
+    BENCH_DOCS=500000 python -m scripts.bench_seed_generation
+"""
+
+from __future__ import annotations
+
+import os
+import time
+
+import bson
+
+from services.seeder.app.engine import COLLECTIONS, SeedPlan, shard_batches
+from services.seeder.app.raw import numpy_available, raw_batches
+
+
+N_DOCS = int(os.getenv("BENCH_DOCS", "100000"))
+
+
+def main() -> None:
+    plan = SeedPlan(users=N_DOCS, personalities=N_DOCS, sessions=N_DOCS, messages=N_DOCS, shard_size=N_DOCS)
+    print(f"docs={N_DOCS} numpy={'yes' if numpy_available() else 'no'}")
+    print(f"{'collection':<14}{'dict docs/s':>14}{'raw docs/s':>14}{'speedup':>10}")
+    for collection in COLLECTIONS:
+        shard = plan.shards(collection)[0]
+        start = time.perf_counter()
+        for batch in shard_batches(plan, shard):
+            for doc in batch:
+                bson.encode(doc)
+        dict_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in raw_batches(plan, shard):
+            pass
+        raw_s = time.perf_counter() - start
+        print(f"{collection:<14}{N_DOCS / dict_s:>14,.0f}{N_DOCS / raw_s:>14,.0f}{dict_s / raw_s:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+"""In-process end-to-end benchmark harness: router + the three workers, fake Redis and Mongo, no network.
+
+The router and the priority/standard/overflow worker apps run in this process with their real
+lifespans, middleware, pool admission, rate limiting, session index and write-behind persistence.
+The router reaches the workers through `httpx.ASGITransport` (dispatched by host), Redis and Mongo
+are the in-memory stand-ins in `tests/unit/fake_redis.py` / `tests/unit/fake_mongo.py`, and the
+workers get the stub LLM client with its latency scaled by `--llm-scale` (0 in most scenarios, so
+nothing sleeps). What is left is the per-request cost of our own code, which is what this catches
+regressions in:
+
+    python -m scripts.harness run --out bench/harness.json
+    python -m scripts.harness compare bench/harness-baseline.json bench/harness.json   # exit 1 on regression
+
+Each scenario sends a fixed, seeded request list through a closed loop of `--concurrency` clients and
+reports µs/request, requests/s, latency percentiles, outcomes, and Redis commands / Mongo round trips
+per request. Inputs are deterministic; timings are not, so compare runs made on the same machine.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import functools
+import importlib
+import json
+import os
+import random
+import sys
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+import httpx
+
+from scripts.loadgen import Histogram, Request, TierStats, classify, synthetic_requests
+from scripts.traces import synth_records, to_requests
+from services.common import mongo, redis_client
+from services.common.llm import POOL_DEFAULTS, LLMClient, StubLLM, create_llm_client
+from services.mock_llm.app import main as mock_llm
+from services.mock_llm.app.main import MockConfig
+from services.router.app import main as router_main
+from services.router.app.pools import PoolManager
+from services.seeder.app.engine import SeedPlan, shard_batches
+from tests.unit.fake_mongo import FakeMongoClient
+from tests.unit.fake_redis import FakeRedis
+
+
+HARNESS_DB = "ira_harness"
+WORKERS = {
+    "priority": "services.worker_priority.app.main",
+    "standard": "services.worker_standard.app.main",
+    "overflow": "services.worker_overflow.app.main",
+}
+
+# Process-wide: repo batch loaders, the personality cache and the message writer keep references to
+# the database they first saw, so the fakes are reset between runs rather than replaced.
+_redis = FakeRedis()
+_mongo = FakeMongoClient()
+_DEVNULL = open(os.devnull, "w")
+
+
+def _scaled_llm(pool: str, cfg: "StackConfig") -> StubLLM:
+    # The worker's own LLM_* env is ignored here: always the stub, seeded, with its latency scaled.
+    config = POOL_DEFAULTS[pool]
+    lo, hi = config.stub_latency_s
+    scaled = dataclasses.replace(config, stub_latency_s=(lo * cfg.llm_scale, hi * cfg.llm_scale))
+    return StubLLM(scaled, rng=random.Random(f"{cfg.seed}:{pool}"))
+
+
+def _mock_backed_llm(pool: str) -> LLMClient:
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=mock_llm.app), base_url="http://mock-llm")
+    return create_llm_client(pool, client=client)
+
+
+def _install_fakes() -> None:
+    # Worker lifespans call close_mongo() on exit; reinstall so the next lifespan sees the fakes again.
+    redis_client._client = _redis  # type: ignore[assignment]
+    mongo._client = _mongo  # type: ignore[assignment]
+
+
+class HostTransport(httpx.AsyncBaseTransport):
+    """Dispatches each request to the transport registered for its host (one ASGI app per worker URL)."""
+
+    def __init__(self, transports: dict[str, httpx.AsyncBaseTransport]) -> None:
+        self.transports = transports
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        transport = self.transports.get(request.url.host)
+        if transport is None:
+            raise httpx.ConnectError(f"no app mounted for {request.url.host}", request=request)
+        return await transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        for transport in self.transports.values():
+            await transport.aclose()
+
+
+@dataclass(frozen=True)
+class StackConfig:
+    llm_scale: float = 0.0
+    redis_latency_s: float = 0.0
+    mongo_latency_s: float = 0.0
+    seed: int = 1
+    # Env overrides for this stack only (e.g. PRIORITY_MAX_CONCURRENCY).
+    env: dict[str, str] = field(default_factory=dict)
+    # If set: the workers' LLM client comes from `LLM_*` env (`env`) and calls the mock LLM server
+    # in-process, configured with these `MockConfig` fields. `llm_scale` does not apply.
+    mock_llm: Optional[dict[str, Any]] = None
+
+
+class Stack:
+    """`async with Stack(config) as client:` — a client for the router with the whole stack running."""
+
+    def __init__(self, config: StackConfig = StackConfig()) -> None:
+        self.config = config
+        self.redis = _redis
+        self.mongo = _mongo
+        self._exit = AsyncExitStack()
+
+    async def __aenter__(self) -> httpx.AsyncClient:
+        cfg = self.config
+        self.redis.reset()
+        self.mongo.reset()
+        self.redis.latency_s = cfg.redis_latency_s
+        self.mongo.latency_s = cfg.mongo_latency_s
+        self.mongo.round_trips = 0
+
+        env = {
+            "MONGO_DB": HARNESS_DB,
+            "POOL_HEALTH_INTERVAL_S": "0.5",
+            **{f"{name.upper()}_WORKER_URL": f"http://worker-{name}" for name in WORKERS},
+            **cfg.env,
+        }
+        self._exit.callback(_restore_env, {k: os.environ.get(k) for k in env})
+        os.environ.update(env)
+
+        try:
+            if cfg.mock_llm is not None:
+                self._exit.callback(mock_llm.state.configure, mock_llm.state.config)
+                mock_llm.state.configure(MockConfig(**cfg.mock_llm))
+            transports: dict[str, httpx.AsyncBaseTransport] = {}
+            for name, module_name in WORKERS.items():
+                module = importlib.import_module(module_name)
+                self._exit.callback(setattr, module, "llm", module.llm)
+                module.llm = _scaled_llm(name, cfg) if cfg.mock_llm is None else _mock_backed_llm(name)
+                await self._enter_lifespan(module.app)
+                transports[f"worker-{name}"] = httpx.ASGITransport(app=module.app)
+
+            routing = httpx.AsyncClient(transport=HostTransport(transports))
+            self._exit.callback(setattr, router_main, "PoolManager", router_main.PoolManager)
+            router_main.PoolManager = functools.partial(PoolManager, client=routing)  # type: ignore[misc]
+            await self._enter_lifespan(router_main.app)
+            router_main.PoolManager = PoolManager  # only the lifespan constructs one
+            await _wait_healthy(router_main.pool_manager)
+            return await self._exit.enter_async_context(
+                httpx.AsyncClient(transport=httpx.ASGITransport(app=router_main.app), base_url="http://router")
+            )
+        except BaseException:
+            await self._exit.aclose()
+            raise
+
+    async def _enter_lifespan(self, app: Any) -> None:
+        _install_fakes()
+        self._exit.callback(_install_fakes)
+        # The lifespan points logging at sys.stdout; records are still formatted (that cost is part of
+        # the request path), just not printed.
+        with contextlib.redirect_stdout(_DEVNULL):
+            await self._exit.enter_async_context(app.router.lifespan_context(app))
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self._exit.aclose()
+
+
+def _restore_env(saved: dict[str, Optional[str]]) -> None:
+    for key, value in saved.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+
+
+async def _wait_healthy(pools: Optional[PoolManager], timeout_s: float = 5.0) -> None:
+    assert pools is not None
+    deadline = time.perf_counter() + timeout_s
+    while not all(st.healthy for st in pools.state.values()):
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"pools not healthy: {pools.snapshot()}")
+        await asyncio.sleep(0.01)
+
+
+# --- scenarios ---------------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    description: str
+    requests: Callable[[int, int], list[Request]]  # (n, seed) -> requests
+    config: StackConfig = StackConfig()
+    path: str = "/chat"
+    seed_db: Optional[Callable[[FakeMongoClient], None]] = None
+
+
+_MIX_PLAN = SeedPlan(users=2_000, personalities=2_000, sessions=0, messages=0, batch_size=500, now=datetime(2099, 1, 1, tzinfo=timezone.utc))
+
+
+def _seed_mix(client: FakeMongoClient) -> None:
+    db = client[HARNESS_DB]
+    for collection in ("users", "personalities"):
+        for shard in _MIX_PLAN.shards(collection):
+            for batch in shard_batches(_MIX_PLAN, shard):
+                db[collection].load(batch)
+
+
+def _enterprise(n: int, seed: int) -> list[Request]:
+    return [Request(0.0, "enterprise", f"harness_ent_{i % 50}", f"hello {i}") for i in range(n)]
+
+
+def _mix(n: int, seed: int) -> list[Request]:
+    # Pareto-weighted senders from the seeded users, messages sized like real traffic (scripts/traces.py).
+    records = synth_records(users=_MIX_PLAN.users, rate_rps=1_000, duration_s=1e9, plan=_MIX_PLAN, seed=seed)
+    return [req for req, _ in zip(to_requests(records, seed=seed), range(n))]
+
+
+def _free_flood(n: int, seed: int) -> list[Request]:
+    return list(synthetic_requests(1_000, n / 1_000, {"free": 1.0}, kind="constant", users=n, rng=random.Random(seed)))
+
+
+# A model server where each call costs a fixed 20ms plus 10ms to first token, 4 calls at a time.
+_MOCK_BACKEND = {"latency": "fixed:10", "overhead_ms": 20.0, "token_ms": 0.0, "max_concurrency": 4}
+
+SCENARIOS = [
+    Scenario("healthz", "GET /healthz on the router: app + middleware floor", _enterprise, path="/healthz"),
+    Scenario("chat_enterprise", "enterprise /chat -> priority worker, 50 users", _enterprise),
+    Scenario("chat_mix", "seeded users/personalities, default tier mix, trace-shaped messages", _mix, seed_db=_seed_mix),
+    Scenario(
+        "overload_shed",
+        "free-tier flood into a 4-slot overflow pool with 1/10 stub LLM latency",
+        _free_flood,
+        config=StackConfig(llm_scale=0.1, env={"OVERFLOW_MAX_CONCURRENCY": "4"}),
+    ),
+    Scenario(
+        "overflow_llm",
+        "free tier -> overflow -> mock LLM backend (20ms per call, 4 slots), one call per request",
+        _free_flood,
+        config=StackConfig(mock_llm=_MOCK_BACKEND, env={"LLM_BACKEND": "http"}),
+    ),
+    Scenario(
+        "overflow_llm_batched",
+        "as overflow_llm, with overflow micro-batching (16 calls / 10ms)",
+        _free_flood,
+        config=StackConfig(
+            mock_llm=_MOCK_BACKEND, env={"LLM_BACKEND": "http", "LLM_OVERFLOW_BATCH_MAX_ITEMS": "16"}
+        ),
+    ),
+]
+
+
+async def _drive(client: httpx.AsyncClient, requests: list[Request], *, path: str, concurrency: int) -> dict[str, TierStats]:
+    tiers: dict[str, TierStats] = {}
+    queue = iter(requests)
+
+    async def one(req: Request) -> None:
+        stats = tiers.get(req.tier)
+        if stats is None:
+            stats = tiers[req.tier] = TierStats()
+        started = time.perf_counter()
+        try:
+            if path == "/chat":
+                r = await client.post(path, json={"user_id": req.user_id, "message": req.message, "tier": req.tier})
+            else:
+                r = await client.get(path)
+            outcome = classify(r.status_code, r.json())
+        except httpx.HTTPError:
+            outcome = "error"
+        elapsed = time.perf_counter() - started
+        stats.outcomes[outcome] += 1
+        stats.latency.record(elapsed)
+        stats.service.record(elapsed)
+
+    async def client_loop() -> None:
+        for req in queue:
+            await one(req)
+
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return tiers
+
+
+async def run_scenario(
+    scenario: Scenario, *, requests: int, concurrency: int, warmup: int, seed: int, llm_scale: Optional[float] = None
+) -> dict[str, Any]:
+    reqs = scenario.requests(warmup + requests, seed)
+    config = scenario.config if llm_scale is None else dataclasses.replace(scenario.config, llm_scale=llm_scale)
+    stack = Stack(dataclasses.replace(config, seed=seed))
+    async with stack as client:
+        if scenario.seed_db is not None:
+            scenario.seed_db(stack.mongo)
+        await _drive(client, reqs[:warmup], path=scenario.path, concurrency=concurrency)
+        redis_before, mongo_before = stack.redis.commands, stack.mongo.round_trips
+        started = time.perf_counter()
+        tiers = await _drive(client, reqs[warmup:], path=scenario.path, concurrency=concurrency)
+        wall_s = time.perf_counter() - started
+        redis_commands = stack.redis.commands - redis_before
+    # Counted after shutdown so write-behind flushes (message writer, analytics) are included.
+    mongo_round_trips = stack.mongo.round_trips - mongo_before
+
+    total = TierStats()
+    for stats in tiers.values():
+        total.merge(stats)
+    n = total.sent
+    latency: Histogram = total.latency
+    return {
+        "description": scenario.description,
+        "requests": n,
+        "concurrency": concurrency,
+        "wall_s": round(wall_s, 4),
+        "throughput_rps": round(n / wall_s, 1) if wall_s > 0 else 0.0,
+        "us_per_request": round(wall_s / n * 1e6, 1) if n else 0.0,
+        "latency_ms": latency.summary(),
+        "outcomes": {k: v for k, v in total.outcomes.items() if v},
+        "redis_commands_per_request": round(redis_commands / n, 3) if n else 0.0,
+        "mongo_round_trips_per_request": round(mongo_round_trips / n, 3) if n else 0.0,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    selected = [s for s in SCENARIOS if not args.scenario or any(f in s.name for f in args.scenario)]
+    scenarios: dict[str, Any] = {}
+    for scenario in selected:
+        result = await run_scenario(
+            scenario,
+            requests=args.requests,
+            concurrency=args.concurrency,
+            warmup=args.warmup,
+            seed=args.seed,
+            llm_scale=args.llm_scale,
+        )
+        scenarios[scenario.name] = result
+        print(
+            f"{scenario.name:<16} {result['requests']:>6} req  {result['throughput_rps']:>9.1f} req/s"
+            f"  {result['us_per_request']:>8.1f} µs/req  p99 {result['latency_ms']['p99']:>7.2f} ms"
+            f"  redis {result['redis_commands_per_request']:>5.2f}/req  mongo {result['mongo_round_trips_per_request']:>5.2f}/req",
+            file=sys.stderr,
+        )
+    return {
+        "meta": {
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "llm_scale": args.llm_scale,
+        },
+        "scenarios": scenarios,
+    }
+
+
+# --- compare -----------------------------------------------------------------------------------
+
+
+def compare(
+    baseline: dict[str, Any], current: dict[str, Any], *, time_tolerance: float = 0.25, io_tolerance: float = 0.25
+) -> list[str]:
+    """Regressions of `current` against `baseline` (empty list = pass)."""
+    problems: list[str] = []
+    for name, base in baseline.get("scenarios", {}).items():
+        cur = current.get("scenarios", {}).get(name)
+        if cur is None:
+            problems.append(f"{name}: missing from current run")
+            continue
+        b, c = base["us_per_request"], cur["us_per_request"]
+        if c > b * (1.0 + time_tolerance):
+            problems.append(f"{name}: us_per_request {b:.1f} -> {c:.1f}")
+        b, c = base["latency_ms"]["p99"], cur["latency_ms"]["p99"]
+        if c > b * (1.0 + time_tolerance):
+            problems.append(f"{name}: p99 {b:.3f}ms -> {c:.3f}ms")
+        for field_name in ("redis_commands_per_request", "mongo_round_trips_per_request"):
+            b, c = base[field_name], cur[field_name]
+            if c > b * (1.0 + io_tolerance) and c - b > 0.01:
+                problems.append(f"{name}: {field_name} {b} -> {c}")
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m scripts.harness", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_run = sub.add_parser("run", help="run the scenarios in-process, write JSON")
+    p_run.add_argument("--requests", type=int, default=2000, help="measured requests per scenario")
+    p_run.add_argument("--warmup", type=int, default=200, help="unmeasured requests sent first")
+    p_run.add_argument("--concurrency", type=int, default=16)
+    p_run.add_argument("--seed", type=int, default=1)
+    p_run.add_argument(
+        "--llm-scale", type=float, help="multiply the workers' stub LLM latency (default: per scenario, mostly 0)"
+    )
+    p_run.add_argument("--scenario", action="append", help="only scenarios whose name contains this (repeatable)")
+    p_run.add_argument("--out", help="write results JSON here (default: stdout)")
+
+    p_cmp = sub.add_parser("compare", help="fail (exit 1) if CURRENT regresses against BASELINE")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current")
+    p_cmp.add_argument("--time-tolerance", type=float, default=0.25, help="relative growth allowed in µs/req and p99")
+    p_cmp.add_argument("--io-tolerance", type=float, default=0.25, help="relative growth allowed in Redis commands / Mongo round trips per request")
+
+    args = parser.parse_args(argv)
+    if args.cmd == "run":
+        results = asyncio.run(run(args))
+        text = json.dumps(results, indent=2, sort_keys=True)
+        if args.out:
+            os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+            with open(args.out, "w") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+    elif args.cmd == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        problems = compare(baseline, current, time_tolerance=args.time_tolerance, io_tolerance=args.io_tolerance)
+        for p in problems:
+            print(f"REGRESSION {p}")
+        if problems:
+            raise SystemExit(1)
+        print(f"OK: {len(baseline.get('scenarios', {}))} scenarios within tolerance")
+
+
+if __name__ == "__main__":
+    main()
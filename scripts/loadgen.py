@@ -0,0 +1,436 @@
+"""Open-loop load generator for `POST /chat`.
+
+Requests are sent on a schedule (Poisson or constant arrivals per tier) whether or not earlier ones have
+completed, so a slow server faces the offered load instead of throttling the client the way a fixed pool
+of workers does (`tests/test_load.py`). Latency is measured from each request's *intended* send time,
+which corrects for coordinated omission: time a request spent waiting on a late scheduler or a saturated
+connection pool counts. Service time (from the actual send) is recorded alongside.
+
+The load ramps through `--rates` (total requests/s, split by `--mix`), `--step-s` seconds each:
+
+    docker compose up -d
+    python -m scripts.loadgen --rates 20,50,100,200 --step-s 30 --out bench/load.json
+    python -m scripts.loadgen --in-process --rates 50 --step-s 10   # router app in this process
+
+`--in-process` mounts `services.router.app.main:app` (or another `module:attr`) with `httpx.ASGITransport`
+and runs its lifespan, so it still needs the workers, Mongo and Redis the app is configured for.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import heapq
+import importlib
+import json
+import math
+import os
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Iterable, Iterator, Optional
+
+import httpx
+
+
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
+TIERS = ("free", "premium", "enterprise")
+# Seed distribution (docs/seed_distribution.md).
+DEFAULT_MIX = {"free": 0.90, "premium": 0.09, "enterprise": 0.01}
+# Mutually exclusive; `rate_limited` includes silent drops. `dropped`: not sent, `--max-inflight` reached.
+OUTCOMES = ("ok", "shed", "rate_limited", "blocked", "error", "timeout", "dropped")
+PERCENTILES = (0.50, 0.90, 0.99, 0.999)
+
+
+# --- histogram ---------------------------------------------------------------------------------
+
+
+class Histogram:
+    """HDR-style log-linear histogram of microsecond values.
+
+    Values below 2^SUB_BITS are exact; above, each power of two is split into 2^(SUB_BITS-1) buckets, so
+    a recorded value is off by at most 1/128 (0.8%). Buckets are a sparse dict: recording is O(1),
+    a percentile sorts the occupied buckets (under 2,000 for 1µs–1s) rather than the samples, and
+    histograms merge by adding counts.
+    """
+
+    SUB_BITS = 8
+    _HALF = 1 << (SUB_BITS - 1)
+
+    __slots__ = ("counts", "count", "total_us", "min_us", "max_us")
+
+    def __init__(self) -> None:
+        self.counts: dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us = 0
+        self.max_us = 0
+
+    @classmethod
+    def index(cls, value_us: int) -> int:
+        shift = value_us.bit_length() - cls.SUB_BITS
+        if shift <= 0:
+            return value_us
+        return (shift + 1) * cls._HALF + (value_us >> shift) - cls._HALF
+
+    @classmethod
+    def highest_equivalent(cls, index: int) -> int:
+        """Largest value that lands in bucket `index`."""
+        if index < 2 * cls._HALF:
+            return index
+        shift = index // cls._HALF - 1
+        low = (index % cls._HALF + cls._HALF) << shift
+        return low + (1 << shift) - 1
+
+    def record(self, seconds: float) -> None:
+        value = max(0, int(seconds * 1_000_000))
+        idx = self.index(value)
+        self.counts[idx] = self.counts.get(idx, 0) + 1
+        if self.count == 0 or value < self.min_us:
+            self.min_us = value
+        if value > self.max_us:
+            self.max_us = value
+        self.count += 1
+        self.total_us += value
+
+    def merge(self, other: "Histogram") -> None:
+        for idx, n in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + n
+        if other.count and (self.count == 0 or other.min_us < self.min_us):
+            self.min_us = other.min_us
+        self.max_us = max(self.max_us, other.max_us)
+        self.count += other.count
+        self.total_us += other.total_us
+
+    def percentile_ms(self, p: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(p * self.count))
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                return min(self.highest_equivalent(idx), self.max_us) / 1000.0
+        return self.max_us / 1000.0
+
+    def summary(self) -> dict[str, float]:
+        out = {f"p{p * 100:g}": round(self.percentile_ms(p), 3) for p in PERCENTILES}
+        out["max"] = round(self.max_us / 1000.0, 3)
+        out["mean"] = round(self.total_us / self.count / 1000.0, 3) if self.count else 0.0
+        return out
+
+    def to_dict(self) -> dict[str, Any]:
+        """Summary (ms) plus raw buckets, so saved runs can be merged or re-summarized."""
+        return {
+            "count": self.count,
+            "ms": self.summary(),
+            "min_us": self.min_us,
+            "max_us": self.max_us,
+            "total_us": self.total_us,
+            "buckets": sorted(self.counts.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Histogram":
+        h = cls()
+        h.counts = {int(i): int(n) for i, n in data["buckets"]}
+        h.count, h.total_us = data["count"], data["total_us"]
+        h.min_us, h.max_us = data["min_us"], data["max_us"]
+        return h
+
+
+# --- outcomes ----------------------------------------------------------------------------------
+
+
+def classify(status_code: int, body: dict[str, Any]) -> str:
+    if status_code != 200:
+        return "error"
+    if body.get("degraded"):
+        return "shed"
+    if body.get("blocked"):
+        return "blocked"
+    if body.get("rate_limited"):
+        return "rate_limited"
+    return "ok"
+
+
+@dataclass
+class TierStats:
+    outcomes: dict[str, int] = field(default_factory=lambda: dict.fromkeys(OUTCOMES, 0))
+    # Intended send → response (coordinated-omission corrected), and actual send → response.
+    latency: Histogram = field(default_factory=Histogram)
+    service: Histogram = field(default_factory=Histogram)
+
+    @property
+    def sent(self) -> int:
+        return sum(self.outcomes.values()) - self.outcomes["dropped"]
+
+    def merge(self, other: "TierStats") -> None:
+        for k, n in other.outcomes.items():
+            self.outcomes[k] += n
+        self.latency.merge(other.latency)
+        self.service.merge(other.service)
+
+    def to_dict(self, duration_s: float) -> dict[str, Any]:
+        total = sum(self.outcomes.values())
+        return {
+            "requests": total,
+            "throughput_rps": round(self.sent / duration_s, 2) if duration_s > 0 else 0.0,
+            "outcomes": dict(self.outcomes),
+            "rates": {k: round(n / total, 4) if total else 0.0 for k, n in self.outcomes.items()},
+            "latency": self.latency.to_dict(),
+            "service_time": self.service.to_dict(),
+        }
+
+
+@dataclass
+class StepReport:
+    rate_rps: float
+    duration_s: float
+    tiers: dict[str, TierStats] = field(default_factory=dict)
+    # Worst delay between a request's intended and actual send (client-side saturation).
+    max_send_lag_ms: float = 0.0
+
+    def total(self) -> TierStats:
+        out = TierStats()
+        for stats in self.tiers.values():
+            out.merge(stats)
+        return out
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "rate_rps": self.rate_rps,
+            "duration_s": round(self.duration_s, 3),
+            "max_send_lag_ms": round(self.max_send_lag_ms, 3),
+            "all": self.total().to_dict(self.duration_s),
+            "tiers": {t: s.to_dict(self.duration_s) for t, s in self.tiers.items()},
+        }
+
+
+# --- schedule ----------------------------------------------------------------------------------
+
+
+def arrivals(rate_rps: float, duration_s: float, *, kind: str, rng: random.Random) -> Iterator[float]:
+    """Send offsets (s) in [0, duration_s): exponential gaps (`poisson`) or evenly spaced (`constant`)."""
+    if rate_rps <= 0:
+        return
+    if kind == "constant":
+        gap = 1.0 / rate_rps
+        t = rng.random() * gap  # tiers at the same rate don't fire in lockstep
+        while t < duration_s:
+            yield t
+            t += gap
+        return
+    t = rng.expovariate(rate_rps)
+    while t < duration_s:
+        yield t
+        t += rng.expovariate(rate_rps)
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        tier, _, share = part.partition("=")
+        if tier.strip() not in TIERS:
+            raise ValueError(f"unknown tier {tier!r}")
+        mix[tier.strip()] = float(share)
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("mix shares must sum to more than 0")
+    return {t: s / total for t, s in mix.items()}
+
+
+# --- driver ------------------------------------------------------------------------------------
+
+
+@dataclass
+class Request:
+    offset_s: float
+    tier: str
+    user_id: str
+    message: str
+
+
+async def send(
+    client: httpx.AsyncClient, req: Request, intended: float, stats: TierStats, *, timeout_s: float
+) -> None:
+    sent = time.perf_counter()
+    try:
+        r = await client.post(
+            "/chat", json={"user_id": req.user_id, "message": req.message, "tier": req.tier}, timeout=timeout_s
+        )
+        body = r.json() if r.headers.get("content-type", "").startswith("application/json") else {}
+        outcome = classify(r.status_code, body)
+    except httpx.TimeoutException:
+        outcome = "timeout"
+    except (httpx.HTTPError, ValueError):
+        # ValueError: a JSON content type with a malformed body.
+        outcome = "error"
+    done = time.perf_counter()
+    stats.outcomes[outcome] += 1
+    stats.latency.record(done - intended)
+    stats.service.record(done - sent)
+
+
+async def run_schedule(
+    client: httpx.AsyncClient,
+    requests: Iterable[Request],
+    *,
+    rate_rps: float,
+    duration_s: float,
+    timeout_s: float = 10.0,
+    max_inflight: int = 10_000,
+) -> StepReport:
+    """Send `requests` (sorted by `offset_s`) at their offsets, regardless of responses."""
+    report = StepReport(rate_rps=rate_rps, duration_s=duration_s)
+    tasks: set[asyncio.Task] = set()
+    start = time.perf_counter()
+    for req in requests:
+        stats = report.tiers.get(req.tier)
+        if stats is None:
+            stats = report.tiers[req.tier] = TierStats()
+        intended = start + req.offset_s
+        delay = intended - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            report.max_send_lag_ms = max(report.max_send_lag_ms, -delay * 1000.0)
+        if len(tasks) >= max_inflight:
+            stats.outcomes["dropped"] += 1
+            continue
+        task = asyncio.create_task(send(client, req, intended, stats, timeout_s=timeout_s))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    # Throughput over the scheduled window, or longer if the tail ran past it.
+    report.duration_s = max(duration_s, time.perf_counter() - start)
+    return report
+
+
+def synthetic_requests(
+    rate_rps: float, duration_s: float, mix: dict[str, float], *, kind: str, users: int, rng: random.Random
+) -> Iterator[Request]:
+    """One arrival process per tier at `rate_rps * share`, merged by send time; uniform users per tier."""
+
+    def stream(tier: str, share: float) -> Iterator[Request]:
+        for i, t in enumerate(arrivals(rate_rps * share, duration_s, kind=kind, rng=rng)):
+            yield Request(t, tier, f"load_{tier}_{rng.randrange(users)}", f"hello {i}")
+
+    yield from heapq.merge(*(stream(t, s) for t, s in mix.items()), key=lambda r: r.offset_s)
+
+
+@asynccontextmanager
+async def open_client(
+    *, base_url: str = BASE_URL, app: Optional[str] = None, max_connections: int = 1000
+) -> AsyncIterator[httpx.AsyncClient]:
+    """HTTP client for `base_url`, or an in-process client for `app` ("module:attr") with its lifespan running."""
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    if app is None:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+            yield client
+        return
+    module, _, attr = app.partition(":")
+    asgi = getattr(importlib.import_module(module), attr or "app")
+    async with asgi.router.lifespan_context(asgi):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi), base_url="http://app", limits=limits) as client:
+            yield client
+
+
+# --- report ------------------------------------------------------------------------------------
+
+
+HEADER = (
+    f"{'rate':>7} {'tier':<10} {'sent':>7} {'rps':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'p99.9':>8} {'max':>8}"
+    f" {'svc p99':>8} {'shed':>6} {'ratelim':>7} {'blocked':>7} {'err':>6}"
+)
+
+
+def render_row(step: StepReport, tier: str, stats: TierStats) -> str:
+    d = stats.to_dict(step.duration_s)
+    lat, rates = d["latency"]["ms"], d["rates"]
+    errors = rates["error"] + rates["timeout"] + rates["dropped"]
+    return (
+        f"{step.rate_rps:>7g} {tier:<10} {stats.sent:>7} {d['throughput_rps']:>8.1f}"
+        f" {lat['p50']:>8.1f} {lat['p90']:>8.1f} {lat['p99']:>8.1f} {lat['p99.9']:>8.1f} {lat['max']:>8.1f}"
+        f" {d['service_time']['ms']['p99']:>8.1f} {rates['shed']:>6.1%} {rates['rate_limited']:>7.1%}"
+        f" {rates['blocked']:>7.1%} {errors:>6.1%}"
+    )
+
+
+def render(steps: list[StepReport]) -> str:
+    lines = [HEADER]
+    for step in steps:
+        rows = [(t, step.tiers[t]) for t in TIERS if t in step.tiers] + [("all", step.total())]
+        lines.extend(render_row(step, tier, stats) for tier, stats in rows)
+        if step.max_send_lag_ms > 10:
+            lines.append(f"{'':>7} client fell behind schedule by up to {step.max_send_lag_ms:.0f}ms")
+    lines.append("latency in ms from the intended send time; svc = from the actual send")
+    return "\n".join(lines)
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    rates = [float(r) for r in args.rates.split(",")]
+    steps: list[StepReport] = []
+    app = args.in_process or None
+    print(HEADER, file=sys.stderr)
+    async with open_client(base_url=args.base_url, app=app, max_connections=args.max_connections) as client:
+        if args.warmup_s > 0:
+            warmup = synthetic_requests(rates[0], args.warmup_s, mix, kind=args.arrival, users=args.users, rng=rng)
+            await run_schedule(client, warmup, rate_rps=rates[0], duration_s=args.warmup_s, timeout_s=args.timeout_s)
+        for rate in rates:
+            requests = synthetic_requests(rate, args.step_s, mix, kind=args.arrival, users=args.users, rng=rng)
+            step = await run_schedule(
+                client, requests, rate_rps=rate, duration_s=args.step_s, timeout_s=args.timeout_s, max_inflight=args.max_inflight
+            )
+            steps.append(step)
+            print(render_row(step, "all", step.total()), file=sys.stderr)
+    print(render(steps))
+    return {
+        "meta": {
+            "target": app or args.base_url,
+            "arrival": args.arrival,
+            "mix": mix,
+            "step_s": args.step_s,
+            "users_per_tier": args.users,
+            "seed": args.seed,
+            "ts": time.time(),
+        },
+        "steps": [s.to_dict() for s in steps],
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m scripts.loadgen", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument(
+        "--in-process", nargs="?", const="services.router.app.main:app", metavar="MODULE:APP",
+        help="drive an ASGI app in this process instead of --base-url",
+    )
+    parser.add_argument("--rates", default="20,50,100", help="total requests/s per step, comma-separated")
+    parser.add_argument("--step-s", type=float, default=30.0)
+    parser.add_argument("--warmup-s", type=float, default=0.0, help="unreported warm-up at the first rate")
+    parser.add_argument("--mix", default=",".join(f"{t}={s}" for t, s in DEFAULT_MIX.items()))
+    parser.add_argument("--arrival", choices=("poisson", "constant"), default="poisson")
+    parser.add_argument("--users", type=int, default=10_000, help="distinct user ids per tier")
+    parser.add_argument("--timeout-s", type=float, default=10.0)
+    parser.add_argument("--max-inflight", type=int, default=10_000, help="beyond this, arrivals are counted as dropped")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,8 @@
+"""Create the secondary indexes from services/common/indexes.py.
+
+    python -m scripts.mongo_indexes
+"""
+
 from __future__ import annotations
 
 import asyncio
@@ -5,6 +10,8 @@ import os
 
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from services.common.indexes import create_indexes
+
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 MONGO_DB = os.getenv("MONGO_DB", "ira")
@@ -12,38 +19,12 @@ MONGO_DB = os.getenv("MONGO_DB", "ira")
 
 async def main() -> None:
     client = AsyncIOMotorClient(MONGO_URI)
-    db = client[MONGO_DB]
-
-    # users
-    await db.users.create_index([("tier", 1), ("last_seen_at", -1)], name="tier_lastSeen")
-
-    # personalities
-    await db.personalities.create_index(
-        [("user_id", 1), ("updated_at", -1)],
-        name="user_updatedAt",
-    )
-
-    # sessions
-    await db.sessions.create_index(
-        [("user_id", 1), ("day", 1), ("status", 1)],
-        name="user_day_status",
-    )
-    await db.sessions.create_index([("tier", 1), ("day", 1)], name="tier_day")
-
-    # messages
-    await db.messages.create_index(
-        [("session_id", 1), ("created_at", -1)],
-        name="session_createdAt_desc",
-    )
-    await db.messages.create_index([("tier", 1), ("created_at", -1)], name="tier_createdAt_desc")
-
-    # analytics_events
-    await db.analytics_events.create_index([("ts", -1)], name="ts_desc")
-    await db.analytics_events.create_index([("tier", 1), ("ts", -1)], name="tier_ts_desc")
-
-    client.close()
+    try:
+        for collection, seconds in (await create_indexes(client[MONGO_DB])).items():
+            print(f"{collection:<18}{seconds:>8.1f}s")
+    finally:
+        client.close()
 
 
 if __name__ == "__main__":
     asyncio.run(main())
-
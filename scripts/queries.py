@@ -1,14 +1,56 @@
+"""Query-regression benchmark for the hot-path repo methods.
+
+Seeds (or reuses) a dataset at a given scale, calls each hot-path repo method `--requests` times with
+`--concurrency` in flight, and records latency percentiles plus the explain of the same query shape
+(winning-plan stages, index, `totalKeysExamined`, `totalDocsExamined`). Explains are built from the
+repo's own query builders (`services/common/repos.py`), batched lookups as the `$in` find or aggregation
+their `BatchLoader` sends. Results are JSON, so a run can be compared against a committed baseline:
+
+    docker compose up -d mongo
+    python -m scripts.queries run --scale 100000 --out bench/queries.json
+    python -m scripts.queries compare bench/baseline.json bench/queries.json   # exit 1 on regression
+    EXPLAIN_USER_ID=<id> python -m scripts.queries covered                    # covered-plan check only
+
+A comparison fails when a case's plan stages or index change, keys/docs examined grow, or p95/p99
+latency grows by more than `--latency-tolerance` (relative) and `--latency-floor-ms` (absolute).
+"""
+
 from __future__ import annotations
 
+import argparse
 import asyncio
+import json
 import os
+import random
+import sys
+import time
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Iterator, Optional
 
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
+from services.common.mongo import PROFILES, client_options
+from services.common.repos import (
+    ACTIVE_SESSION_PROJECTION,
+    ACTIVE_SESSION_SORT,
+    RECENT_MESSAGES_PROJECTION,
+    RECENT_MESSAGES_SORT,
+    MessagesRepo,
+    PersonalitiesRepo,
+    SessionsRepo,
+    UsersRepo,
+    active_session_filter,
+    latest_personality_pipeline,
+    latest_tone_pipeline,
+    session_messages_filter,
+    users_by_id_filter,
+)
+
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 MONGO_DB = os.getenv("MONGO_DB", "ira")
+BENCH_DB = os.getenv("QUERY_BENCH_DB", "ira_querybench")
 
 
 def utc_day_key(now: datetime | None = None) -> str:
@@ -16,115 +58,368 @@ def utc_day_key(now: datetime | None = None) -> str:
     return now.strftime("%Y-%m-%d")
 
 
-async def _explain_aggregate(
+# --- explain helpers ---------------------------------------------------------------------------
+
+
+def _walk(node: Any) -> Iterator[dict]:
+    if isinstance(node, dict):
+        yield node
+        for v in node.values():
+            yield from _walk(v)
+    elif isinstance(node, list):
+        for v in node:
+            yield from _walk(v)
+
+
+def plan_stages(explain: dict) -> list[str]:
+    """Stage names of every winning plan in an explain (find, or each `$cursor` of an aggregate)."""
+    return [n["stage"] for d in _walk(explain) if "winningPlan" in d for n in _walk(d["winningPlan"]) if "stage" in n]
+
+
+def plan_indexes(explain: dict) -> list[str]:
+    return sorted({n["indexName"] for d in _walk(explain) if "winningPlan" in d for n in _walk(d["winningPlan"]) if "indexName" in n})
+
+
+def docs_examined(explain: dict) -> int:
+    return sum(d["executionStats"].get("totalDocsExamined", 0) for d in _walk(explain) if "executionStats" in d)
+
+
+def keys_examined(explain: dict) -> int:
+    return sum(d["executionStats"].get("totalKeysExamined", 0) for d in _walk(explain) if "executionStats" in d)
+
+
+async def _explain_aggregate(db: AsyncIOMotorDatabase, *, collection: str, pipeline: list[dict]) -> dict:
+    cmd = {"explain": {"aggregate": collection, "pipeline": pipeline, "cursor": {}}, "verbosity": "executionStats"}
+    return await db.command(cmd)
+
+
+async def _explain_find(
     db: AsyncIOMotorDatabase,
     *,
     collection: str,
-    pipeline: list[dict],
+    filter: dict,
+    projection: Optional[dict] = None,
+    sort: Optional[list[tuple[str, int]]] = None,
+    limit: Optional[int] = None,
 ) -> dict:
-    """Use MongoDB's explain command with executionStats verbosity."""
-    cmd = {
-        "explain": {
-            "aggregate": collection,
-            "pipeline": pipeline,
-            "cursor": {},
-        },
-        "verbosity": "executionStats",
+    """Explain a `find` given the way the repo passes it to Motor (`sort` as (field, direction) pairs)."""
+    find: dict[str, Any] = {"find": collection, "filter": filter}
+    if limit:
+        find["limit"] = limit
+    if projection:
+        find["projection"] = projection
+    if sort:
+        find["sort"] = dict(sort)
+    return await db.command({"explain": find, "verbosity": "executionStats"})
+
+
+# A covered plan reads keys only: one of these stages, and no FETCH/COLLSCAN. DISTINCT_SCAN is what a
+# `$sort` + `$group`/`$first` pipeline becomes when the index answers it.
+COVERED_STAGES = ("PROJECTION_COVERED", "DISTINCT_SCAN")
+
+
+def is_covered(stages: list[str], docs: int) -> bool:
+    return any(s in stages for s in COVERED_STAGES) and not {"FETCH", "COLLSCAN"} & set(stages) and docs == 0
+
+
+# --- cases -------------------------------------------------------------------------------------
+
+
+@dataclass
+class Repos:
+    users: UsersRepo
+    personalities: PersonalitiesRepo
+    sessions: SessionsRepo
+    messages: MessagesRepo
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    key_kind: str  # "user" | "active_user" | "session"
+    call: Callable[[Repos, str], Awaitable[Any]]
+    explain: Callable[[AsyncIOMotorDatabase, str], Awaitable[dict]]
+    covered: bool = False
+
+
+CASES: list[Case] = [
+    Case(
+        "users.get_by_id",
+        "user",
+        lambda r, k: r.users.get_by_id(k),
+        lambda db, k: _explain_find(db, collection="users", filter=users_by_id_filter([k])),
+    ),
+    Case(
+        "personalities.get_latest_for_user",
+        "user",
+        lambda r, k: r.personalities.get_latest_for_user(k),
+        lambda db, k: _explain_aggregate(db, collection="personalities", pipeline=latest_personality_pipeline([k])),
+    ),
+    Case(
+        "personalities.get_latest_tone_for_user",
+        "user",
+        lambda r, k: r.personalities.get_latest_tone_for_user(k),
+        lambda db, k: _explain_aggregate(db, collection="personalities", pipeline=latest_tone_pipeline([k])),
+        covered=True,
+    ),
+    Case(
+        "sessions.get_active_for_user_today",
+        "active_user",
+        lambda r, k: r.sessions.get_active_for_user_today(k),
+        lambda db, k: _explain_find(
+            db,
+            collection="sessions",
+            filter=active_session_filter(k, utc_day_key()),
+            projection=ACTIVE_SESSION_PROJECTION,
+            sort=ACTIVE_SESSION_SORT,
+            limit=1,
+        ),
+        covered=True,
+    ),
+    Case(
+        "messages.get_recent_for_session",
+        "session",
+        lambda r, k: r.messages.get_recent_for_session(k, 20),
+        lambda db, k: _explain_find(
+            db,
+            collection="messages",
+            filter=session_messages_filter(k),
+            projection=RECENT_MESSAGES_PROJECTION,
+            sort=RECENT_MESSAGES_SORT,
+            limit=20,
+        ),
+    ),
+]
+
+
+# --- dataset -----------------------------------------------------------------------------------
+
+
+async def ensure_dataset(db: AsyncIOMotorDatabase, scale: int, *, reuse: bool) -> dict[str, Any]:
+    """Seed `scale` users/personalities/sessions/messages unless a dataset of that scale is there."""
+    meta = await db.bench_meta.find_one({"_id": "dataset"})
+    if reuse and meta is not None and meta.get("scale") == scale and meta.get("day") == utc_day_key():
+        return meta
+
+    from services.common.indexes import create_indexes
+    from services.seeder.app.engine import SeedPlan, seed
+
+    plan = SeedPlan(users=scale, personalities=scale, sessions=scale, messages=scale, seed=1337)
+    started = time.perf_counter()
+    await seed(plan, uri=MONGO_URI, db_name=db.name, processes=os.cpu_count() or 4, drop=True, defer_indexes=True)
+    # The seeder builds the seeded collections' indexes; this adds the rest (analytics_events).
+    await create_indexes(db)
+    meta = {"_id": "dataset", "scale": scale, "day": utc_day_key(), "seed_s": round(time.perf_counter() - started, 1)}
+    await db.bench_meta.replace_one({"_id": "dataset"}, meta, upsert=True)
+    return meta
+
+
+async def sample_keys(db: AsyncIOMotorDatabase, n: int) -> dict[str, list[str]]:
+    async def sample(col: str, match: dict, field: str) -> list[str]:
+        pipeline = [{"$match": match}, {"$sample": {"size": n}}, {"$project": {"_id": 0, "k": f"${field}"}}]
+        return [d["k"] async for d in db[col].aggregate(pipeline)]
+
+    return {
+        "user": await sample("users", {}, "_id"),
+        "active_user": await sample("sessions", {"day": utc_day_key(), "status": "active"}, "user_id"),
+        "session": await sample("messages", {}, "session_id"),
     }
-    return await db.command(cmd)
 
 
-async def explain_active_session_for_user(db: AsyncIOMotorDatabase, user_id: str) -> dict:
-    day = utc_day_key()
-    pipeline = [
-        {"$match": {"_id": user_id}},
-        {
-            "$lookup": {
-                "from": "sessions",
-                "let": {"uid": "$_id"},
-                "pipeline": [
-                    {
-                        "$match": {
-                            "$expr": {
-                                "$and": [
-                                    {"$eq": ["$user_id", "$$uid"]},
-                                    {"$eq": ["$day", day]},
-                                    {"$eq": ["$status", "active"]},
-                                ]
-                            }
-                        }
-                    },
-                    {"$sort": {"started_at": -1}},
-                    {"$limit": 1},
-                    {"$project": {"_id": 1, "day": 1, "status": 1, "last_activity_at": 1}},
-                ],
-                "as": "active_session",
-            }
+# --- run ---------------------------------------------------------------------------------------
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+async def run_case(case: Case, repos: Repos, keys: list[str], *, requests: int, concurrency: int) -> dict[str, Any]:
+    rng = random.Random(case.name)
+    picks = [rng.choice(keys) for _ in range(requests)]
+    latencies: list[float] = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(key: str) -> None:
+        async with sem:
+            start = time.perf_counter()
+            await case.call(repos, key)
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(k) for k in picks))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    ms = [v * 1000.0 for v in latencies]
+    return {
+        "requests": requests,
+        "qps": round(requests / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(ms, 0.50), 3),
+            "p95": round(percentile(ms, 0.95), 3),
+            "p99": round(percentile(ms, 0.99), 3),
+            "max": round(ms[-1], 3),
         },
-        {"$project": {"_id": 1, "tier": 1, "active_session": 1}},
-    ]
-    return await _explain_aggregate(db, collection="users", pipeline=pipeline)
+    }
 
 
-async def explain_recent_messages_for_session(
-    db: AsyncIOMotorDatabase, session_id: str, limit_n: int = 20
-) -> dict:
-    # Use sessions as the anchor to demonstrate $lookup for "context fetch".
-    pipeline = [
-        {"$match": {"_id": session_id}},
-        {
-            "$lookup": {
-                "from": "messages",
-                "let": {"sid": "$_id"},
-                "pipeline": [
-                    {"$match": {"$expr": {"$eq": ["$session_id", "$$sid"]}}},
-                    {"$sort": {"created_at": -1}},
-                    {"$limit": int(limit_n)},
-                    {"$project": {"_id": 1, "role": 1, "content": 1, "created_at": 1}},
-                ],
-                "as": "recent_messages",
-            }
+async def explain_case(case: Case, db: AsyncIOMotorDatabase, key: str) -> dict[str, Any]:
+    explain = await case.explain(db, key)
+    stages = plan_stages(explain)
+    result = {
+        "stages": stages,
+        "indexes": plan_indexes(explain),
+        "keys_examined": keys_examined(explain),
+        "docs_examined": docs_examined(explain),
+    }
+    if case.covered:
+        result["covered"] = is_covered(stages, result["docs_examined"])
+    return result
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    client = AsyncIOMotorClient(MONGO_URI, **client_options(PROFILES["hot"]))
+    db = client[args.db]
+    try:
+        dataset = await ensure_dataset(db, args.scale, reuse=not args.reseed)
+        keys = await sample_keys(db, max(1, min(args.scale, 10_000)))
+        repos = Repos(UsersRepo(db), PersonalitiesRepo(db), SessionsRepo(db), MessagesRepo(db))
+        server = await db.command("buildInfo")
+        cases: dict[str, Any] = {}
+        for case in CASES:
+            if args.case and not any(sel in case.name for sel in args.case):
+                continue
+            pool = keys[case.key_kind]
+            if not pool:
+                print(f"skip {case.name}: no keys", file=sys.stderr)
+                continue
+            await run_case(case, repos, pool, requests=min(200, args.requests), concurrency=args.concurrency)  # warm-up
+            result = await run_case(case, repos, pool, requests=args.requests, concurrency=args.concurrency)
+            result["explain"] = await explain_case(case, db, pool[0])
+            cases[case.name] = result
+            lat = result["latency_ms"]
+            print(
+                f"{case.name:<52} p50={lat['p50']:>7.2f} p95={lat['p95']:>7.2f} p99={lat['p99']:>7.2f} ms "
+                f"qps={result['qps']:>8.0f} keys={result['explain']['keys_examined']} docs={result['explain']['docs_examined']}",
+                file=sys.stderr,
+            )
+    finally:
+        client.close()
+    return {
+        "meta": {
+            "scale": args.scale,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "mongo_version": server.get("version"),
+            "batch_max_keys": int(os.getenv("MONGO_BATCH_MAX_KEYS", "100")),
+            "dataset": {k: v for k, v in dataset.items() if k != "_id"},
+            "ts": datetime.now(timezone.utc).isoformat(),
         },
-        {"$project": {"_id": 1, "user_id": 1, "day": 1, "recent_messages": 1}},
-    ]
-    return await _explain_aggregate(db, collection="sessions", pipeline=pipeline)
+        "cases": cases,
+    }
 
 
-async def explain_agg_by_tier_activity(db: AsyncIOMotorDatabase) -> dict:
-    # Example aggregation: sessions per tier for today.
-    day = utc_day_key()
-    pipeline = [
-        {"$match": {"day": day}},
-        {"$group": {"_id": "$tier", "sessions": {"$sum": 1}, "msgs": {"$sum": "$message_count"}}},
-        {"$sort": {"sessions": -1}},
-    ]
-    return await _explain_aggregate(db, collection="sessions", pipeline=pipeline)
+# --- compare -----------------------------------------------------------------------------------
 
 
-async def main() -> None:
-    user_id = os.getenv("EXPLAIN_USER_ID", "")
-    session_id = os.getenv("EXPLAIN_SESSION_ID", "")
+def compare(
+    baseline: dict[str, Any], current: dict[str, Any], *, latency_tolerance: float = 0.25, latency_floor_ms: float = 1.0
+) -> list[str]:
+    """Regressions of `current` against `baseline` (empty list = pass)."""
+    problems: list[str] = []
+    for name, base in baseline.get("cases", {}).items():
+        cur = current.get("cases", {}).get(name)
+        if cur is None:
+            problems.append(f"{name}: missing from current run")
+            continue
+        b_ex, c_ex = base["explain"], cur["explain"]
+        if c_ex["stages"] != b_ex["stages"] or c_ex["indexes"] != b_ex["indexes"]:
+            problems.append(
+                f"{name}: plan changed {'>'.join(b_ex['stages'])} {b_ex['indexes']} -> {'>'.join(c_ex['stages'])} {c_ex['indexes']}"
+            )
+        for field in ("keys_examined", "docs_examined"):
+            if c_ex[field] > b_ex[field]:
+                problems.append(f"{name}: {field} {b_ex[field]} -> {c_ex[field]}")
+        if b_ex.get("covered") and not c_ex.get("covered"):
+            problems.append(f"{name}: no longer covered")
+        for q in ("p95", "p99"):
+            b, c = base["latency_ms"][q], cur["latency_ms"][q]
+            if c > b * (1.0 + latency_tolerance) and c - b > latency_floor_ms:
+                problems.append(f"{name}: {q} {b:.2f}ms -> {c:.2f}ms")
+    return problems
 
-    if not user_id or not session_id:
-        raise SystemExit(
-            "Set EXPLAIN_USER_ID and EXPLAIN_SESSION_ID env vars to run explains."
-        )
 
+async def check_covered() -> None:
+    user_id = os.getenv("EXPLAIN_USER_ID", "")
+    if not user_id:
+        raise SystemExit("Set EXPLAIN_USER_ID to check covered plans.")
     client = AsyncIOMotorClient(MONGO_URI)
-    db = client[MONGO_DB]
+    failed = False
+    try:
+        for case in CASES:
+            if not case.covered:
+                continue
+            result = await explain_case(case, client[MONGO_DB], user_id)
+            failed |= not result["covered"]
+            print(
+                f"{'OK  ' if result['covered'] else 'FAIL'} {case.name}: "
+                f"stages={'>'.join(result['stages'])} docsExamined={result['docs_examined']}"
+            )
+    finally:
+        client.close()
+    if failed:
+        raise SystemExit(1)
 
-    print("\n=== explain: active session for user ($lookup) ===")
-    print(await explain_active_session_for_user(db, user_id))
 
-    print("\n=== explain: recent messages for session ($lookup) ===")
-    print(await explain_recent_messages_for_session(db, session_id, limit_n=20))
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m scripts.queries", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="cmd", required=True)
 
-    print("\n=== explain: aggregation by tier/activity ===")
-    print(await explain_agg_by_tier_activity(db))
+    p_run = sub.add_parser("run", help="seed/reuse a dataset, benchmark hot-path queries, write JSON")
+    p_run.add_argument("--scale", type=int, default=int(os.getenv("QUERY_BENCH_SCALE", "10000")))
+    p_run.add_argument("--requests", type=int, default=2000)
+    p_run.add_argument("--concurrency", type=int, default=20)
+    p_run.add_argument("--db", default=BENCH_DB)
+    p_run.add_argument("--reseed", action="store_true", help="drop and reseed even if a dataset of this scale exists")
+    p_run.add_argument("--case", action="append", help="only cases whose name contains this (repeatable)")
+    p_run.add_argument("--out", help="write results JSON here (default: stdout)")
 
-    client.close()
+    p_cmp = sub.add_parser("compare", help="fail (exit 1) if CURRENT regresses against BASELINE")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current")
+    p_cmp.add_argument("--latency-tolerance", type=float, default=0.25)
+    p_cmp.add_argument("--latency-floor-ms", type=float, default=1.0)
 
+    sub.add_parser("covered", help="assert covered plans for EXPLAIN_USER_ID in MONGO_DB")
+
+    args = parser.parse_args(argv)
+    if args.cmd == "run":
+        results = asyncio.run(run(args))
+        text = json.dumps(results, indent=2, sort_keys=True)
+        if args.out:
+            os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+            with open(args.out, "w") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+    elif args.cmd == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        problems = compare(
+            baseline, current, latency_tolerance=args.latency_tolerance, latency_floor_ms=args.latency_floor_ms
+        )
+        for p in problems:
+            print(f"REGRESSION {p}")
+        if problems:
+            raise SystemExit(1)
+        print(f"OK: {len(baseline.get('cases', {}))} cases within tolerance")
+    else:
+        asyncio.run(check_covered())
 
-if __name__ == "__main__":
-    asyncio.run(main())
 
+if __name__ == "__main__":
+    main()
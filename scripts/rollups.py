@@ -0,0 +1,77 @@
+"""Backfill and read the daily tier activity rollups (`services/common/rollups.py`).
+
+`backfill` rebuilds closed days from `sessions` with one `$merge` aggregation; by default the last
+`--days` days up to yesterday. Today's document is maintained by the services' `$inc` updates and
+is only rebuilt if `--to` says so explicitly (increments landing during the rebuild are lost).
+
+Usage (from repo root):
+
+    python -m scripts.rollups backfill                      # last 30 closed days
+    python -m scripts.rollups backfill --from 2026-01-01 --to 2026-01-31
+    python -m scripts.rollups show --days 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference
+
+from services.common import rollups
+from services.common.mongo import PROFILES, client_options
+
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+MONGO_DB = os.getenv("MONGO_DB", "ira")
+
+
+def _day(offset: int) -> str:
+    return (datetime.now(timezone.utc) + timedelta(days=offset)).strftime("%Y-%m-%d")
+
+
+async def _backfill(args: argparse.Namespace) -> None:
+    start_day = args.from_day or _day(-args.days)
+    end_day = args.to_day or _day(-1)
+    client = AsyncIOMotorClient(MONGO_URI, **client_options(PROFILES["analytics"]))
+    try:
+        started = time.perf_counter()
+        await rollups.backfill(client[MONGO_DB], start_day, end_day)
+        print(f"backfilled {start_day}..{end_day} in {time.perf_counter() - started:.1f}s")
+    finally:
+        client.close()
+
+
+async def _show(args: argparse.Namespace) -> None:
+    client = AsyncIOMotorClient(MONGO_URI, **client_options(PROFILES["analytics"]))
+    try:
+        db = client.get_database(MONGO_DB, read_preference=ReadPreference.SECONDARY_PREFERRED)
+        docs = await rollups.read_days(db, _day(-(args.days - 1)), _day(0))
+    finally:
+        client.close()
+    print(f"{'day':<12}{'tier':<10}{'sessions':>10}{'messages':>10}")
+    for doc in docs:
+        for tier, row in sorted(doc.get("tiers", {}).items()):
+            print(f"{doc['_id']:<12}{tier:<10}{row.get('sessions', 0):>10}{row.get('messages', 0):>10}")
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m scripts.rollups")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    backfill = sub.add_parser("backfill", help="rebuild rollups for closed days from sessions")
+    backfill.add_argument("--from", dest="from_day", help="first day (YYYY-MM-DD); default today - --days")
+    backfill.add_argument("--to", dest="to_day", help="last day, inclusive; default yesterday")
+    backfill.add_argument("--days", type=int, default=30)
+    show = sub.add_parser("show", help="print the last --days days, today included")
+    show.add_argument("--days", type=int, default=7)
+    args = parser.parse_args(argv)
+    asyncio.run(_backfill(args) if args.cmd == "backfill" else _show(args))
+
+
+if __name__ == "__main__":
+    main()
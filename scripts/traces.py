@@ -0,0 +1,307 @@
+"""Record, synthesize and replay `/chat` traffic traces.
+
+A trace is JSON lines: a header, then one record per request in send order:
+
+    {"trace": 1, "requests": 36000, "duration_s": 600.0, "source": "synth"}
+    {"t": 0.0132, "user_id": "...", "tier": "free", "chars": 87}
+
+`t` is seconds since the start of the trace, `chars` the message length (a record may carry the
+`message` itself instead). Replay is open loop (`scripts/loadgen.py`): each record is sent at
+`t / --speed` whatever happened to earlier ones, so the same users come back at their recorded pace
+and the session limiter, caches and personality lookups see realistic repeat traffic.
+
+    python -m scripts.traces synth --users 100000 --rate 50 --duration-s 600 --out traces/synth.jsonl
+    python -m scripts.traces record --hours 1 --out traces/prod.jsonl        # from analytics_events
+    python -m scripts.traces stats traces/synth.jsonl
+    python -m scripts.traces replay traces/synth.jsonl --speed 2 --out bench/replay.json
+
+`synth` takes user ids and tiers from the seeding engine's plan (`--plan-users`, `--plan-seed`, as given to
+`scripts.seed_mongo`), so replayed users exist in a seeded database with their seeded tier, and users split 90/9/1 by tier
+as in the seed. Per-user activity is Pareto distributed: a small cohort sends most messages, so the
+per-request tier mix depends on which tiers the heavy senders landed in. Replaying twice on the same UTC day finds the limiter counters of the first run; use
+`--user-suffix` for a fresh set of (unseeded) users.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from typing import Any, Iterator, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from scripts.loadgen import BASE_URL, Request, open_client, render, run_schedule
+from services.seeder.app.engine import WORDS, Keys, SeedPlan
+
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+MONGO_DB = os.getenv("MONGO_DB", "ira")
+TRACE_VERSION = 1
+# Message lengths of the seed's `rand_text`.
+MIN_CHARS, MAX_CHARS = 20, 220
+
+
+# --- format ------------------------------------------------------------------------------------
+
+
+def write_trace(path: str, records: Iterator[dict[str, Any]], *, source: str, **meta: Any) -> dict[str, Any]:
+    """Write `records` (sorted by `t`) after a header; the header's counts need one buffered pass."""
+    records = list(records)
+    header = {
+        "trace": TRACE_VERSION,
+        "requests": len(records),
+        "duration_s": round(records[-1]["t"], 6) if records else 0.0,
+        "source": source,
+        **meta,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(json.dumps(header) + "\n")
+        for rec in records:
+            f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+    os.replace(tmp, path)
+    return header
+
+
+def read_trace(path: str) -> tuple[dict[str, Any], Iterator[dict[str, Any]]]:
+    """Header and a lazy iterator over the records (constant memory for long traces)."""
+    f = open(path)
+    first = f.readline()
+    header = json.loads(first) if first.strip() else {}
+    if header.get("trace") != TRACE_VERSION:
+        f.close()
+        raise ValueError(f"{path}: not a version {TRACE_VERSION} trace (header: {first.strip()[:80]!r})")
+
+    def records() -> Iterator[dict[str, Any]]:
+        with f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    return header, records()
+
+
+def message_of(chars: int, rng: random.Random) -> str:
+    words: list[str] = []
+    total = 0
+    while total <= chars:
+        w = rng.choice(WORDS)
+        words.append(w)
+        total += len(w) + 1
+    return " ".join(words)[: max(1, chars)]
+
+
+def to_requests(
+    records: Iterator[dict[str, Any]], *, speed: float = 1.0, user_suffix: str = "", seed: int = 1
+) -> Iterator[Request]:
+    rng = random.Random(seed)
+    for rec in records:
+        message = rec.get("message") or message_of(int(rec.get("chars", MIN_CHARS)), rng)
+        yield Request(rec["t"] / speed, rec["tier"], f"{rec['user_id']}{user_suffix}", message)
+
+
+# --- synth -------------------------------------------------------------------------------------
+
+
+def synth_records(
+    *,
+    users: int,
+    rate_rps: float,
+    duration_s: float,
+    alpha: float = 1.5,
+    plan: SeedPlan,
+    seed: int = 1,
+) -> Iterator[dict[str, Any]]:
+    """Poisson arrivals at `rate_rps`; each request's sender drawn by Pareto(`alpha`) activity weight.
+
+    The `users` senders are the first `users` users of `plan`, so ids and tiers match a seeded database.
+    """
+    rng = random.Random(seed)
+    keys = Keys(plan)
+    n = min(users, plan.users)
+    cum_weights: list[float] = []
+    acc = 0.0
+    for _ in range(n):
+        acc += rng.paretovariate(alpha)
+        cum_weights.append(acc)
+    senders = range(n)
+    t = rng.expovariate(rate_rps)
+    while t < duration_s:
+        u = rng.choices(senders, cum_weights=cum_weights)[0]
+        yield {
+            "t": round(t, 6),
+            "user_id": keys.id("users", u),
+            "tier": keys.tier_of_user(u),
+            "chars": rng.randint(MIN_CHARS, MAX_CHARS),
+        }
+        t += rng.expovariate(rate_rps)
+
+
+# --- record ------------------------------------------------------------------------------------
+
+
+async def record_records(*, since_ts: float, until_ts: float, db_name: str = MONGO_DB) -> list[dict[str, Any]]:
+    """Routed `/chat` requests from `analytics_events` (one event per request, see docs/analytics.md)."""
+    client = AsyncIOMotorClient(MONGO_URI)
+    try:
+        cursor = client[db_name].analytics_events.find(
+            {"ts": {"$gte": since_ts, "$lt": until_ts}, "path": "/chat"},
+            {"_id": 0, "ts": 1, "user_id": 1, "tier": 1, "message_chars": 1},
+            sort=[("ts", 1)],
+        )
+        events = [ev async for ev in cursor]
+    finally:
+        client.close()
+    if not events:
+        return []
+    start = events[0]["ts"]
+    # Events written before `message_chars` existed replay with the seed's mean length.
+    return [
+        {
+            "t": round(ev["ts"] - start, 6),
+            "user_id": ev["user_id"],
+            "tier": ev["tier"],
+            "chars": ev.get("message_chars", (MIN_CHARS + MAX_CHARS) // 2),
+        }
+        for ev in events
+    ]
+
+
+# --- stats -------------------------------------------------------------------------------------
+
+
+def trace_stats(header: dict[str, Any], records: Iterator[dict[str, Any]]) -> dict[str, Any]:
+    per_user: Counter[str] = Counter()
+    tiers: Counter[str] = Counter()
+    chars = 0
+    for rec in records:
+        per_user[rec["user_id"]] += 1
+        tiers[rec["tier"]] += 1
+        chars += int(rec.get("chars", len(rec.get("message", ""))))
+    total = sum(per_user.values())
+    counts = sorted(per_user.values(), reverse=True)
+    top = counts[: max(1, len(counts) // 100)]
+    duration = header.get("duration_s") or 0.0
+    return {
+        "requests": total,
+        "duration_s": duration,
+        "rate_rps": round(total / duration, 2) if duration else 0.0,
+        "users": len(counts),
+        "tier_mix": {t: round(n / total, 4) for t, n in tiers.most_common()} if total else {},
+        "top_1pct_user_share": round(sum(top) / total, 4) if total else 0.0,
+        "requests_per_user": {
+            "median": counts[len(counts) // 2] if counts else 0,
+            "p99": counts[len(counts) // 100] if counts else 0,
+            "max": counts[0] if counts else 0,
+        },
+        "mean_chars": round(chars / total, 1) if total else 0.0,
+    }
+
+
+# --- replay ------------------------------------------------------------------------------------
+
+
+async def replay(args: argparse.Namespace) -> dict[str, Any]:
+    header, records = read_trace(args.trace)
+    if args.max_s:
+        records = (r for r in records if r["t"] < args.max_s)
+    duration = min(header.get("duration_s") or 0.0, args.max_s or float("inf")) / args.speed
+    rate = header["requests"] / header["duration_s"] * args.speed if header.get("duration_s") else 0.0
+    app = args.in_process or None
+    async with open_client(base_url=args.base_url, app=app, max_connections=args.max_connections) as client:
+        step = await run_schedule(
+            client,
+            to_requests(records, speed=args.speed, user_suffix=args.user_suffix),
+            rate_rps=round(rate, 2),
+            duration_s=duration,
+            timeout_s=args.timeout_s,
+            max_inflight=args.max_inflight,
+        )
+    print(render([step]))
+    return {
+        "meta": {
+            "trace": args.trace,
+            "trace_header": header,
+            "speed": args.speed,
+            "target": app or args.base_url,
+            "user_suffix": args.user_suffix,
+            "ts": time.time(),
+        },
+        "steps": [step.to_dict()],
+    }
+
+
+def _write_json(results: dict[str, Any], path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m scripts.traces", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_synth = sub.add_parser("synth", help="generate a trace matching the seed distribution")
+    p_synth.add_argument("--users", type=int, default=100_000, help="distinct senders (at most --plan-users)")
+    p_synth.add_argument("--rate", type=float, default=50.0, help="requests/s")
+    p_synth.add_argument("--duration-s", type=float, default=600.0)
+    p_synth.add_argument("--alpha", type=float, default=1.5, help="Pareto shape of per-user activity (lower = more skew)")
+    p_synth.add_argument("--plan-users", type=int, default=int(os.getenv("SEED_USERS", "1000000")))
+    p_synth.add_argument("--plan-seed", type=int, default=int(os.getenv("SEED_RANDOM_SEED", "1337")))
+    p_synth.add_argument("--seed", type=int, default=1)
+    p_synth.add_argument("--out", required=True)
+
+    p_record = sub.add_parser("record", help="export routed requests from analytics_events")
+    p_record.add_argument("--hours", type=float, default=1.0, help="window ending now")
+    p_record.add_argument("--db", default=MONGO_DB)
+    p_record.add_argument("--out", required=True)
+
+    p_stats = sub.add_parser("stats", help="print a trace's tier mix and per-user activity")
+    p_stats.add_argument("trace")
+
+    p_replay = sub.add_parser("replay", help="send a trace's requests at their recorded times (open loop)")
+    p_replay.add_argument("trace")
+    p_replay.add_argument("--speed", type=float, default=1.0, help="time compression: 2 = twice as fast")
+    p_replay.add_argument("--max-s", type=float, help="only the first MAX_S seconds of the trace")
+    p_replay.add_argument("--user-suffix", default="", help="appended to every user id")
+    p_replay.add_argument("--base-url", default=BASE_URL)
+    p_replay.add_argument("--in-process", nargs="?", const="services.router.app.main:app", metavar="MODULE:APP")
+    p_replay.add_argument("--timeout-s", type=float, default=10.0)
+    p_replay.add_argument("--max-inflight", type=int, default=10_000)
+    p_replay.add_argument("--max-connections", type=int, default=1000)
+    p_replay.add_argument("--out", help="write results JSON here")
+
+    args = parser.parse_args(argv)
+    if args.cmd == "synth":
+        plan = SeedPlan(users=args.plan_users, personalities=0, sessions=0, messages=0, seed=args.plan_seed)
+        records = synth_records(
+            users=args.users, rate_rps=args.rate, duration_s=args.duration_s, alpha=args.alpha, plan=plan, seed=args.seed
+        )
+        header = write_trace(
+            args.out, records, source="synth", alpha=args.alpha, plan_users=args.plan_users, plan_seed=args.plan_seed
+        )
+        print(f"wrote {header['requests']} requests over {header['duration_s']:.0f}s to {args.out}", file=sys.stderr)
+    elif args.cmd == "record":
+        until = time.time()
+        records = asyncio.run(record_records(since_ts=until - args.hours * 3600, until_ts=until, db_name=args.db))
+        header = write_trace(args.out, iter(records), source=f"analytics_events:{args.db}", recorded_at=until)
+        print(f"wrote {header['requests']} requests over {header['duration_s']:.0f}s to {args.out}", file=sys.stderr)
+    elif args.cmd == "stats":
+        header, records = read_trace(args.trace)
+        print(json.dumps(trace_stats(header, records), indent=2))
+    else:
+        results = asyncio.run(replay(args))
+        if args.out:
+            _write_json(results, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,9 @@ from __future__ import annotations
 
 import asyncio
 import time
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 
+from services.common import metrics
 from services.common.logging import get_logger
 from services.common.mongo import get_db
 
@@ -15,6 +16,11 @@ _task: Optional[asyncio.Task] = None
 _stopping = False
 _dropped = 0
 
+_FLUSHED = metrics.counter("ira_analytics_events_flushed_total", "Analytics events written to Mongo.")
+_FLUSH_FAILURES = metrics.counter("ira_analytics_flush_failures_total", "Failed analytics insert_many batches.")
+_FLUSH_LATENCY = metrics.histogram("ira_analytics_flush_seconds", "Analytics insert_many duration.")
+_DROPPED = metrics.counter("ira_analytics_events_dropped_total", "Analytics events dropped because the queue was full.")
+
 
 def _get_queue() -> asyncio.Queue[dict[str, Any]]:
     global _queue
@@ -44,10 +50,15 @@ async def start() -> None:
                 return
             to_insert = batch
             batch = []
+            start = time.perf_counter()
             try:
                 await col.insert_many(to_insert, ordered=False)
+                _FLUSHED.inc(len(to_insert))
             except Exception as e:  # noqa: BLE001
+                _FLUSH_FAILURES.inc()
                 log.warning("analytics_flush_failed", extra={"extra": {"err": type(e).__name__}})
+            finally:
+                _FLUSH_LATENCY.observe(time.perf_counter() - start)
 
         last_flush = time.perf_counter()
         flush_interval_s = 0.5
@@ -97,4 +108,13 @@ async def track(event: dict[str, Any]) -> None:
         q.put_nowait(event)
     except asyncio.QueueFull:
         _dropped += 1
+        _DROPPED.inc()
+
+
+def _queue_depth() -> Iterator[tuple[tuple[()], float]]:
+    if _queue is not None:
+        yield (), _queue.qsize()
+
+
+metrics.callback("ira_analytics_queue_depth", "Analytics events waiting to be flushed.", [], _queue_depth)
 
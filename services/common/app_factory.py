@@ -1,27 +1,41 @@
 from __future__ import annotations
 
 import os
-from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncContextManager, Callable, Optional
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 
+from services.common import metrics
 from services.common.http import install_request_context_middleware
-from services.common.logging import configure_logging, get_logger
+from services.common.logging import configure_logging, get_logger, sampling_stats
+from services.common.profiling import install_profiling_routes, profiling_enabled
 from services.common.request_context import ServiceName
 
 
-def create_app(*, service: ServiceName) -> FastAPI:
+def create_app(
+    *,
+    service: ServiceName,
+    lifespan: Optional[Callable[[FastAPI], AsyncContextManager[Any]]] = None,
+) -> FastAPI:
+    """Build a service app with shared logging, middleware and health endpoints.
+
+    `lifespan` is an optional service-specific lifespan, entered after logging is configured.
+    """
     log_level = os.getenv("LOG_LEVEL", "INFO")
 
     @asynccontextmanager
-    async def lifespan(_: FastAPI):
+    async def _lifespan(app: FastAPI):
         configure_logging(log_level)
         log = get_logger(service)
         log.info("startup")
-        yield
+        async with AsyncExitStack() as stack:
+            if lifespan is not None:
+                await stack.enter_async_context(lifespan(app))
+            yield
         log.info("shutdown")
 
-    app = FastAPI(title=f"ira-{service}", lifespan=lifespan)
+    app = FastAPI(title=f"ira-{service}", lifespan=_lifespan)
     install_request_context_middleware(app, service=service)
 
     @app.get("/healthz")
@@ -33,6 +47,17 @@ def create_app(*, service: ServiceName) -> FastAPI:
         # Later: verify Mongo/Redis connectivity.
         return {"ready": True, "service": service}
 
-    return app
+    @app.get("/logz")
+    async def logz():
+        # Log sampling counters (records suppressed by sampling / per-key rate limiting).
+        return {"service": service, **sampling_stats()}
 
+    @app.get("/metrics")
+    async def metrics_endpoint():
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
+    # Admin-only; not registered at all unless PROFILING_ENABLED is set.
+    if profiling_enabled():
+        install_profiling_routes(app)
+
+    return app
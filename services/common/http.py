@@ -2,58 +2,105 @@ from __future__ import annotations
 
 import time
 import uuid
-from typing import Callable, Optional
+from typing import Optional
 
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from services.common import metrics
 from services.common.logging import get_logger
-from services.common.request_context import RequestContext, ServiceName, set_request_context
+from services.common.request_context import RequestContext, ServiceName, StageTimings, set_request_context
 
 
 CORRELATION_ID_HEADER = "X-Correlation-Id"
+SERVER_TIMING_HEADER = "Server-Timing"
+_CORRELATION_ID_HEADER_RAW = CORRELATION_ID_HEADER.lower().encode("latin-1")
+_SERVER_TIMING_HEADER_RAW = SERVER_TIMING_HEADER.lower().encode("latin-1")
 
+_HTTP_REQUESTS = metrics.counter(
+    "ira_http_requests_total", "HTTP requests by route and status.", ["service", "method", "route", "status"]
+)
+_HTTP_DURATION = metrics.histogram(
+    "ira_http_request_duration_seconds", "HTTP request duration by route.", ["service", "route"]
+)
 
-def _get_or_create_correlation_id(request: Request) -> str:
-    incoming = request.headers.get(CORRELATION_ID_HEADER)
-    if incoming and len(incoming) <= 128:
-        return incoming
+
+def _get_or_create_correlation_id(scope: Scope) -> str:
+    for name, value in scope["headers"]:
+        if name == _CORRELATION_ID_HEADER_RAW:
+            if len(value) <= 128:
+                return value.decode("latin-1")
+            break
     return str(uuid.uuid4())
 
 
-def install_request_context_middleware(
-    app: FastAPI,
-    *,
-    service: ServiceName,
-    slow_ms_threshold: float = 250.0,
-) -> None:
-    log = get_logger(f"{service}.http")
+class RequestContextMiddleware:
+    """Pure ASGI middleware: correlation ID, request context, response headers and slow-request log.
+
+    Stage timings recorded during the request (see `request_context.stage`) are emitted as a
+    `Server-Timing` header together with the total handler time.
+
+    Unlike `@app.middleware("http")` (BaseHTTPMiddleware) it runs the app in the same task,
+    adds no per-request task/stream plumbing and passes streaming responses straight through.
+    """
+
+    def __init__(self, app: ASGIApp, *, service: ServiceName, slow_ms_threshold: float = 250.0) -> None:
+        self.app = app
+        self.service = service
+        self.slow_ms_threshold = slow_ms_threshold
+        self.log = get_logger(f"{service}.http")
 
-    @app.middleware("http")
-    async def request_context_middleware(request: Request, call_next: Callable):
-        correlation_id = _get_or_create_correlation_id(request)
-        set_request_context(RequestContext(correlation_id=correlation_id, service=service))
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
+        correlation_id = _get_or_create_correlation_id(scope)
+        timings = StageTimings()
+        set_request_context(RequestContext(correlation_id=correlation_id, service=self.service, timings=timings))
+        header = (_CORRELATION_ID_HEADER_RAW, correlation_id.encode("latin-1"))
+        status_code: Optional[int] = None
         start = time.perf_counter()
-        response: Optional[Response] = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = [h for h in message.get("headers", ()) if h[0].lower() != _CORRELATION_ID_HEADER_RAW]
+                headers.append(header)
+                if timings:
+                    total_ms = (time.perf_counter() - start) * 1000.0
+                    headers.append((_SERVER_TIMING_HEADER_RAW, timings.server_timing(total_ms=total_ms).encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
         try:
-            response = await call_next(request)
-            return response
+            await self.app(scope, receive, send_wrapper)
         finally:
-            elapsed_ms = (time.perf_counter() - start) * 1000.0
-            if response is not None:
-                response.headers[CORRELATION_ID_HEADER] = correlation_id
-
-            if elapsed_ms >= slow_ms_threshold:
-                log.warning(
+            elapsed_s = time.perf_counter() - start
+            elapsed_ms = elapsed_s * 1000.0
+            # Route template (e.g. "/seed/{job_id}"), not the raw path, to bound label cardinality.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            _HTTP_REQUESTS.labels(self.service, scope["method"], route, str(status_code or 500)).inc()
+            _HTTP_DURATION.labels(self.service, route).observe(elapsed_s)
+            if elapsed_ms >= self.slow_ms_threshold:
+                self.log.warning(
                     "slow_request",
                     extra={
                         "extra": {
-                            "path": str(request.url.path),
-                            "method": request.method,
-                            "status_code": getattr(response, "status_code", None),
+                            "path": scope["path"],
+                            "method": scope["method"],
+                            "status_code": status_code,
                             "elapsed_ms": round(elapsed_ms, 2),
                         }
                     },
                 )
 
 
+def install_request_context_middleware(
+    app: FastAPI,
+    *,
+    service: ServiceName,
+    slow_ms_threshold: float = 250.0,
+) -> None:
+    app.add_middleware(RequestContextMiddleware, service=service, slow_ms_threshold=slow_ms_threshold)
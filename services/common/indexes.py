@@ -0,0 +1,79 @@
+"""Secondary index definitions (see docs/indexes.md) and how to build them."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Iterable
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+
+INDEXES: dict[str, list[IndexModel]] = {
+    "users": [
+        IndexModel([("tier", 1), ("last_seen_at", -1)], name="tier_lastSeen"),
+    ],
+    "personalities": [
+        # Latest personality per user; `_id` and `tone` make PersonalitiesRepo.get_latest_tone_for_user covered.
+        IndexModel([("user_id", 1), ("updated_at", -1), ("_id", 1), ("tone", 1)], name="user_updatedAt_tone"),
+        # Polling fallback of the workers' personality cache (standalone mongod without change streams).
+        IndexModel([("updated_at", 1)], name="updatedAt"),
+    ],
+    "sessions": [
+        # Equality on user/day/status, index-order sort on started_at, `_id` for a covered projection.
+        IndexModel(
+            [("user_id", 1), ("day", 1), ("status", 1), ("started_at", -1), ("_id", 1)],
+            name="user_day_status_startedAt",
+        ),
+        IndexModel([("tier", 1), ("day", 1)], name="tier_day"),
+    ],
+    "messages": [
+        IndexModel([("session_id", 1), ("created_at", -1)], name="session_createdAt_desc"),
+        IndexModel([("tier", 1), ("created_at", -1)], name="tier_createdAt_desc"),
+    ],
+    "analytics_events": [
+        IndexModel([("ts", -1)], name="ts_desc"),
+        IndexModel([("tier", 1), ("ts", -1)], name="tier_ts_desc"),
+    ],
+}
+
+# Superseded by an index above that has them as a prefix, or no longer queried; dropped on the next build.
+SUPERSEDED: dict[str, list[str]] = {
+    "users": ["id_tier"],
+    "personalities": ["user_updatedAt"],
+    "sessions": ["user_day_status"],
+}
+
+
+async def _build(db: AsyncIOMotorDatabase, collection: str) -> float:
+    started = time.perf_counter()
+    # One createIndexes command: the server builds all of a collection's indexes in a single scan.
+    await db[collection].create_indexes(INDEXES[collection])
+    for name in SUPERSEDED.get(collection, []):
+        try:
+            await db[collection].drop_index(name)
+        except OperationFailure:
+            pass
+    return time.perf_counter() - started
+
+
+async def create_indexes(db: AsyncIOMotorDatabase, collections: Iterable[str] = INDEXES) -> dict[str, float]:
+    """Build the indexes of `collections`, all collections concurrently; returns seconds per collection."""
+    names = list(collections)
+    seconds = await asyncio.gather(*(_build(db, c) for c in names))
+    return dict(zip(names, seconds))
+
+
+async def drop_secondary_indexes(db: AsyncIOMotorDatabase, collections: Iterable[str]) -> None:
+    """Drop everything but `_id` (before a bulk load; rebuild with `create_indexes`)."""
+
+    async def drop(collection: str) -> None:
+        try:
+            await db[collection].drop_indexes()
+        except OperationFailure as e:
+            if e.code != 26:  # NamespaceNotFound: nothing to drop
+                raise
+
+    await asyncio.gather(*(drop(c) for c in collections))
@@ -0,0 +1,498 @@
+"""LLM backend client used by the workers.
+
+- `StubLLM` sleeps for a per-pool latency and returns a canned reply. It is used for local dev without
+  a backend, for unit tests and for the in-process harness.
+- `HttpLLM` calls an HTTP completion API: the bundled mock (`services/mock_llm`) or a gateway that speaks
+  the same protocol. It keeps one pooled `httpx.AsyncClient` per worker (HTTP/2 when `h2` is installed).
+  Each pool has its own timeouts. Retries are bounded and use full-jitter exponential backoff inside a
+  total deadline, so a worker answers (or fails) before the router's 5s read timeout.
+
+- `BatchingLLM` (opt-in per pool with `LLM_<POOL>_BATCH_MAX_ITEMS`) groups concurrent `complete` calls
+  into one batched call. That trades a few ms of queueing for fewer backend calls, which pays off where
+  each call has a fixed overhead and throughput matters more than latency (the free-tier overflow pool).
+
+Protocol:
+
+    POST {LLM_URL}/v1/complete {"prompt", "tone", "max_tokens", "stream": false} -> {"text", "tokens"}
+    with "stream": true -> NDJSON lines {"token": "..."}, then {"done": true, "tokens": n}
+    POST {LLM_URL}/v1/complete/batch {"items": [{"prompt", "tone", "max_tokens"}, ...]}
+        -> {"results": [{"text", "tokens"}, ...]} (same order)
+
+429 and 5xx responses, timeouts and connection errors are retried; other 4xx are not. A stream is
+retried only until its first token arrives.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import time
+from dataclasses import dataclass, replace
+from typing import Any, AsyncIterator, Optional, Protocol, Sequence
+
+import httpx
+
+from services.common import metrics
+from services.common.logging import get_logger
+
+
+log = get_logger("llm")
+
+_CALLS = metrics.histogram(
+    "ira_llm_call_seconds", "LLM calls including retries, by pool and outcome (ok | error reason).", ["pool", "outcome"]
+)
+_FIRST_TOKEN = metrics.histogram("ira_llm_first_token_seconds", "Time to the first streamed token.", ["pool"])
+_RETRIES = metrics.counter("ira_llm_retries_total", "LLM attempts retried, by reason.", ["pool", "reason"])
+_BATCH_ITEMS = metrics.histogram(
+    "ira_llm_batch_items", "Calls per batched LLM call.", ["pool"], buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+_BATCH_WAIT = metrics.histogram("ira_llm_batch_wait_seconds", "Time a call waited to be sent in a batch.", ["pool"])
+_BATCH_REJECTED = metrics.counter(
+    "ira_llm_batch_rejected_total", "Calls rejected because the batch queue stayed full.", ["pool"]
+)
+
+
+@dataclass(frozen=True)
+class LLMConfig:
+    pool: str
+    backend: str = "stub"  # stub | http
+    base_url: str = "http://localhost:8010"
+    connect_timeout_s: float = 0.5
+    # Per attempt: longest wait for the response to start or for the next chunk of it.
+    read_timeout_s: float = 2.0
+    # Whole call, retries and backoff included.
+    deadline_s: float = 4.0
+    max_retries: int = 2
+    backoff_base_s: float = 0.05
+    backoff_max_s: float = 0.5
+    max_connections: int = 50
+    max_tokens: int = 128
+    http2: bool = True
+    stub_latency_s: tuple[float, float] = (0.02, 0.06)
+    # Micro-batching, off unless `batch_max_items` > 1: a batch closes at `batch_max_items` calls or
+    # `batch_max_wait_s` after its first call. At most `batch_max_inflight` batches are at the backend;
+    # behind them calls queue up to `batch_max_queue`, then wait `batch_enqueue_timeout_s` and fail.
+    batch_max_items: int = 0
+    batch_max_wait_s: float = 0.01
+    batch_max_inflight: int = 4
+    batch_max_queue: int = 256
+    batch_enqueue_timeout_s: float = 0.05
+
+
+# Deadlines stay under the router's 5s read timeout to the workers (services/router/app/pools.py).
+POOL_DEFAULTS: dict[str, LLMConfig] = {
+    "priority": LLMConfig(pool="priority", read_timeout_s=1.5, deadline_s=3.0, max_retries=2, max_connections=50),
+    "standard": LLMConfig(
+        pool="standard", read_timeout_s=2.5, deadline_s=4.0, max_retries=2, max_connections=80, stub_latency_s=(0.05, 0.15)
+    ),
+    # Free tier: one retry, a longer read timeout for the slower pool.
+    "overflow": LLMConfig(
+        pool="overflow", read_timeout_s=4.0, deadline_s=4.5, max_retries=1, max_connections=30, stub_latency_s=(0.10, 0.35)
+    ),
+}
+
+
+def _env(pool: str, name: str, default: Any) -> Any:
+    # LLM_<POOL>_<NAME> overrides LLM_<NAME>, which overrides the pool default.
+    raw = os.getenv(f"LLM_{pool.upper()}_{name}", os.getenv(f"LLM_{name}"))
+    if raw is None:
+        return default
+    if isinstance(default, bool):
+        return raw.lower() in {"1", "true", "yes"}
+    return type(default)(raw)
+
+
+def llm_config_from_env(pool: str) -> LLMConfig:
+    base = POOL_DEFAULTS[pool]
+    return replace(
+        base,
+        backend=_env(pool, "BACKEND", base.backend),
+        base_url=_env(pool, "URL", base.base_url),
+        connect_timeout_s=_env(pool, "CONNECT_TIMEOUT_S", base.connect_timeout_s),
+        read_timeout_s=_env(pool, "TIMEOUT_S", base.read_timeout_s),
+        deadline_s=_env(pool, "DEADLINE_S", base.deadline_s),
+        max_retries=_env(pool, "MAX_RETRIES", base.max_retries),
+        backoff_base_s=_env(pool, "BACKOFF_BASE_S", base.backoff_base_s),
+        backoff_max_s=_env(pool, "BACKOFF_MAX_S", base.backoff_max_s),
+        max_connections=_env(pool, "MAX_CONNECTIONS", base.max_connections),
+        max_tokens=_env(pool, "MAX_TOKENS", base.max_tokens),
+        http2=_env(pool, "HTTP2", base.http2),
+        batch_max_items=_env(pool, "BATCH_MAX_ITEMS", base.batch_max_items),
+        batch_max_wait_s=_env(pool, "BATCH_MAX_WAIT_S", base.batch_max_wait_s),
+        batch_max_inflight=_env(pool, "BATCH_MAX_INFLIGHT", base.batch_max_inflight),
+        batch_max_queue=_env(pool, "BATCH_MAX_QUEUE", base.batch_max_queue),
+        batch_enqueue_timeout_s=_env(pool, "BATCH_ENQUEUE_TIMEOUT_S", base.batch_enqueue_timeout_s),
+    )
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    prompt: str
+    tone: Optional[str] = None
+    max_tokens: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class Completion:
+    text: str
+    tokens: int
+    attempts: int = 1
+
+
+class LLMError(RuntimeError):
+    def __init__(self, pool: str, reason: str, *, retryable: bool = False) -> None:
+        super().__init__(f"llm_error:{pool}:{reason}")
+        self.pool = pool
+        self.reason = reason
+        self.retryable = retryable
+
+
+class LLMClient(Protocol):
+    config: LLMConfig
+
+    async def start(self) -> None: ...
+
+    async def aclose(self) -> None: ...
+
+    async def complete(self, prompt: str, *, tone: Optional[str] = None, max_tokens: Optional[int] = None) -> Completion: ...
+
+    def stream(self, prompt: str, *, tone: Optional[str] = None, max_tokens: Optional[int] = None) -> AsyncIterator[str]: ...
+
+    async def complete_batch(self, items: Sequence[BatchItem]) -> list[Completion]: ...
+
+
+class StubLLM:
+    """No backend: sleeps `uniform(*config.stub_latency_s)` and answers with a fixed reply."""
+
+    def __init__(self, config: LLMConfig, *, rng: Optional[random.Random] = None) -> None:
+        self.config = config
+        self.rng = rng or random.Random()
+        self.reply = f"Processed by {config.pool} pool (stub)."
+
+    async def start(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+    async def complete(self, prompt: str, *, tone: Optional[str] = None, max_tokens: Optional[int] = None) -> Completion:
+        await asyncio.sleep(self.rng.uniform(*self.config.stub_latency_s))
+        return Completion(self.reply, len(self.reply.split()))
+
+    async def complete_batch(self, items: Sequence[BatchItem]) -> list[Completion]:
+        await asyncio.sleep(self.rng.uniform(*self.config.stub_latency_s))
+        return [Completion(self.reply, len(self.reply.split())) for _ in items]
+
+    async def stream(self, prompt: str, *, tone: Optional[str] = None, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        words = self.reply.split()
+        delay = self.rng.uniform(*self.config.stub_latency_s) / len(words)
+        for i, word in enumerate(words):
+            await asyncio.sleep(delay)
+            yield word if i == 0 else f" {word}"
+
+
+class HttpLLM:
+    def __init__(
+        self, config: LLMConfig, *, client: Optional[httpx.AsyncClient] = None, rng: Optional[random.Random] = None
+    ) -> None:
+        self.config = config
+        self._client = client
+        self._owns_client = client is None
+        self._rng = rng or random.Random()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            cfg = self.config
+            # Like MONGO_COMPRESSORS: HTTP/2 only if its optional dependency (`h2`) is installed.
+            http2 = cfg.http2 and importlib.util.find_spec("h2") is not None
+            self._client = httpx.AsyncClient(
+                base_url=cfg.base_url,
+                http2=http2,
+                timeout=httpx.Timeout(cfg.read_timeout_s, connect=cfg.connect_timeout_s, pool=cfg.connect_timeout_s),
+                limits=httpx.Limits(
+                    max_connections=cfg.max_connections, max_keepalive_connections=cfg.max_connections, keepalive_expiry=30.0
+                ),
+            )
+            self._owns_client = True
+            log.info("llm_client", extra={"extra": {"pool": cfg.pool, "url": cfg.base_url, "http2": http2}})
+        return self._client
+
+    async def start(self) -> None:
+        _ = self.client
+
+    async def aclose(self) -> None:
+        if self._client is not None and self._owns_client:
+            await self._client.aclose()
+            self._client = None
+
+    def _body(self, prompt: str, tone: Optional[str], max_tokens: Optional[int], stream: bool) -> dict[str, Any]:
+        return {"prompt": prompt, "tone": tone, "max_tokens": max_tokens or self.config.max_tokens, "stream": stream}
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: concurrent retries after a backend blip spread out instead of arriving together.
+        cfg = self.config
+        return self._rng.uniform(0.0, min(cfg.backoff_max_s, cfg.backoff_base_s * 2 ** (attempt - 1)))
+
+    async def _retry_or_raise(self, err: LLMError, attempt: int, deadline: float) -> None:
+        if not err.retryable or attempt > self.config.max_retries:
+            raise err
+        delay = self._backoff(attempt)
+        if time.perf_counter() + delay >= deadline:
+            raise err
+        _RETRIES.labels(self.config.pool, err.reason).inc()
+        await asyncio.sleep(delay)
+
+    async def _post(self, path: str, body: dict[str, Any]) -> tuple[dict[str, Any], int]:
+        """JSON response and attempts for a retried POST within the deadline."""
+        cfg = self.config
+        start = time.perf_counter()
+        deadline = start + cfg.deadline_s
+        outcome = "ok"
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                try:
+                    r = await asyncio.wait_for(self.client.post(path, json=body), deadline - time.perf_counter())
+                except asyncio.TimeoutError:
+                    raise LLMError(cfg.pool, "deadline") from None
+                except httpx.TimeoutException:
+                    err = LLMError(cfg.pool, "timeout", retryable=True)
+                except httpx.TransportError:
+                    err = LLMError(cfg.pool, "connect", retryable=True)
+                else:
+                    if r.status_code == 200:
+                        return r.json(), attempt
+                    err = LLMError(
+                        cfg.pool, f"status_{r.status_code}", retryable=r.status_code == 429 or r.status_code >= 500
+                    )
+                await self._retry_or_raise(err, attempt, deadline)
+        except LLMError as e:
+            outcome = e.reason
+            raise
+        finally:
+            _CALLS.labels(cfg.pool, outcome).observe(time.perf_counter() - start)
+
+    async def complete(self, prompt: str, *, tone: Optional[str] = None, max_tokens: Optional[int] = None) -> Completion:
+        data, attempts = await self._post("/v1/complete", self._body(prompt, tone, max_tokens, stream=False))
+        return Completion(data["text"], int(data.get("tokens", 0)), attempts)
+
+    async def complete_batch(self, items: Sequence[BatchItem]) -> list[Completion]:
+        body = {
+            "items": [
+                {"prompt": it.prompt, "tone": it.tone, "max_tokens": it.max_tokens or self.config.max_tokens} for it in items
+            ]
+        }
+        data, attempts = await self._post("/v1/complete/batch", body)
+        results = data.get("results") or []
+        if len(results) != len(items):
+            raise LLMError(self.config.pool, "bad_batch")
+        return [Completion(r["text"], int(r.get("tokens", 0)), attempts) for r in results]
+
+    async def stream(self, prompt: str, *, tone: Optional[str] = None, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        cfg = self.config
+        start = time.perf_counter()
+        deadline = start + cfg.deadline_s
+        body = self._body(prompt, tone, max_tokens, stream=True)
+        outcome = "ok"
+        started = False
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                try:
+                    async with self.client.stream("POST", "/v1/complete", json=body) as r:
+                        if r.status_code != 200:
+                            await r.aread()
+                            err = LLMError(
+                                cfg.pool, f"status_{r.status_code}", retryable=r.status_code == 429 or r.status_code >= 500
+                            )
+                        else:
+                            async for line in r.aiter_lines():
+                                if time.perf_counter() > deadline:
+                                    raise LLMError(cfg.pool, "deadline")
+                                if not line:
+                                    continue
+                                event = json.loads(line)
+                                if "token" in event:
+                                    if not started:
+                                        started = True
+                                        _FIRST_TOKEN.labels(cfg.pool).observe(time.perf_counter() - start)
+                                    yield event["token"]
+                                elif "error" in event:
+                                    raise LLMError(cfg.pool, str(event["error"]))
+                            return
+                except httpx.TimeoutException:
+                    err = LLMError(cfg.pool, "timeout", retryable=not started)
+                except httpx.TransportError:
+                    err = LLMError(cfg.pool, "connect", retryable=not started)
+                await self._retry_or_raise(err, attempt, deadline)
+        except LLMError as e:
+            outcome = e.reason
+            raise
+        finally:
+            _CALLS.labels(cfg.pool, outcome).observe(time.perf_counter() - start)
+
+
+@dataclass
+class _Pending:
+    item: BatchItem
+    future: asyncio.Future
+    queued_at: float
+
+
+class BatchingLLM:
+    """Micro-batches concurrent `complete` calls into `complete_batch` calls on `inner`.
+
+    A collector task takes calls off a bounded queue and closes a batch at `batch_max_items` calls or
+    `batch_max_wait_s` after its first call, whichever comes first. It collects the next batch only once
+    fewer than `batch_max_inflight` batches are at the backend. When the backend falls behind, calls pile
+    up in the queue; once it is full, `complete` waits `batch_enqueue_timeout_s` and then fails with
+    `LLMError("batch_queue_full")`. The worker turns that into a 503, so the router sheds or reroutes.
+    A failed batch fails every call in it. Streams are not batched.
+    """
+
+    def __init__(self, inner: LLMClient) -> None:
+        self.inner = inner
+        self.config = inner.config
+        self.rejected = 0
+        self._queue: Optional[asyncio.Queue[_Pending]] = None
+        self._inflight: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batches: set[asyncio.Task] = set()
+
+    def depth(self) -> int:
+        """Calls waiting to be batched."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self) -> None:
+        await self.inner.start()
+        if self._task is None:
+            # Created here, not in __init__, so they belong to the loop the worker runs on.
+            self._queue = asyncio.Queue(maxsize=self.config.batch_max_queue)
+            self._inflight = asyncio.Semaphore(self.config.batch_max_inflight)
+            self._task = asyncio.create_task(self._run())
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            pending = self._queue.get_nowait()
+            if not pending.future.done():
+                pending.future.set_exception(LLMError(self.config.pool, "shutdown"))
+        await self.inner.aclose()
+
+    async def complete(self, prompt: str, *, tone: Optional[str] = None, max_tokens: Optional[int] = None) -> Completion:
+        cfg = self.config
+        if self._queue is None:
+            return await self.inner.complete(prompt, tone=tone, max_tokens=max_tokens)
+        future = asyncio.get_running_loop().create_future()
+        pending = _Pending(BatchItem(prompt, tone, max_tokens), future, time.perf_counter())
+        try:
+            await asyncio.wait_for(self._queue.put(pending), timeout=cfg.batch_enqueue_timeout_s)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            _BATCH_REJECTED.labels(cfg.pool).inc()
+            raise LLMError(cfg.pool, "batch_queue_full") from None
+        try:
+            # On timeout the future is cancelled, and the collector skips it if it was not sent yet.
+            return await asyncio.wait_for(pending.future, timeout=cfg.deadline_s)
+        except asyncio.TimeoutError:
+            raise LLMError(cfg.pool, "deadline") from None
+
+    async def complete_batch(self, items: Sequence[BatchItem]) -> list[Completion]:
+        return await self.inner.complete_batch(items)
+
+    def stream(self, prompt: str, *, tone: Optional[str] = None, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        return self.inner.stream(prompt, tone=tone, max_tokens=max_tokens)
+
+    async def _run(self) -> None:
+        assert self._queue is not None and self._inflight is not None
+        cfg = self.config
+        while True:
+            # Waiting for a slot first lets calls accumulate, so the batch sent next is a full one.
+            await self._inflight.acquire()
+            batch: list[_Pending] = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = time.perf_counter() + cfg.batch_max_wait_s
+                while len(batch) < cfg.batch_max_items:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    except asyncio.QueueEmpty:
+                        pass
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+            except BaseException:
+                self._inflight.release()
+                for p in batch:
+                    if not p.future.done():
+                        p.future.set_exception(LLMError(cfg.pool, "shutdown"))
+                raise
+            task = asyncio.create_task(self._send(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _send(self, batch: list[_Pending]) -> None:
+        assert self._inflight is not None
+        pool = self.config.pool
+        try:
+            live = [p for p in batch if not p.future.done()]
+            if not live:
+                return
+            now = time.perf_counter()
+            for p in live:
+                _BATCH_WAIT.labels(pool).observe(now - p.queued_at)
+            _BATCH_ITEMS.labels(pool).observe(len(live))
+            try:
+                results = await self.inner.complete_batch([p.item for p in live])
+            except LLMError as e:
+                err = e
+            except Exception as e:  # noqa: BLE001
+                log.warning(
+                    "llm_batch_failed", extra={"extra": {"pool": pool, "err": type(e).__name__, "batch": len(live)}}
+                )
+                err = LLMError(pool, "batch_failed")
+            else:
+                for p, result in zip(live, results):
+                    if not p.future.done():
+                        p.future.set_result(result)
+                return
+            for p in live:
+                if not p.future.done():
+                    p.future.set_exception(err)
+        finally:
+            self._inflight.release()
+
+
+def create_llm_client(pool: str, *, client: Optional[httpx.AsyncClient] = None) -> LLMClient:
+    """Client for a worker pool, configured from the environment (`LLM_BACKEND=stub|http`, `LLM_URL`, ...).
+
+    `client` replaces the pooled HTTP client of the http backend (the in-process harness supplies one).
+    """
+    config = llm_config_from_env(pool)
+    inner: LLMClient
+    if config.backend == "http":
+        inner = HttpLLM(config, client=client)
+    elif config.backend == "stub":
+        inner = StubLLM(config)
+    else:
+        raise ValueError(f"unknown LLM_BACKEND {config.backend!r} (expected stub or http)")
+    return BatchingLLM(inner) if config.batch_max_items > 1 else inner
@@ -2,10 +2,14 @@ from __future__ import annotations
 
 import json
 import logging
+import os
+import random
 import sys
 import time
-from typing import Any, Mapping, Optional
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Mapping, Optional
 
+from services.common import metrics
 from services.common.request_context import get_request_context
 
 
@@ -41,13 +45,165 @@ class JsonFormatter(logging.Formatter):
         return json.dumps(payload, ensure_ascii=False)
 
 
-def configure_logging(level: str = "INFO") -> None:
+@dataclass
+class _TokenBucket:
+    tokens: float
+    updated_s: float
+
+
+@dataclass
+class SamplingConfig:
+    """Sampling policy for sub-WARNING records.
+
+    - `default_rate`: keep probability for loggers without an explicit rate.
+    - `logger_rates`: per-logger keep probability; a rate for "router" also applies to "router.http".
+    - `tier_rates`: per-tier keep probability (from the request context); overrides logger rates,
+      and a tier rate of 1.0 also bypasses the per-key token bucket (e.g. keep enterprise at 100%).
+    - `per_key_rate_s` / `per_key_burst`: token bucket per (logger, msg) key; 0 disables it.
+    """
+
+    default_rate: float = 1.0
+    logger_rates: dict[str, float] = field(default_factory=dict)
+    tier_rates: dict[str, float] = field(default_factory=dict)
+    per_key_rate_s: float = 0.0
+    per_key_burst: float = 0.0
+
+
+def _parse_rates(raw: str) -> dict[str, float]:
+    # "router=0.1,worker-overflow=0.05"
+    out: dict[str, float] = {}
+    for part in raw.split(","):
+        name, sep, value = part.partition("=")
+        if sep and name.strip():
+            out[name.strip()] = min(1.0, max(0.0, float(value)))
+    return out
+
+
+def sampling_config_from_env() -> SamplingConfig:
+    rate_s = float(os.getenv("LOG_RATE_LIMIT_PER_S", "0"))
+    return SamplingConfig(
+        default_rate=min(1.0, max(0.0, float(os.getenv("LOG_SAMPLE_RATE", "1.0")))),
+        logger_rates=_parse_rates(os.getenv("LOG_SAMPLE_RATES", "")),
+        tier_rates=_parse_rates(os.getenv("LOG_SAMPLE_TIER_RATES", "")),
+        per_key_rate_s=rate_s,
+        per_key_burst=float(os.getenv("LOG_RATE_LIMIT_BURST", str(max(1.0, rate_s)))),
+    )
+
+
+class SamplingFilter(logging.Filter):
+    """Drops a share of INFO/DEBUG records; WARNING and above (e.g. `slow_request`, errors) always pass.
+
+    Runs on the handler, so suppressed records never reach the formatter.
+    """
+
+    def __init__(self, config: SamplingConfig, *, rng: Optional[random.Random] = None) -> None:
+        super().__init__()
+        self.config = config
+        self._rng = rng or random.Random()
+        self._buckets: dict[tuple[str, str], _TokenBucket] = {}
+        self._logger_rate_cache: dict[str, float] = {}
+        # logger name -> {"sampled": n, "rate_limited": n}
+        self.suppressed: dict[str, dict[str, int]] = {}
+
+    def _logger_rate(self, name: str) -> float:
+        rate = self._logger_rate_cache.get(name)
+        if rate is None:
+            rate = self.config.default_rate
+            probe = name
+            while probe:
+                if probe in self.config.logger_rates:
+                    rate = self.config.logger_rates[probe]
+                    break
+                probe = probe.rpartition(".")[0]
+            self._logger_rate_cache[name] = rate
+        return rate
+
+    def _take_token(self, key: tuple[str, str]) -> bool:
+        cfg = self.config
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _TokenBucket(tokens=cfg.per_key_burst, updated_s=now)
+        else:
+            bucket.tokens = min(cfg.per_key_burst, bucket.tokens + (now - bucket.updated_s) * cfg.per_key_rate_s)
+            bucket.updated_s = now
+        if bucket.tokens >= 1.0:
+            bucket.tokens -= 1.0
+            return True
+        return False
+
+    def _suppress(self, name: str, reason: str) -> bool:
+        counts = self.suppressed.setdefault(name, {"sampled": 0, "rate_limited": 0})
+        counts[reason] += 1
+        return False
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        rate: Optional[float] = None
+        if self.config.tier_rates:
+            ctx = get_request_context()
+            if ctx is not None and ctx.tier is not None:
+                rate = self.config.tier_rates.get(ctx.tier)
+        if rate is not None and rate >= 1.0:
+            return True
+        if rate is None:
+            rate = self._logger_rate(record.name)
+
+        if rate < 1.0 and self._rng.random() >= rate:
+            return self._suppress(record.name, "sampled")
+
+        if self.config.per_key_rate_s > 0 and not self._take_token((record.name, str(record.msg))):
+            return self._suppress(record.name, "rate_limited")
+        return True
+
+
+_sampling_filter: Optional[SamplingFilter] = None
+
+
+def sampling_stats() -> dict[str, Any]:
+    """Counts of records suppressed by the sampling layer since startup, per logger."""
+    if _sampling_filter is None:
+        return {"enabled": False, "suppressed_total": 0, "suppressed": {}}
+    suppressed = {name: dict(counts) for name, counts in _sampling_filter.suppressed.items()}
+    return {
+        "enabled": True,
+        "suppressed_total": sum(sum(c.values()) for c in suppressed.values()),
+        "suppressed": suppressed,
+    }
+
+
+def _suppressed_samples() -> Iterator[tuple[tuple[str, str], float]]:
+    if _sampling_filter is None:
+        return
+    for name, counts in _sampling_filter.suppressed.items():
+        for reason, n in counts.items():
+            yield (name, reason), n
+
+
+metrics.callback(
+    "ira_log_records_suppressed_total",
+    "Log records dropped by sampling or per-key rate limiting.",
+    ["logger", "reason"],
+    _suppressed_samples,
+    type_name="counter",
+)
+
+
+def configure_logging(level: str = "INFO", *, sampling: Optional[SamplingConfig] = None) -> None:
+    global _sampling_filter
     root = logging.getLogger()
     root.setLevel(level.upper())
 
     handler = logging.StreamHandler(sys.stdout)
     handler.setFormatter(JsonFormatter())
 
+    # Keep the existing filter (and its counters) across reloads unless a new policy is passed.
+    if sampling is not None or _sampling_filter is None:
+        _sampling_filter = SamplingFilter(sampling or sampling_config_from_env())
+    handler.addFilter(_sampling_filter)
+
     # Replace handlers (idempotent for reload).
     root.handlers.clear()
     root.addHandler(handler)
@@ -55,5 +211,3 @@ def configure_logging(level: str = "INFO") -> None:
 
 def get_logger(name: str) -> logging.Logger:
     return logging.getLogger(name)
-
-
@@ -0,0 +1,208 @@
+"""Redis cache of each session's most recent messages, shared by all workers.
+
+- One list per session, newest first, trimmed to `max_messages`.
+- Reads are a single `LRANGE`; on a miss the messages come from `MessagesRepo.get_recent_for_session`
+  and fill the list.
+- Write-through: `append` pushes onto existing lists only (`LPUSHX`). A list that does not exist yet is
+  built from Mongo on the next read, so a partial list is never created.
+- Fills are guarded. `append` also bumps a per-session version key, in the same transaction. A miss
+  reads the version along with the `LRANGE`; after reading Mongo it fills under `WATCH`, and only if
+  the version is unchanged and the list still absent. Otherwise a turn appended while the Mongo read
+  was in flight would be missing from the list (its `LPUSHX` found no list) or pushed twice. A skipped
+  fill costs one more Mongo read on the next miss.
+- A filled list expires after `fill_ttl_s` (default 5 minutes, never past UTC midnight), which bounds
+  how long a list that still went wrong can be served.
+- Redis errors fall back to Mongo; the cache is never the source of truth.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Optional
+
+from redis.exceptions import WatchError
+
+from services.common import metrics
+from services.common.logging import get_logger
+from services.common.redis_client import get_redis
+from services.common.repos import MessagesRepo
+from services.common.request_context import stage
+
+
+log = get_logger("message_cache")
+
+_FIELDS = ("_id", "role", "content", "created_at")
+
+_LOOKUPS = metrics.counter(
+    "ira_message_cache_lookups_total",
+    "Recent-messages cache lookups (hit | miss | error = Redis failed, served from Mongo).",
+    ["result"],
+)
+_FILLS = metrics.counter(
+    "ira_message_cache_fills_total",
+    "Recent-messages cache fills (filled | skipped = appended or filled meanwhile | conflict | error).",
+    ["result"],
+)
+
+
+def _seconds_until_utc_midnight() -> int:
+    now = datetime.now(timezone.utc)
+    tomorrow = (now + timedelta(days=1)).date()
+    midnight = datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=timezone.utc)
+    return max(1, int((midnight - now).total_seconds()))
+
+
+def _encode(message: dict[str, Any]) -> str:
+    doc = {k: message.get(k) for k in _FIELDS}
+    if isinstance(doc["created_at"], datetime):
+        doc["created_at"] = doc["created_at"].isoformat()
+    return json.dumps(doc, separators=(",", ":"))
+
+
+def _decode(raw: str) -> dict[str, Any]:
+    doc = json.loads(raw)
+    if doc.get("created_at"):
+        doc["created_at"] = datetime.fromisoformat(doc["created_at"])
+    return doc
+
+
+class RecentMessagesCache:
+    def __init__(
+        self,
+        repo: Optional[MessagesRepo] = None,
+        *,
+        namespace: str = "ira",
+        max_messages: int = 20,
+        fill_ttl_s: int = 300,
+    ) -> None:
+        self._repo = repo
+        self.ns = namespace
+        self.max_messages = max_messages
+        self.fill_ttl_s = fill_ttl_s
+
+    @property
+    def repo(self) -> MessagesRepo:
+        if self._repo is None:
+            self._repo = MessagesRepo()
+        return self._repo
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.ns}:msgs:{session_id}"
+
+    def _version_key(self, session_id: str) -> str:
+        return f"{self.ns}:msgs:{session_id}:v"
+
+    async def get_recent(self, session_id: str, limit_n: int = 20) -> list[dict[str, Any]]:
+        """Newest-first recent messages, like `MessagesRepo.get_recent_for_session`."""
+        if limit_n > self.max_messages:
+            return await self.repo.get_recent_for_session(session_id, limit_n)
+        try:
+            with stage("redis"):
+                pipe = get_redis().pipeline(transaction=False)
+                pipe.lrange(self._key(session_id), 0, limit_n - 1)
+                pipe.get(self._version_key(session_id))
+                raw, version = await pipe.execute()
+        except Exception as e:  # noqa: BLE001
+            _LOOKUPS.labels("error").inc()
+            log.warning("message_cache_read_failed", extra={"extra": {"err": type(e).__name__}})
+            return await self.repo.get_recent_for_session(session_id, limit_n)
+        if raw:
+            _LOOKUPS.labels("hit").inc()
+            return [_decode(r) for r in raw]
+
+        _LOOKUPS.labels("miss").inc()
+        docs = await self.repo.get_recent_for_session(session_id, self.max_messages)
+        if docs:
+            await self._fill(session_id, docs, version)
+        return docs[:limit_n]
+
+    async def append(self, session_id: str, messages: Iterable[dict[str, Any]]) -> None:
+        """Write-through for messages already persisted to Mongo (oldest first)."""
+        encoded = [_encode(m) for m in messages]
+        if not encoded:
+            return
+        key, version_key = self._key(session_id), self._version_key(session_id)
+        try:
+            with stage("redis"):
+                pipe = get_redis().pipeline(transaction=True)
+                pipe.lpushx(key, *encoded)
+                pipe.ltrim(key, 0, self.max_messages - 1)
+                pipe.incr(version_key)
+                pipe.expire(version_key, _seconds_until_utc_midnight())
+                await pipe.execute()
+        except Exception as e:  # noqa: BLE001
+            # A stale list would serve wrong context until midnight; drop it instead.
+            log.warning("message_cache_append_failed", extra={"extra": {"err": type(e).__name__}})
+            await self.invalidate(session_id)
+
+    async def invalidate(self, session_id: str) -> None:
+        version_key = self._version_key(session_id)
+        try:
+            # Bumping the version also voids any fill whose Mongo read is in flight.
+            pipe = get_redis().pipeline(transaction=True)
+            pipe.delete(self._key(session_id))
+            pipe.incr(version_key)
+            pipe.expire(version_key, _seconds_until_utc_midnight())
+            await pipe.execute()
+        except Exception as e:  # noqa: BLE001
+            log.warning("message_cache_invalidate_failed", extra={"extra": {"err": type(e).__name__}})
+
+    async def warm(self, session_ids: Iterable[str], *, concurrency: int = 16) -> int:
+        """Load recent messages for `session_ids` (e.g. today's active sessions); returns lists filled."""
+        session_ids = list(session_ids)
+        if not session_ids:
+            return 0
+        try:
+            versions = await get_redis().mget(*(self._version_key(s) for s in session_ids))
+        except Exception as e:  # noqa: BLE001
+            log.warning("message_cache_warm_failed", extra={"extra": {"err": type(e).__name__}})
+            return 0
+        sem = asyncio.Semaphore(concurrency)
+
+        async def load(session_id: str, version: Optional[str]) -> bool:
+            async with sem:
+                docs = await self.repo.get_recent_for_session(session_id, self.max_messages)
+                return bool(docs) and await self._fill(session_id, docs, version)
+
+        return sum(await asyncio.gather(*(load(s, v) for s, v in zip(session_ids, versions))))
+
+    async def _fill(self, session_id: str, docs: list[dict[str, Any]], version: Optional[str]) -> bool:
+        """Fill from a Mongo read that started when the version key was `version`; False if skipped."""
+        key, version_key = self._key(session_id), self._version_key(session_id)
+        ttl = min(self.fill_ttl_s, _seconds_until_utc_midnight())
+        try:
+            with stage("redis"):
+                async with get_redis().pipeline(transaction=True) as pipe:
+                    await pipe.watch(key, version_key)
+                    if await pipe.get(version_key) != version or await pipe.exists(key):
+                        _FILLS.labels("skipped").inc()
+                        return False
+                    pipe.multi()
+                    pipe.rpush(key, *(_encode(d) for d in docs[: self.max_messages]))
+                    pipe.expire(key, ttl)
+                    await pipe.execute()
+        except WatchError:
+            _FILLS.labels("conflict").inc()
+            return False
+        except Exception as e:  # noqa: BLE001
+            _FILLS.labels("error").inc()
+            log.warning("message_cache_fill_failed", extra={"extra": {"err": type(e).__name__}})
+            return False
+        _FILLS.labels("filled").inc()
+        return True
+
+
+_cache: Optional[RecentMessagesCache] = None
+
+
+def get_message_cache() -> RecentMessagesCache:
+    global _cache
+    if _cache is None:
+        _cache = RecentMessagesCache(
+            max_messages=int(os.getenv("MESSAGE_CACHE_MAX_MESSAGES", "20")),
+            fill_ttl_s=int(os.getenv("MESSAGE_CACHE_FILL_TTL_S", "300")),
+        )
+    return _cache
@@ -0,0 +1,280 @@
+"""Write-behind persistence of chat messages.
+
+Workers enqueue each turn's messages; a background flusher writes them in batches:
+
+- one `insert_many(ordered=False)` on `messages` per flush;
+- one `bulk_write` on `sessions` with a single upsert per session (`$inc message_count`,
+  `$max last_activity_at`, `$setOnInsert` of the session skeleton), however many of its messages are
+  in the batch. The upsert keeps the counts when the session insert has not landed yet;
+- one `bulk_write` on `tier_day_rollups` with one `$inc` per (day, tier) (see `rollups`);
+- then, with `cache_writes` (`MESSAGE_CACHE_WRITE_THROUGH`, off by default), a write-through append to
+  the recent-messages cache. Nothing reads that cache on the request path yet, and the append only
+  extends lists a reader has filled, so until a reader exists it would be one wasted Redis
+  transaction per session per flush.
+
+The queue is bounded. When it is full, `submit` waits up to `enqueue_timeout_s` (backpressure) and
+then drops the turn, counting it. `stop()` drains the queue before returning. Messages still queued
+when a process is killed are lost; that is the trade-off for taking Mongo writes off the chat path.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from services.common import metrics, rollups
+from services.common.logging import get_logger
+from services.common.message_cache import RecentMessagesCache, get_message_cache
+from services.common.mongo import get_db
+from services.common.repos import session_doc
+from services.common.session_index import get_session_index
+
+
+log = get_logger("message_writer")
+
+_WRITTEN = metrics.counter("ira_message_writer_written_total", "Messages inserted by the write-behind writer.")
+_FAILURES = metrics.counter(
+    "ira_message_writer_failures_total", "Write-behind failures (messages for insert, sessions for session updates).", ["op"]
+)
+_DROPPED = metrics.counter("ira_message_writer_dropped_total", "Messages dropped because the writer queue stayed full.")
+_FLUSH_LATENCY = metrics.histogram("ira_message_writer_flush_seconds", "Write-behind flush duration (all writes).")
+_BATCH_SIZE = metrics.histogram(
+    "ira_message_writer_batch_messages", "Messages per write-behind flush.", buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def message_doc(
+    *, session_id: str, user_id: str, tier: str, role: str, content: str, created_at: Optional[datetime] = None
+) -> dict[str, Any]:
+    """A `messages` document (see docs/schema.md)."""
+    doc: dict[str, Any] = {
+        "_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "session_id": session_id,
+        "role": role,
+        "content": content,
+        "created_at": created_at or _utc_now(),
+        "tier": tier,
+    }
+    if role == "user":
+        doc["safety"] = {"blocked": False}
+    return doc
+
+
+def _session_skeleton(doc: dict[str, Any]) -> dict[str, Any]:
+    """`$setOnInsert` for a session first seen through its messages (the fields `$inc`/`$max` don't set)."""
+    skeleton = session_doc(session_id=doc["session_id"], user_id=doc["user_id"], tier=doc["tier"], now=doc["created_at"])
+    for field in ("_id", "message_count", "last_activity_at"):
+        del skeleton[field]
+    return skeleton
+
+
+class MessageWriter:
+    def __init__(
+        self,
+        db: Optional[AsyncIOMotorDatabase] = None,
+        *,
+        cache: Optional[RecentMessagesCache] = None,
+        cache_writes: bool = False,
+        max_queue: int = 10_000,
+        max_batch: int = 500,
+        flush_interval_s: float = 0.05,
+        enqueue_timeout_s: float = 0.05,
+    ) -> None:
+        self._db = db
+        self._cache = cache
+        self.cache_writes = cache_writes
+        self.max_batch = max_batch
+        self.flush_interval_s = flush_interval_s
+        self.enqueue_timeout_s = enqueue_timeout_s
+        # One item per turn, so a turn is never split; `max_queue` bounds turns, `max_batch` messages.
+        self._queue: asyncio.Queue[list[dict[str, Any]]] = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.dropped = 0
+
+    @property
+    def db(self) -> AsyncIOMotorDatabase:
+        if self._db is None:
+            self._db = get_db()
+        return self._db
+
+    @property
+    def cache(self) -> RecentMessagesCache:
+        if self._cache is None:
+            self._cache = get_message_cache()
+        return self._cache
+
+    def depth(self) -> int:
+        """Queued turns."""
+        return self._queue.qsize()
+
+    async def submit(self, docs: list[dict[str, Any]]) -> bool:
+        """Enqueue one turn's messages; returns False if they were dropped (queue full)."""
+        try:
+            await asyncio.wait_for(self._queue.put(docs), timeout=self.enqueue_timeout_s)
+        except asyncio.TimeoutError:
+            self.dropped += len(docs)
+            _DROPPED.inc(len(docs))
+            return False
+        return True
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher after draining everything still queued."""
+        if self._task is None:
+            return
+        self._stopping = True
+        await self._task
+        self._task = None
+        if self.dropped:
+            log.warning("messages_dropped", extra={"extra": {"dropped": self.dropped}})
+
+    async def _run(self) -> None:
+        while not self._stopping or not self._queue.empty():
+            try:
+                first = await asyncio.wait_for(self._queue.get(), timeout=self.flush_interval_s)
+            except asyncio.TimeoutError:
+                continue
+            batch = list(first)
+            # Give concurrent turns one interval to join the batch.
+            deadline = time.perf_counter() + self.flush_interval_s
+            while len(batch) < self.max_batch:
+                try:
+                    batch.extend(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or self._stopping:
+                    break
+                try:
+                    batch.extend(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self.flush(batch)
+
+    async def flush(self, batch: list[dict[str, Any]]) -> None:
+        if not batch:
+            return
+        start = time.perf_counter()
+        _BATCH_SIZE.observe(len(batch))
+        try:
+            written = await self._insert(batch)
+            if written:
+                await self._update_sessions(written)
+                await rollups.apply(self.db, rollups.message_updates(written))
+                if self.cache_writes:
+                    await self._append_to_cache(written)
+        finally:
+            _FLUSH_LATENCY.observe(time.perf_counter() - start)
+
+    async def _insert(self, batch: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        try:
+            await self.db.messages.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # ordered=False: everything except the reported indexes was inserted.
+            failed = {err["index"] for err in e.details.get("writeErrors", [])}
+            _FAILURES.labels("messages").inc(len(failed))
+            log.warning("message_insert_partial", extra={"extra": {"failed": len(failed), "batch": len(batch)}})
+            written = [doc for i, doc in enumerate(batch) if i not in failed]
+        except Exception as e:  # noqa: BLE001
+            _FAILURES.labels("messages").inc(len(batch))
+            log.warning("message_insert_failed", extra={"extra": {"err": type(e).__name__, "batch": len(batch)}})
+            return []
+        else:
+            written = batch
+        _WRITTEN.inc(len(written))
+        return written
+
+    async def _update_sessions(self, written: list[dict[str, Any]]) -> None:
+        counts: dict[str, int] = defaultdict(int)
+        first: dict[str, dict[str, Any]] = {}
+        last_at: dict[str, datetime] = {}
+        for doc in written:
+            sid = doc["session_id"]
+            counts[sid] += 1
+            if sid not in first or doc["created_at"] < first[sid]["created_at"]:
+                first[sid] = doc
+            last_at[sid] = max(last_at.get(sid, doc["created_at"]), doc["created_at"])
+        ops = [
+            UpdateOne(
+                {"_id": sid},
+                {
+                    "$inc": {"message_count": n},
+                    "$max": {"last_activity_at": last_at[sid]},
+                    "$setOnInsert": _session_skeleton(first[sid]),
+                },
+                upsert=True,
+            )
+            for sid, n in counts.items()
+        ]
+        try:
+            await self.db.sessions.bulk_write(ops, ordered=False)
+        except Exception as e:  # noqa: BLE001
+            _FAILURES.labels("sessions").inc(len(ops))
+            log.warning("session_update_failed", extra={"extra": {"err": type(e).__name__, "sessions": len(ops)}})
+
+    async def _append_to_cache(self, written: list[dict[str, Any]]) -> None:
+        by_session: dict[str, list[dict[str, Any]]] = defaultdict(list)
+        for doc in sorted(written, key=lambda d: d["created_at"]):
+            by_session[doc["session_id"]].append(doc)
+        await asyncio.gather(*(self.cache.append(sid, docs) for sid, docs in by_session.items()))
+
+
+async def record_turn(
+    writer: MessageWriter, *, user_id: str, tier: str, message: str, reply: str, received_at: datetime
+) -> None:
+    """Resolve today's session and queue the user message plus the reply; never raises."""
+    try:
+        session = await get_session_index().get_or_start(user_id=user_id, tier=tier)
+    except Exception as e:  # noqa: BLE001
+        log.warning("session_resolve_failed", extra={"extra": {"err": type(e).__name__}})
+        return
+    common = {"session_id": session.session_id, "user_id": user_id, "tier": tier}
+    await writer.submit(
+        [
+            message_doc(**common, role="user", content=message, created_at=received_at),
+            message_doc(**common, role="assistant", content=reply),
+        ]
+    )
+
+
+_writer: Optional[MessageWriter] = None
+
+
+def get_message_writer() -> MessageWriter:
+    global _writer
+    if _writer is None:
+        _writer = MessageWriter(
+            cache_writes=os.getenv("MESSAGE_CACHE_WRITE_THROUGH", "false").lower() in {"1", "true", "yes"},
+            max_queue=int(os.getenv("MESSAGE_WRITER_MAX_QUEUE", "10000")),
+            max_batch=int(os.getenv("MESSAGE_WRITER_MAX_BATCH", "500")),
+            flush_interval_s=float(os.getenv("MESSAGE_WRITER_FLUSH_INTERVAL_MS", "50")) / 1000.0,
+        )
+    return _writer
+
+
+def _queue_depth() -> Iterator[tuple[tuple[()], float]]:
+    if _writer is not None:
+        yield (), _writer.depth()
+
+
+metrics.callback("ira_message_writer_queue_depth", "Turns waiting to be written.", [], _queue_depth)
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import asyncio
+import importlib.util
 import os
-from typing import Any
+from dataclasses import dataclass
+from typing import Any, Literal, Optional
 
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ReadPreference
 
 from services.common.logging import get_logger
 
@@ -11,26 +15,150 @@ from services.common.logging import get_logger
 log = get_logger("mongo")
 
 _client: AsyncIOMotorClient | None = None
+_profile: Optional["MongoProfile"] = None
+
+ReadMode = Literal["primary", "secondaryPreferred"]
+
+
+@dataclass(frozen=True)
+class MongoProfile:
+    """Client policy for one kind of process. Timeouts are in milliseconds; None = driver default."""
+
+    name: str
+    max_pool_size: int
+    min_pool_size: int
+    server_selection_timeout_ms: int
+    connect_timeout_ms: int
+    socket_timeout_ms: Optional[int]
+    max_idle_time_ms: Optional[int] = None
+    # Connections opened by `warm_up()` at startup (0 = none).
+    warm_connections: int = 0
+
+
+PROFILES: dict[str, MongoProfile] = {
+    # Router/workers: point reads and small batched writes. Fail fast rather than hold a request.
+    "hot": MongoProfile(
+        name="hot",
+        max_pool_size=100,
+        min_pool_size=10,
+        server_selection_timeout_ms=2_000,
+        connect_timeout_ms=2_000,
+        socket_timeout_ms=5_000,
+        max_idle_time_ms=300_000,
+        warm_connections=10,
+    ),
+    # Aggregations/rollups: few connections, long-running commands.
+    "analytics": MongoProfile(
+        name="analytics",
+        max_pool_size=10,
+        min_pool_size=0,
+        server_selection_timeout_ms=10_000,
+        connect_timeout_ms=5_000,
+        socket_timeout_ms=300_000,
+    ),
+    # Seeder/backfills: large bulk writes, no socket timeout.
+    "bulk": MongoProfile(
+        name="bulk",
+        max_pool_size=32,
+        min_pool_size=0,
+        server_selection_timeout_ms=30_000,
+        connect_timeout_ms=10_000,
+        socket_timeout_ms=None,
+    ),
+}
+
+
+def _available_compressors(requested: str) -> list[str]:
+    # pymongo drops (with a warning) compressors whose library is missing; filter quietly instead.
+    modules = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+    return [c for c in (x.strip() for x in requested.split(",")) if c in modules and importlib.util.find_spec(modules[c])]
+
+
+def get_profile() -> MongoProfile:
+    """Profile from `MONGO_PROFILE` (default `hot`), with `MONGO_MAX_POOL_SIZE` / `MONGO_MIN_POOL_SIZE` overrides."""
+    base = PROFILES[os.getenv("MONGO_PROFILE", "hot")]
+    return MongoProfile(
+        name=base.name,
+        max_pool_size=int(os.getenv("MONGO_MAX_POOL_SIZE", str(base.max_pool_size))),
+        min_pool_size=int(os.getenv("MONGO_MIN_POOL_SIZE", str(base.min_pool_size))),
+        server_selection_timeout_ms=base.server_selection_timeout_ms,
+        connect_timeout_ms=base.connect_timeout_ms,
+        socket_timeout_ms=base.socket_timeout_ms,
+        max_idle_time_ms=base.max_idle_time_ms,
+        warm_connections=int(os.getenv("MONGO_WARM_CONNECTIONS", str(base.warm_connections))),
+    )
+
+
+def client_options(profile: MongoProfile) -> dict[str, Any]:
+    """`AsyncIOMotorClient` keyword arguments for `profile` (also used by scripts)."""
+    opts: dict[str, Any] = {
+        "maxPoolSize": profile.max_pool_size,
+        "minPoolSize": profile.min_pool_size,
+        "serverSelectionTimeoutMS": profile.server_selection_timeout_ms,
+        "connectTimeoutMS": profile.connect_timeout_ms,
+        "socketTimeoutMS": profile.socket_timeout_ms,
+        "retryWrites": True,
+        "appname": f"ira-{profile.name}",
+    }
+    if profile.max_idle_time_ms is not None:
+        opts["maxIdleTimeMS"] = profile.max_idle_time_ms
+    compressors = _available_compressors(os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib"))
+    if compressors:
+        opts["compressors"] = ",".join(compressors)
+    return opts
 
 
 def get_mongo_client() -> AsyncIOMotorClient:
-    global _client
+    global _client, _profile
     if _client is None:
         uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-        log.info("mongo_connect", extra={"extra": {"uri": uri}})
-        _client = AsyncIOMotorClient(uri)
+        _profile = get_profile()
+        opts = client_options(_profile)
+        log.info("mongo_connect", extra={"extra": {"uri": uri, "profile": _profile.name, "compressors": opts.get("compressors")}})
+        # Profile options override the same options given in MONGO_URI.
+        _client = AsyncIOMotorClient(uri, **opts)
     return _client
 
 
-def get_db() -> AsyncIOMotorDatabase:
+def get_db(*, read: ReadMode = "primary") -> AsyncIOMotorDatabase:
+    """Application database.
+
+    `read="secondaryPreferred"` is for reads that tolerate replication lag (analytics, history);
+    writes and read-your-own-write lookups, including conversation context, stay on the primary. On a
+    standalone mongod both behave the same.
+    """
     name = os.getenv("MONGO_DB", "ira")
-    return get_mongo_client()[name]
+    client = get_mongo_client()
+    if read == "primary":
+        return client[name]
+    return client.get_database(name, read_preference=ReadPreference.SECONDARY_PREFERRED)
+
+
+async def warm_up(connections: Optional[int] = None) -> int:
+    """Open pool connections before serving traffic, so first requests skip TCP/TLS/auth handshakes.
+
+    Runs that many concurrent pings (each holds its own connection); returns how many succeeded.
+    Failures are logged, not raised: an unreachable Mongo delays startup by at most the profile's
+    server-selection timeout.
+    """
+    client = get_mongo_client()
+    n = connections if connections is not None else (_profile.warm_connections if _profile else 0)
+    if n <= 0:
+        return 0
+    results = await asyncio.gather(*(client.admin.command("ping") for _ in range(n)), return_exceptions=True)
+    ok = sum(1 for r in results if not isinstance(r, BaseException))
+    if ok < n:
+        errors = {type(r).__name__ for r in results if isinstance(r, BaseException)}
+        log.warning("mongo_warm_up_partial", extra={"extra": {"ok": ok, "requested": n, "errors": sorted(errors)}})
+    else:
+        log.info("mongo_warm_up", extra={"extra": {"connections": ok}})
+    return ok
 
 
 async def close_mongo() -> None:
-    global _client
+    global _client, _profile
     if _client is not None:
         log.info("mongo_close")
         _client.close()
         _client = None
-
+        _profile = None
@@ -0,0 +1,314 @@
+"""Per-worker read-through cache for personalities.
+
+- Bounded LRU with TTL; users without a personality are cached too (negative entries, shorter TTL).
+- Invalidated by a MongoDB change stream on `personalities`. On a standalone mongod (no change
+  streams) it falls back to polling `updated_at` for recently changed documents.
+- TTL bounds staleness if invalidation is lagging or a delete is missed by polling.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Iterator, Literal, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import OperationFailure
+
+from services.common import metrics
+from services.common.logging import get_logger
+from services.common.mongo import get_db
+from services.common.repos import PersonalitiesRepo
+
+
+log = get_logger("personality_cache")
+
+WatchMode = Literal["stopped", "change_stream", "polling"]
+
+# Error code returned by mongod when $changeStream is used on a standalone server.
+_CHANGE_STREAM_UNSUPPORTED = 40573
+_WATCHED_OPS = ["insert", "update", "replace", "delete", "drop", "rename", "dropDatabase", "invalidate"]
+
+
+def _as_utc(dt: datetime) -> datetime:
+    # Motor returns naive UTC datetimes unless the client is tz_aware.
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+@dataclass
+class _Entry:
+    value: Optional[dict[str, Any]]  # None = user has no personality (negative entry)
+    expires_at: float
+    loaded_at: float
+
+
+class PersonalityCache:
+    def __init__(
+        self,
+        repo: Optional[PersonalitiesRepo] = None,
+        col: Optional[AsyncIOMotorCollection] = None,
+        *,
+        max_entries: int = 50_000,
+        ttl_s: float = 300.0,
+        negative_ttl_s: float = 60.0,
+        poll_interval_s: float = 2.0,
+    ) -> None:
+        self._repo = repo
+        self._col = col
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self.poll_interval_s = poll_interval_s
+
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        # personality _id -> user_id, so delete events (which only carry _id) can be mapped.
+        self._user_by_pid: dict[str, str] = {}
+        # Invalidation sequence numbers, so a load that raced with an invalidation is not cached.
+        self._seq = 0
+        self._cleared_seq = 0
+        self._invalidated_seq: dict[str, int] = {}
+        self._loading = 0
+        self._task: Optional[asyncio.Task] = None
+        self.mode: WatchMode = "stopped"
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.load_errors = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.max_invalidation_lag_s = 0.0
+
+    @property
+    def repo(self) -> PersonalitiesRepo:
+        if self._repo is None:
+            self._repo = PersonalitiesRepo()
+        return self._repo
+
+    @property
+    def col(self) -> AsyncIOMotorCollection:
+        if self._col is None:
+            self._col = get_db().personalities
+        return self._col
+
+    # --- reads ---------------------------------------------------------------------------
+
+    async def get(self, user_id: str) -> Optional[dict[str, Any]]:
+        now = time.monotonic()
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            if entry.expires_at > now:
+                self._entries.move_to_end(user_id)
+                if entry.value is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                _SERVED_AGE.observe(now - entry.loaded_at)
+                return entry.value
+            self.expirations += 1
+            self._drop(user_id)
+
+        self.misses += 1
+        start_seq = self._seq
+        self._loading += 1
+        try:
+            doc = await self.repo.get_latest_tone_for_user(user_id)
+        finally:
+            self._loading -= 1
+        if self._cleared_seq <= start_seq and self._invalidated_seq.get(user_id, 0) <= start_seq:
+            self._put(user_id, doc, time.monotonic())
+        if self._loading == 0:
+            self._invalidated_seq.clear()
+        return doc
+
+    async def tone_for(self, user_id: str, default: str = "warm") -> str:
+        """Personality tone for replies; falls back to `default` if Mongo is unavailable."""
+        try:
+            doc = await self.get(user_id)
+        except Exception as e:  # noqa: BLE001
+            self.load_errors += 1
+            log.warning("personality_load_failed", extra={"extra": {"err": type(e).__name__}})
+            return default
+        return (doc or {}).get("tone") or default
+
+    def _put(self, user_id: str, doc: Optional[dict[str, Any]], now: float) -> None:
+        ttl = self.ttl_s if doc is not None else self.negative_ttl_s
+        self._drop(user_id)
+        self._entries[user_id] = _Entry(value=doc, expires_at=now + ttl, loaded_at=now)
+        if doc is not None and doc.get("_id") is not None:
+            self._user_by_pid[str(doc["_id"])] = user_id
+        while len(self._entries) > self.max_entries:
+            oldest, _ = next(iter(self._entries.items()))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, user_id: str) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None and entry.value is not None:
+            self._user_by_pid.pop(str(entry.value.get("_id")), None)
+
+    # --- invalidation --------------------------------------------------------------------
+
+    def invalidate(self, user_id: str, *, updated_at: Optional[datetime] = None) -> None:
+        self._seq += 1
+        if self._loading:
+            self._invalidated_seq[user_id] = self._seq
+        if user_id in self._entries:
+            self._drop(user_id)
+            self.invalidations += 1
+        if updated_at is not None:
+            lag = (datetime.now(timezone.utc) - _as_utc(updated_at)).total_seconds()
+            self.max_invalidation_lag_s = max(self.max_invalidation_lag_s, lag)
+
+    def invalidate_personality_id(self, personality_id: Any) -> None:
+        user_id = self._user_by_pid.get(str(personality_id))
+        if user_id is not None:
+            self.invalidate(user_id)
+
+    def clear(self) -> None:
+        self._seq += 1
+        self._cleared_seq = self._seq
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._user_by_pid.clear()
+
+    def apply_change(self, change: dict[str, Any]) -> None:
+        """Apply one change-stream event."""
+        op = change.get("operationType")
+        if op in {"insert", "update", "replace"}:
+            doc = change.get("fullDocument") or {}
+            if doc.get("user_id") is not None:
+                self.invalidate(doc["user_id"], updated_at=doc.get("updated_at"))
+            else:
+                self.invalidate_personality_id((change.get("documentKey") or {}).get("_id"))
+        elif op == "delete":
+            self.invalidate_personality_id((change.get("documentKey") or {}).get("_id"))
+        elif op in {"drop", "rename", "dropDatabase", "invalidate"}:
+            self.clear()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.mode = "stopped"
+
+    async def _watch(self) -> None:
+        backoff_s = 0.5
+        while True:
+            try:
+                pipeline = [{"$match": {"operationType": {"$in": _WATCHED_OPS}}}]
+                async with self.col.watch(pipeline, full_document="updateLookup") as stream:
+                    self.mode = "change_stream"
+                    log.info("personality_cache_watch", extra={"extra": {"mode": self.mode}})
+                    backoff_s = 0.5
+                    async for change in stream:
+                        self.apply_change(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == _CHANGE_STREAM_UNSUPPORTED:
+                    await self._poll()  # runs until cancelled
+                log.warning("personality_cache_watch_failed", extra={"extra": {"err": type(e).__name__, "code": e.code}})
+            except Exception as e:  # noqa: BLE001
+                log.warning("personality_cache_watch_failed", extra={"extra": {"err": type(e).__name__}})
+            # Events may have been missed while the stream was down.
+            self.clear()
+            await asyncio.sleep(backoff_s)
+            backoff_s = min(backoff_s * 2, 30.0)
+
+    async def _poll(self) -> None:
+        self.mode = "polling"
+        log.info("personality_cache_watch", extra={"extra": {"mode": self.mode}})
+        watermark = datetime.now(timezone.utc)
+        while True:
+            await asyncio.sleep(self.poll_interval_s)
+            try:
+                watermark = await self.poll_once(watermark)
+            except Exception as e:  # noqa: BLE001
+                log.warning("personality_cache_poll_failed", extra={"extra": {"err": type(e).__name__}})
+
+    async def poll_once(self, watermark: datetime) -> datetime:
+        """Invalidate users whose personality changed after `watermark`; returns the new watermark."""
+        cursor = self.col.find(
+            {"updated_at": {"$gt": watermark}},
+            projection={"_id": 0, "user_id": 1, "updated_at": 1},
+            sort=[("updated_at", 1)],
+        )
+        async for doc in cursor:
+            self.invalidate(doc["user_id"], updated_at=doc["updated_at"])
+            watermark = max(watermark, _as_utc(doc["updated_at"]))
+        return watermark
+
+    # --- stats ---------------------------------------------------------------------------
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "mode": self.mode,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+            "load_errors": self.load_errors,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "max_invalidation_lag_s": round(self.max_invalidation_lag_s, 3),
+        }
+
+
+_cache: Optional[PersonalityCache] = None
+
+
+def get_personality_cache() -> PersonalityCache:
+    global _cache
+    if _cache is None:
+        _cache = PersonalityCache(
+            max_entries=int(os.getenv("PERSONALITY_CACHE_MAX_ENTRIES", "50000")),
+            ttl_s=float(os.getenv("PERSONALITY_CACHE_TTL_S", "300")),
+            negative_ttl_s=float(os.getenv("PERSONALITY_CACHE_NEGATIVE_TTL_S", "60")),
+            poll_interval_s=float(os.getenv("PERSONALITY_CACHE_POLL_INTERVAL_S", "2.0")),
+        )
+    return _cache
+
+
+_SERVED_AGE = metrics.histogram(
+    "ira_personality_cache_served_age_seconds",
+    "Age of personality cache entries when served (staleness bound).",
+    buckets=(0.1, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+)
+
+
+def _cache_samples() -> Iterator[tuple[tuple[str], float]]:
+    if _cache is None:
+        return
+    for event in ("hits", "negative_hits", "misses", "load_errors", "evictions", "expirations", "invalidations"):
+        yield (event,), getattr(_cache, event)
+
+
+def _cache_gauges() -> Iterator[tuple[tuple[str], float]]:
+    if _cache is None:
+        return
+    s = _cache.stats()
+    for key in ("entries", "hit_ratio", "max_invalidation_lag_s"):
+        yield (key,), s[key]
+
+
+metrics.callback(
+    "ira_personality_cache_events_total", "Personality cache events.", ["event"], _cache_samples, type_name="counter"
+)
+metrics.callback("ira_personality_cache", "Personality cache gauges (entries, hit_ratio, invalidation lag).", ["stat"], _cache_gauges)
@@ -0,0 +1,260 @@
+"""Opt-in, time-boxed profiling of a live service.
+
+Disabled unless `PROFILING_ENABLED=true`: no routes, threads or hooks exist otherwise. When enabled,
+`POST /debug/profile` runs one profile at a time for a bounded window and returns:
+
+- `sample` (default): a thread sampling the event-loop thread's stack every `interval_ms`, reported
+  as collapsed stacks (`frame;frame;frame count`, the input format of flamegraph.pl / speedscope).
+- `cprofile` / `yappi`: deterministic profile of the loop thread, reported as top functions.
+
+Every mode also measures event-loop lag and reports slow callbacks (loop blocked for longer than
+`slow_callback_ms`) with the stack most often sampled while the loop was blocked.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from types import FrameType
+from typing import Any, Literal, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from services.common.logging import get_logger
+
+
+log = get_logger("profiling")
+
+ProfileMode = Literal["sample", "cprofile", "yappi"]
+
+MAX_PROFILE_SECONDS = 60.0
+# Leaf frames meaning "loop waiting for IO": selector polls (asyncio) or the frame that entered uvloop's C loop.
+_IDLE_LEAVES = {
+    ("selectors", "EpollSelector.select"),
+    ("selectors", "KqueueSelector.select"),
+    ("selectors", "SelectSelector.select"),
+    ("runners", "Runner.run"),
+}
+
+_busy = asyncio.Lock()
+
+
+def profiling_enabled() -> bool:
+    return os.getenv("PROFILING_ENABLED", "false").lower() in {"1", "true", "yes"}
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _collapse(frame: Optional[FrameType]) -> tuple[str, ...]:
+    stack: list[str] = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()  # root first, as flamegraph tools expect
+    return tuple(stack)
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread."""
+
+    def __init__(self, thread_id: int, *, interval_s: float = 0.005, include_idle: bool = False) -> None:
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.include_idle = include_idle
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        # (perf_counter, stack) of recent busy samples, used to attribute slow callbacks.
+        self.recent: deque[tuple[float, tuple[str, ...]]] = deque(maxlen=4096)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ira-stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = _collapse(frame)
+            self.samples += 1
+            leaf = stack[-1].split(":", 1) if stack else ("", "")
+            if (leaf[0], leaf[1]) in _IDLE_LEAVES:
+                self.idle_samples += 1
+                if not self.include_idle:
+                    continue
+            else:
+                self.recent.append((time.perf_counter(), stack))
+            self.stacks[stack] += 1
+
+    def dominant_stack_between(self, start: float, end: float) -> Optional[str]:
+        window = Counter(stack for ts, stack in self.recent if start <= ts <= end)
+        if not window:
+            return None
+        return ";".join(window.most_common(1)[0][0])
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{';'.join(stack)} {n}" for stack, n in self.stacks.most_common())
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic `asyncio.sleep` wakes up, i.e. how long the loop was blocked."""
+
+    def __init__(self, *, interval_s: float = 0.01, slow_callback_s: float = 0.05) -> None:
+        self.interval_s = interval_s
+        self.slow_callback_s = slow_callback_s
+        self.lags_s: list[float] = []
+        self.slow: list[tuple[float, float]] = []  # (wake perf_counter, lag_s)
+
+    async def run(self, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            expected = time.perf_counter() + self.interval_s
+            await asyncio.sleep(self.interval_s)
+            now = time.perf_counter()
+            lag = max(0.0, now - expected)
+            self.lags_s.append(lag)
+            if lag >= self.slow_callback_s:
+                self.slow.append((now, lag))
+
+    def summary(self) -> dict[str, Any]:
+        lags = sorted(self.lags_s)
+        if not lags:
+            return {"checks": 0, "mean_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        return {
+            "checks": len(lags),
+            "mean_ms": round(sum(lags) / len(lags) * 1000.0, 3),
+            "p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000.0, 3),
+            "max_ms": round(lags[-1] * 1000.0, 3),
+        }
+
+
+def _pstats_top(profile: cProfile.Profile, limit: int) -> str:
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+def _yappi_top(yappi: Any, limit: int) -> list[dict[str, Any]]:
+    stats = yappi.get_func_stats()
+    stats.sort("ttot", "desc")
+    return [
+        {"name": f"{os.path.basename(s.module)}:{s.name}", "calls": s.ncall, "ttot_s": round(s.ttot, 6), "tsub_s": round(s.tsub, 6)}
+        for s in list(stats)[:limit]
+    ]
+
+
+async def run_profile(
+    *,
+    seconds: float,
+    mode: ProfileMode = "sample",
+    interval_ms: float = 5.0,
+    slow_callback_ms: float = 50.0,
+    include_idle: bool = False,
+    limit: int = 50,
+) -> dict[str, Any]:
+    """Profile the running event loop for `seconds` and return stacks plus loop-lag stats."""
+    seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+    loop_thread = threading.get_ident()
+    # The sampler always runs: it provides the stacks used to attribute slow callbacks.
+    sampler = StackSampler(loop_thread, interval_s=interval_ms / 1000.0, include_idle=include_idle)
+    lag = LoopLagMonitor(slow_callback_s=slow_callback_ms / 1000.0)
+    stop = asyncio.Event()
+
+    profile: Optional[cProfile.Profile] = None
+    yappi: Any = None
+    if mode == "cprofile":
+        profile = cProfile.Profile()
+    elif mode == "yappi":
+        try:
+            import yappi  # type: ignore[import-not-found,no-redef]
+        except ImportError as e:
+            raise HTTPException(status_code=400, detail="yappi is not installed") from e
+
+    sampler.start()
+    lag_task = asyncio.create_task(lag.run(stop))
+    started = time.perf_counter()
+    try:
+        if profile is not None:
+            profile.enable()  # profiles the calling (event-loop) thread
+        elif yappi is not None:
+            yappi.set_clock_type("wall")
+            yappi.start()
+        await asyncio.sleep(seconds)
+    finally:
+        if profile is not None:
+            profile.disable()
+        elif yappi is not None:
+            yappi.stop()
+        stop.set()
+        await lag_task
+        sampler.stop()
+
+    result: dict[str, Any] = {
+        "mode": mode,
+        "seconds": round(time.perf_counter() - started, 3),
+        "interval_ms": interval_ms,
+        "samples": sampler.samples,
+        "idle_samples": sampler.idle_samples,
+        "collapsed": sampler.collapsed(),
+        "loop_lag": lag.summary(),
+        "slow_callbacks": [
+            {"lag_ms": round(l * 1000.0, 2), "stack": sampler.dominant_stack_between(ts - l, ts)}
+            for ts, l in lag.slow
+        ],
+    }
+    if profile is not None:
+        result["top"] = _pstats_top(profile, limit)
+    elif yappi is not None:
+        result["top"] = _yappi_top(yappi, limit)
+        yappi.clear_stats()
+    return result
+
+
+def install_profiling_routes(app: FastAPI) -> None:
+    token = os.getenv("PROFILING_TOKEN")
+    if not token:
+        raise ValueError("PROFILING_ENABLED is set but PROFILING_TOKEN is empty; refusing to expose /debug/profile")
+
+    @app.post("/debug/profile")
+    async def profile(
+        seconds: float = Query(5.0, gt=0, le=MAX_PROFILE_SECONDS),
+        mode: ProfileMode = "sample",
+        interval_ms: float = Query(5.0, ge=1.0, le=1000.0),
+        slow_callback_ms: float = Query(50.0, ge=1.0),
+        include_idle: bool = False,
+        format: Literal["json", "collapsed"] = "json",
+        x_admin_token: Optional[str] = Header(None),
+    ):
+        if x_admin_token != token:
+            raise HTTPException(status_code=403, detail="forbidden")
+        if _busy.locked():
+            raise HTTPException(status_code=409, detail="profile already running")
+        async with _busy:
+            log.warning("profile_started", extra={"extra": {"mode": mode, "seconds": seconds}})
+            result = await run_profile(
+                seconds=seconds,
+                mode=mode,
+                interval_ms=interval_ms,
+                slow_callback_ms=slow_callback_ms,
+                include_idle=include_idle,
+            )
+        if format == "collapsed":
+            return PlainTextResponse(result["collapsed"] + "\n")
+        return result
@@ -1,15 +1,28 @@
 from __future__ import annotations
 
 import math
+import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Literal, Optional
 
+from services.common import metrics
+from services.common.logging import get_logger
 from services.common.redis_client import get_redis
+from services.common.request_context import stage
 
 
 Tier = Literal["free", "premium", "enterprise"]
 
+log = get_logger("rate_limit")
+
+_DECISIONS = metrics.counter(
+    "ira_rate_limit_decisions_total",
+    "Limiter decisions by tier and result (allowed | first_notice | silent | unlimited | refunded).",
+    ["tier", "result"],
+)
+_REDIS_LATENCY = metrics.histogram("ira_rate_limit_redis_seconds", "Redis time per limiter check.")
+
 
 def _utc_now() -> datetime:
     return datetime.now(timezone.utc)
@@ -41,6 +54,8 @@ class RateLimitResult:
     remaining: Optional[int]
     reset_in_seconds: int
     first_notice: bool
+    # Day the message was counted against (None when nothing was counted); see `refund`.
+    day: Optional[str] = None
 
 
 class SessionDayLimiter:
@@ -66,6 +81,7 @@ class SessionDayLimiter:
         day = _utc_day_key()
 
         if limit is None:
+            _DECISIONS.labels(tier, "unlimited").inc()
             return RateLimitResult(allowed=True, remaining=None, reset_in_seconds=reset_in, first_notice=False)
 
         r = get_redis()
@@ -73,26 +89,35 @@ class SessionDayLimiter:
         notice_key = self._notice_key(user_id, day)
 
         # Increment first, then evaluate. Set expiries to midnight.
-        pipe = r.pipeline()
-        pipe.incr(count_key)
-        pipe.ttl(count_key)
-        res = await pipe.execute()
-        count = int(res[0])
-        ttl = int(res[1])
-
-        # If ttl wasn't set yet, set it.
-        if ttl < 0:
-            await r.expire(count_key, reset_in)
+        redis_start = time.perf_counter()
+        with stage("redis"):
+            pipe = r.pipeline()
+            pipe.incr(count_key)
+            pipe.ttl(count_key)
+            res = await pipe.execute()
+            count = int(res[0])
+            ttl = int(res[1])
+
+            # If ttl wasn't set yet, set it.
+            if ttl < 0:
+                await r.expire(count_key, reset_in)
 
         remaining = max(0, limit - count)
         allowed = count <= limit
 
         if allowed:
-            return RateLimitResult(allowed=True, remaining=remaining, reset_in_seconds=reset_in, first_notice=False)
+            _REDIS_LATENCY.observe(time.perf_counter() - redis_start)
+            _DECISIONS.labels(tier, "allowed").inc()
+            return RateLimitResult(
+                allowed=True, remaining=remaining, reset_in_seconds=reset_in, first_notice=False, day=day
+            )
 
         # Over limit: check whether we've already sent a notice today.
         # Use SET NX with expiry to avoid repeated messages.
-        first_notice = await r.set(notice_key, "1", ex=reset_in, nx=True)
+        with stage("redis"):
+            first_notice = await r.set(notice_key, "1", ex=reset_in, nx=True)
+        _REDIS_LATENCY.observe(time.perf_counter() - redis_start)
+        _DECISIONS.labels(tier, "first_notice" if first_notice else "silent").inc()
         return RateLimitResult(
             allowed=False,
             remaining=0,
@@ -100,6 +125,26 @@ class SessionDayLimiter:
             first_notice=bool(first_notice),
         )
 
+    async def refund(self, *, user_id: str, tier: Tier, result: RateLimitResult) -> None:
+        """Give back a message counted by `check_and_increment` that was not served (e.g. the LLM failed
+        and the router retries another pool, which counts it again). Never raises."""
+        if not result.allowed or result.day is None:
+            return
+        count_key = self._count_key(user_id, result.day)
+        try:
+            with stage("redis"):
+                pipe = get_redis().pipeline()
+                pipe.decr(count_key)
+                pipe.ttl(count_key)
+                _, ttl = await pipe.execute()
+                if int(ttl) == -1:
+                    # The day's key had already expired; DECR just created it, without an expiry.
+                    await get_redis().delete(count_key)
+        except Exception as e:  # noqa: BLE001
+            log.warning("rate_limit_refund_failed", extra={"extra": {"user_id": user_id, "err": type(e).__name__}})
+            return
+        _DECISIONS.labels(tier, "refunded").inc()
+
 
 def human_reset_message(reset_in_seconds: int) -> str:
     # We keep it simple and human-sounding.
@@ -1,11 +1,33 @@
 from __future__ import annotations
 
+import asyncio
+import os
+import uuid
 from datetime import datetime, timezone
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Generic, Hashable, Optional, TypeVar
 
 from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
+from services.common import metrics, rollups
 from services.common.mongo import get_db
+from services.common.request_context import stage
+
+
+T = TypeVar("T")
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+# Query shapes of the hot-path lookups. The repo methods and `scripts.queries` (which explains them) both
+# build their queries from these, so the explained plan is the one production runs.
+# ACTIVE_SESSION_PROJECTION is covered by an index in services/common/indexes.py (IXSCAN only, no FETCH;
+# `python -m scripts.queries covered` checks the plans, with `latest_tone_pipeline`).
+ACTIVE_SESSION_PROJECTION = {"_id": 1, "user_id": 1, "day": 1, "status": 1}
+ACTIVE_SESSION_SORT = [("started_at", -1)]
+RECENT_MESSAGES_PROJECTION = {"_id": 1, "role": 1, "content": 1, "created_at": 1}
+RECENT_MESSAGES_SORT = [("created_at", -1)]
 
 
 def _utc_now() -> datetime:
@@ -17,55 +39,317 @@ def _utc_day_key(dt: Optional[datetime] = None) -> str:
     return dt.strftime("%Y-%m-%d")
 
 
+def users_by_id_filter(user_ids: list[str]) -> dict[str, Any]:
+    """`UsersRepo.get_by_id` for many users (one batched `find`)."""
+    return {"_id": {"$in": user_ids}}
+
+
+def latest_personality_pipeline(user_ids: list[str]) -> list[dict[str, Any]]:
+    """`PersonalitiesRepo.get_latest_for_user` for many users; walks `{user_id: 1, updated_at: -1}`."""
+    return [
+        {"$match": {"user_id": {"$in": user_ids}}},
+        {"$sort": {"user_id": 1, "updated_at": -1}},
+        {"$group": {"_id": "$user_id", "doc": {"$first": "$$ROOT"}}},
+    ]
+
+
+def latest_tone_pipeline(user_ids: list[str]) -> list[dict[str, Any]]:
+    """`PersonalitiesRepo.get_latest_tone_for_user` for many users.
+
+    $first of indexed fields only, so the $sort + $group is answered from `user_updatedAt_tone`.
+    """
+    return [
+        {"$match": {"user_id": {"$in": user_ids}}},
+        {"$sort": {"user_id": 1, "updated_at": -1}},
+        {
+            "$group": {
+                "_id": "$user_id",
+                "pid": {"$first": "$_id"},
+                "tone": {"$first": "$tone"},
+                "updated_at": {"$first": "$updated_at"},
+            }
+        },
+    ]
+
+
+def active_session_filter(user_id: str, day: str) -> dict[str, Any]:
+    """`SessionsRepo.get_active_for_user_today` (sorted by `ACTIVE_SESSION_SORT`, first match)."""
+    return {"user_id": user_id, "day": day, "status": "active"}
+
+
+def session_messages_filter(session_id: str) -> dict[str, Any]:
+    """`MessagesRepo.get_recent_for_session` (sorted by `RECENT_MESSAGES_SORT`, limited)."""
+    return {"session_id": session_id}
+
+
+def session_doc(*, session_id: str, user_id: str, tier: str, now: datetime) -> dict[str, Any]:
+    """A new active `sessions` document (see docs/schema.md)."""
+    return {
+        "_id": session_id,
+        "user_id": user_id,
+        "day": _utc_day_key(now),
+        "status": "active",
+        "started_at": now,
+        "last_activity_at": now,
+        "message_count": 0,
+        "tier": tier,
+    }
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key onto one in-flight task.
+
+    The first caller for a key starts the load; callers arriving before it finishes await the same
+    result (or exception). Nothing is cached after completion. Results are shared objects, so callers
+    must not mutate them. Waiters await through `asyncio.shield`: a cancelled caller does not cancel
+    the load for the others.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._inflight: dict[Hashable, asyncio.Future[Any]] = {}
+        # Strong references to running loads: the loop only holds tasks weakly.
+        self._tasks: set[asyncio.Future[Any]] = set()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(fn())
+            self._inflight[key] = fut
+            self._tasks.add(fut)
+            fut.add_done_callback(self._tasks.discard)
+            fut.add_done_callback(lambda f: self._done(key, f))
+            _LOOKUPS.labels(self.name, "leader").inc()
+        else:
+            _LOOKUPS.labels(self.name, "coalesced").inc()
+        return await asyncio.shield(fut)
+
+    def _done(self, key: Hashable, fut: asyncio.Future[Any]) -> None:
+        if self._inflight.get(key) is fut:
+            del self._inflight[key]
+        # Mark the exception retrieved in case every waiter was cancelled.
+        if not fut.cancelled():
+            fut.exception()
+
+
+class BatchLoader(Generic[K, V]):
+    """DataLoader-style batching: keys requested within one loop tick are loaded with one query.
+
+    `load_many(keys)` returns `{key: value}`; missing keys resolve to None. With `window_s > 0` the
+    batch is held open that long instead of one tick. A batch reaching `max_batch` keys is
+    dispatched immediately. A failed query fails every key in its batch.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        load_many: Callable[[list[K]], Awaitable[dict[K, V]]],
+        *,
+        window_s: float = 0.0,
+        max_batch: int = 100,
+    ) -> None:
+        self.name = name
+        self.load_many = load_many
+        self.window_s = window_s
+        self.max_batch = max(1, max_batch)
+        self._pending: dict[K, asyncio.Future[Optional[V]]] = {}
+        self._handle: Optional[asyncio.Handle] = None
+        # Strong references to running batches: the loop only holds tasks weakly, and a collected
+        # batch would leave every caller awaiting its futures forever.
+        self._tasks: set[asyncio.Task[None]] = set()
+        self.batches = 0
+
+    async def load(self, key: K) -> Optional[V]:
+        fut = self._pending.get(key)
+        if fut is None:
+            loop = asyncio.get_running_loop()
+            fut = self._pending[key] = loop.create_future()
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._handle is None:
+                if self.window_s > 0:
+                    self._handle = loop.call_later(self.window_s, self._dispatch)
+                else:
+                    self._handle = loop.call_soon(self._dispatch)
+        return await fut
+
+    def _dispatch(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict[K, asyncio.Future[Optional[V]]]) -> None:
+        self.batches += 1
+        _BATCH_KEYS.labels(self.name).observe(len(batch))
+        try:
+            found = await self.load_many(list(batch))
+        except Exception as e:  # noqa: BLE001
+            for fut in batch.values():
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for key, fut in batch.items():
+            if not fut.done():
+                fut.set_result(found.get(key))
+
+
+def _batch_loader(name: str, load_many: Callable[[list[Any]], Awaitable[dict[Any, Any]]]) -> BatchLoader[Any, Any]:
+    return BatchLoader(
+        name,
+        load_many,
+        window_s=float(os.getenv("MONGO_BATCH_WINDOW_MS", "0")) / 1000.0,
+        max_batch=int(os.getenv("MONGO_BATCH_MAX_KEYS", "100")),
+    )
+
+
+# Loaders and single-flights belong to a repo instance: each binds that repo's collection (client,
+# database, read preference), so a repo built on another client never queries through an old one.
+# Each process keeps one long-lived repo per use (the caches and the session index), so lookups still
+# share batches across requests.
+
+
 class UsersRepo:
     def __init__(self, db: Optional[AsyncIOMotorDatabase] = None) -> None:
         self._db = db or get_db()
         self._col: AsyncIOMotorCollection = self._db.users
+        self._flight = SingleFlight("users.get_by_id")
+        self._loader: BatchLoader[str, dict[str, Any]] = _batch_loader("users", self._find_many)
 
     async def get_by_id(self, user_id: str) -> Optional[dict[str, Any]]:
-        return await self._col.find_one({"_id": user_id})
+        with stage("mongo"):
+            return await self._flight.do(user_id, lambda: self._loader.load(user_id))
+
+    async def _find_many(self, user_ids: list[str]) -> dict[str, dict[str, Any]]:
+        return {doc["_id"]: doc async for doc in self._col.find(users_by_id_filter(user_ids))}
 
 
 class PersonalitiesRepo:
     def __init__(self, db: Optional[AsyncIOMotorDatabase] = None) -> None:
         self._db = db or get_db()
         self._col: AsyncIOMotorCollection = self._db.personalities
+        self._flight = SingleFlight("personalities.get_latest_for_user")
+        self._loader: BatchLoader[str, dict[str, Any]] = _batch_loader("personalities", self._find_latest_many)
+        self._tone_flight = SingleFlight("personalities.get_latest_tone_for_user")
+        self._tone_loader: BatchLoader[str, dict[str, Any]] = _batch_loader(
+            "personalities.tone", self._find_latest_tones
+        )
 
     async def get_latest_for_user(self, user_id: str) -> Optional[dict[str, Any]]:
-        doc = await self._col.find_one(
-            {"user_id": user_id},
-            sort=[("updated_at", -1)],
-        )
-        return doc
+        with stage("mongo"):
+            return await self._flight.do(user_id, lambda: self._loader.load(user_id))
+
+    async def _find_latest_many(self, user_ids: list[str]) -> dict[str, dict[str, Any]]:
+        # Latest personality per user in one round trip.
+        return {row["_id"]: row["doc"] async for row in self._col.aggregate(latest_personality_pipeline(user_ids))}
+
+    async def get_latest_tone_for_user(self, user_id: str) -> Optional[dict[str, Any]]:
+        """Covered lookup (`user_updatedAt_tone` index): `_id`, `user_id`, `tone`, `updated_at` of the latest personality."""
+        with stage("mongo"):
+            return await self._tone_flight.do(user_id, lambda: self._tone_loader.load(user_id))
+
+    async def _find_latest_tones(self, user_ids: list[str]) -> dict[str, dict[str, Any]]:
+        return {
+            row["_id"]: {"_id": row["pid"], "user_id": row["_id"], "tone": row["tone"], "updated_at": row["updated_at"]}
+            async for row in self._col.aggregate(latest_tone_pipeline(user_ids))
+        }
 
 
 class SessionsRepo:
     def __init__(self, db: Optional[AsyncIOMotorDatabase] = None) -> None:
         self._db = db or get_db()
         self._col: AsyncIOMotorCollection = self._db.sessions
+        self._flight = SingleFlight("sessions.get_active_for_user_today")
 
     async def get_active_for_user_today(self, user_id: str) -> Optional[dict[str, Any]]:
-        """Hot-path query 1: fetch current active session for a user (calendar-day)."""
+        """Hot-path query 1: fetch current active session for a user (calendar-day).
+
+        Covered by `user_day_status_startedAt`, which also serves the sort.
+        """
         day = _utc_day_key()
-        return await self._col.find_one(
-            {"user_id": user_id, "day": day, "status": "active"},
-            sort=[("started_at", -1)],
-            projection={"_id": 1, "user_id": 1, "day": 1, "status": 1, "last_activity_at": 1},
-        )
+        with stage("mongo"):
+            return await self._flight.do(
+                (user_id, day),
+                lambda: self._col.find_one(
+                    active_session_filter(user_id, day), sort=ACTIVE_SESSION_SORT, projection=ACTIVE_SESSION_PROJECTION
+                ),
+            )
+
+    async def start(self, *, session_id: str, user_id: str, tier: str) -> dict[str, Any]:
+        """Insert today's active session (id already claimed by the caller) and point the user at it."""
+        doc = session_doc(session_id=session_id, user_id=user_id, tier=tier, now=_utc_now())
+        with stage("mongo"):
+            try:
+                await self._col.insert_one(doc)
+            except DuplicateKeyError:
+                # The message writer's upsert got there first (a concurrent turn resolved the claimed id
+                # before this insert landed); the session exists, so finish starting it.
+                pass
+            await self._db.users.update_one(
+                {"_id": user_id}, {"$set": {"active_session_key": f"{doc['day']}:{session_id}"}}
+            )
+            await rollups.apply(self._db, [rollups.rollup_update(doc["day"], tier, sessions=1)])
+        return doc
+
+    async def get_or_start_for_user_today(self, *, user_id: str, tier: str) -> tuple[dict[str, Any], bool]:
+        """Mongo-only get-or-create (upsert); returns (session, created).
+
+        Used when the Redis session index is unavailable. Without a unique index on (user_id, day),
+        two concurrent upserts can both insert; the Redis path does not have that race.
+        """
+        now = _utc_now()
+        doc = session_doc(session_id=str(uuid.uuid4()), user_id=user_id, tier=tier, now=now)
+        with stage("mongo"):
+            before = await self._col.find_one_and_update(
+                active_session_filter(user_id, doc["day"]),
+                {"$setOnInsert": doc},
+                upsert=True,
+                projection=ACTIVE_SESSION_PROJECTION,
+                return_document=ReturnDocument.BEFORE,
+            )
+            if before is not None:
+                return before, False
+            await self._db.users.update_one(
+                {"_id": user_id}, {"$set": {"active_session_key": f"{doc['day']}:{doc['_id']}"}}
+            )
+            await rollups.apply(self._db, [rollups.rollup_update(doc["day"], tier, sessions=1)])
+        return doc, True
 
 
 class MessagesRepo:
     def __init__(self, db: Optional[AsyncIOMotorDatabase] = None) -> None:
+        # Primary: on a cache miss these reads rebuild the session context (and fill the Redis list), so a
+        # lagging secondary would drop the turns just written.
         self._db = db or get_db()
         self._col: AsyncIOMotorCollection = self._db.messages
 
     async def get_recent_for_session(self, session_id: str, limit_n: int = 20) -> list[dict[str, Any]]:
         """Hot-path query 2: recent N messages for contextual LLM calls."""
         cursor = self._col.find(
-            {"session_id": session_id},
-            projection={"_id": 1, "role": 1, "content": 1, "created_at": 1},
-            sort=[("created_at", -1)],
+            session_messages_filter(session_id),
+            projection=RECENT_MESSAGES_PROJECTION,
+            sort=RECENT_MESSAGES_SORT,
             limit=limit_n,
         )
-        return [doc async for doc in cursor]
+        with stage("mongo"):
+            return [doc async for doc in cursor]
+
 
+_LOOKUPS = metrics.counter(
+    "ira_repo_lookups_total",
+    "Repo lookups by single-flight outcome (leader = issued a Mongo query, coalesced = shared one).",
+    ["lookup", "result"],
+)
+_BATCH_KEYS = metrics.histogram(
+    "ira_repo_batch_keys",
+    "Keys resolved per batched Mongo query.",
+    ["loader"],
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250),
+)
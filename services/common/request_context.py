@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import contextvars
-from dataclasses import dataclass
-from typing import Literal, Optional
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, Literal, Optional
 
 
 ServiceName = Literal[
@@ -11,9 +13,56 @@ ServiceName = Literal[
     "worker-standard",
     "worker-overflow",
     "seeder",
+    "mock-llm",
 ]
 
 
+class StageTimings:
+    """Per-request stage durations in ms, summed per stage name.
+
+    Mutable and shared: handlers that replace the `RequestContext` pass the same instance on,
+    so the middleware can emit everything recorded during the request.
+    """
+
+    __slots__ = ("_ms",)
+
+    def __init__(self) -> None:
+        self._ms: dict[str, float] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._ms)
+
+    def add(self, stage: str, ms: float) -> None:
+        self._ms[stage] = self._ms.get(stage, 0.0) + ms
+
+    def as_dict(self) -> dict[str, float]:
+        return {name: round(ms, 2) for name, ms in self._ms.items()}
+
+    def server_timing(self, *, total_ms: Optional[float] = None) -> str:
+        """Render as a `Server-Timing` header value, e.g. `queue;dur=0.12, upstream;dur=41.7`."""
+        parts = [f"{name};dur={ms:.2f}" for name, ms in self._ms.items()]
+        if total_ms is not None:
+            parts.append(f"total;dur={total_ms:.2f}")
+        return ", ".join(parts)
+
+    def merge_server_timing(self, header: Optional[str], *, prefix: str = "") -> None:
+        """Fold a downstream `Server-Timing` header (e.g. from a worker) into these timings."""
+        if not header:
+            return
+        for entry in header.split(","):
+            name, _, params = entry.strip().partition(";")
+            if not name or name == "total":
+                continue
+            for param in params.split(";"):
+                key, _, value = param.strip().partition("=")
+                if key == "dur":
+                    try:
+                        self.add(f"{prefix}{name}", float(value))
+                    except ValueError:
+                        pass
+                    break
+
+
 @dataclass(frozen=True)
 class RequestContext:
     correlation_id: str
@@ -21,6 +70,7 @@ class RequestContext:
     user_id: Optional[str] = None
     tier: Optional[str] = None
     operation: Optional[str] = None
+    timings: StageTimings = field(default_factory=StageTimings, compare=False, repr=False)
 
 
 _ctx_var: contextvars.ContextVar[Optional[RequestContext]] = contextvars.ContextVar(
@@ -37,3 +87,15 @@ def get_request_context() -> Optional[RequestContext]:
     return _ctx_var.get()
 
 
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block into the current request's stage timings (no-op outside a request)."""
+    ctx = _ctx_var.get()
+    if ctx is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        ctx.timings.add(name, (time.perf_counter() - start) * 1000.0)
@@ -0,0 +1,93 @@
+"""Daily tier activity rollups: one small document per UTC day in `tier_day_rollups`.
+
+    {_id: "2026-01-31", tiers: {free: {sessions: 812, messages: 9120}, premium: {...}}, updated_at}
+
+- Kept current incrementally with `$inc` upserts: `SessionsRepo` on session start, `MessageWriter`
+  once per (day, tier) per flush.
+- `backfill` rebuilds whole days from `sessions` (`message_count` included) with one aggregation
+  ending in `$merge`. It replaces the day's document, so run it for closed days only: increments that
+  land on a day while it is being rebuilt are lost.
+- Dashboards read a day range by `_id` instead of scanning `sessions`.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from services.common import metrics
+from services.common.logging import get_logger
+
+
+log = get_logger("rollups")
+
+COLLECTION = "tier_day_rollups"
+
+_FAILURES = metrics.counter("ira_rollup_update_failures_total", "Rollup increments that failed; the day reads low until backfilled.")
+
+
+def rollup_update(day: str, tier: str, *, sessions: int = 0, messages: int = 0) -> UpdateOne:
+    inc: dict[str, int] = {}
+    if sessions:
+        inc[f"tiers.{tier}.sessions"] = sessions
+    if messages:
+        inc[f"tiers.{tier}.messages"] = messages
+    return UpdateOne({"_id": day}, {"$inc": inc, "$set": {"updated_at": datetime.now(timezone.utc)}}, upsert=True)
+
+
+def message_updates(written: list[dict[str, Any]]) -> list[UpdateOne]:
+    """One increment per (day, tier) for a batch of inserted `messages` documents."""
+    counts: dict[tuple[str, str], int] = defaultdict(int)
+    for doc in written:
+        counts[(doc["created_at"].strftime("%Y-%m-%d"), doc["tier"])] += 1
+    return [rollup_update(day, tier, messages=n) for (day, tier), n in counts.items()]
+
+
+async def apply(db: AsyncIOMotorDatabase, ops: list[UpdateOne]) -> None:
+    """Best-effort: a failed increment is counted and logged, never raised to the write it follows."""
+    if not ops:
+        return
+    try:
+        await db[COLLECTION].bulk_write(ops, ordered=False)
+    except Exception as e:  # noqa: BLE001
+        _FAILURES.inc(len(ops))
+        log.warning("rollup_update_failed", extra={"extra": {"err": type(e).__name__, "ops": len(ops)}})
+
+
+def backfill_pipeline(start_day: str, end_day: str) -> list[dict[str, Any]]:
+    """Rebuild rollups for `start_day`..`end_day` (inclusive, `YYYY-MM-DD`) from `sessions`."""
+    return [
+        {"$match": {"day": {"$gte": start_day, "$lte": end_day}}},
+        {
+            "$group": {
+                "_id": {"day": "$day", "tier": "$tier"},
+                "sessions": {"$sum": 1},
+                "messages": {"$sum": {"$ifNull": ["$message_count", 0]}},
+            }
+        },
+        {
+            "$group": {
+                "_id": "$_id.day",
+                "tiers": {"$push": {"k": "$_id.tier", "v": {"sessions": "$sessions", "messages": "$messages"}}},
+            }
+        },
+        {"$project": {"tiers": {"$arrayToObject": "$tiers"}, "updated_at": "$$NOW"}},
+        {"$merge": {"into": COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+async def backfill(db: AsyncIOMotorDatabase, start_day: str, end_day: str) -> None:
+    # $merge writes server-side; the cursor itself returns nothing.
+    async for _ in db.sessions.aggregate(backfill_pipeline(start_day, end_day), allowDiskUse=True):
+        pass
+
+
+async def read_days(db: AsyncIOMotorDatabase, start_day: str, end_day: Optional[str] = None) -> list[dict[str, Any]]:
+    """Rollup documents for `start_day`..`end_day` (inclusive), oldest first."""
+    end_day = end_day or start_day
+    cursor = db[COLLECTION].find({"_id": {"$gte": start_day, "$lte": end_day}}, sort=[("_id", 1)])
+    return [doc async for doc in cursor]
@@ -4,6 +4,7 @@ import re
 from dataclasses import dataclass
 from typing import Literal, Optional
 
+from services.common import metrics
 
 Category = Literal["jailbreak", "nsfw", "self_harm", "violence", "hate"]
 
@@ -18,6 +19,10 @@ _VIOLENCE = re.compile(r"\b(how to make a bomb|build a bomb|poison|kill them)\b"
 _HATE = re.compile(r"\b(genocide|gas the|racial slur)\b", re.IGNORECASE)
 
 
+_CHECKS = metrics.counter("ira_safety_checks_total", "Safety checks by result (allowed or blocked category).", ["result"])
+_ALLOWED = _CHECKS.labels("allowed")
+
+
 @dataclass(frozen=True)
 class SafetyResult:
     allowed: bool
@@ -26,6 +31,15 @@ class SafetyResult:
 
 
 def detect_unsafe(text: str) -> SafetyResult:
+    result = _detect(text)
+    if result.allowed:
+        _ALLOWED.inc()
+    else:
+        _CHECKS.labels(result.category or "unknown").inc()
+    return result
+
+
+def _detect(text: str) -> SafetyResult:
     if _JAILBREAK.search(text):
         return SafetyResult(False, "jailbreak", "prompt_injection")
     if _SELF_HARM.search(text):
@@ -0,0 +1,125 @@
+"""Active-session index in Redis: user -> today's session id.
+
+- Key `ira:session:<day>:<user_id>` holds the session id and expires at UTC midnight, when the session
+  (a calendar-day container) ends.
+- Resolution is one `GET` per chat turn. On a miss, today's session is read from Mongo and indexed.
+- Session start is race-free: a new id is claimed with `SET NX`; only the winner inserts the Mongo
+  document, concurrent losers adopt the winner's id.
+- If Redis is unavailable, resolution falls back to a Mongo upsert.
+"""
+
+from __future__ import annotations
+
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from services.common import metrics
+from services.common.logging import get_logger
+from services.common.redis_client import get_redis
+from services.common.repos import SessionsRepo
+from services.common.request_context import stage
+
+
+log = get_logger("session_index")
+
+_RESOLUTIONS = metrics.counter(
+    "ira_active_session_resolutions_total",
+    "Active-session lookups (hit | mongo = indexed from Mongo | created | fallback = Redis failed).",
+    ["result"],
+)
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _utc_day_key(now: Optional[datetime] = None) -> str:
+    now = now or _utc_now()
+    return now.strftime("%Y-%m-%d")
+
+
+def _seconds_until_utc_midnight(now: Optional[datetime] = None) -> int:
+    now = now or _utc_now()
+    tomorrow = (now + timedelta(days=1)).date()
+    midnight = datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=timezone.utc)
+    return max(1, int((midnight - now).total_seconds()))
+
+
+@dataclass(frozen=True)
+class ActiveSession:
+    session_id: str
+    created: bool
+
+
+class ActiveSessionIndex:
+    def __init__(self, repo: Optional[SessionsRepo] = None, *, namespace: str = "ira") -> None:
+        self._repo = repo
+        self.ns = namespace
+
+    @property
+    def repo(self) -> SessionsRepo:
+        if self._repo is None:
+            self._repo = SessionsRepo()
+        return self._repo
+
+    def _key(self, user_id: str, day: str) -> str:
+        return f"{self.ns}:session:{day}:{user_id}"
+
+    async def get_or_start(self, *, user_id: str, tier: str) -> ActiveSession:
+        """Today's active session for `user_id`, starting one if there is none."""
+        now = _utc_now()
+        key = self._key(user_id, _utc_day_key(now))
+        try:
+            return await self._resolve(key, user_id=user_id, tier=tier, ttl=_seconds_until_utc_midnight(now))
+        except (RedisError, OSError) as e:
+            _RESOLUTIONS.labels("fallback").inc()
+            log.warning("session_index_unavailable", extra={"extra": {"err": type(e).__name__}})
+            doc, created = await self.repo.get_or_start_for_user_today(user_id=user_id, tier=tier)
+            return ActiveSession(session_id=doc["_id"], created=created)
+
+    async def _resolve(self, key: str, *, user_id: str, tier: str, ttl: int) -> ActiveSession:
+        r = get_redis()
+        with stage("redis"):
+            session_id = await r.get(key)
+        if session_id:
+            _RESOLUTIONS.labels("hit").inc()
+            return ActiveSession(session_id=session_id, created=False)
+
+        doc = await self.repo.get_active_for_user_today(user_id)
+        candidate = doc["_id"] if doc is not None else str(uuid.uuid4())
+        with stage("redis"):
+            claimed = await r.set(key, candidate, ex=ttl, nx=True)
+            if not claimed:
+                # Someone else indexed or started today's session first; theirs wins.
+                _RESOLUTIONS.labels("hit").inc()
+                return ActiveSession(session_id=await r.get(key), created=False)
+        if doc is not None:
+            _RESOLUTIONS.labels("mongo").inc()
+            return ActiveSession(session_id=candidate, created=False)
+
+        try:
+            await self.repo.start(session_id=candidate, user_id=user_id, tier=tier)
+        except Exception:
+            # Release the claim so the next turn retries instead of pointing at a missing session.
+            await r.delete(key)
+            raise
+        _RESOLUTIONS.labels("created").inc()
+        return ActiveSession(session_id=candidate, created=True)
+
+    async def forget(self, user_id: str) -> None:
+        """Drop today's index entry (e.g. after the session is closed)."""
+        await get_redis().delete(self._key(user_id, _utc_day_key()))
+
+
+_index: Optional[ActiveSessionIndex] = None
+
+
+def get_session_index() -> ActiveSessionIndex:
+    global _index
+    if _index is None:
+        _index = ActiveSessionIndex()
+    return _index
@@ -0,0 +1 @@
+"""Mock LLM backend (latency distributions, token streaming, error injection)."""
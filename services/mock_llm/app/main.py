@@ -0,0 +1,249 @@
+"""Mock LLM backend speaking the `services/common/llm.py` protocol, for load and failure testing.
+
+A call first waits for one of `max_concurrency` slots (0 = unlimited), like requests queueing for a
+model server. It then pays `overhead_ms` (fixed per-call cost), then a time to first token drawn from
+`latency`, then `token_ms` for each further token. Streams send the tokens as they are "generated".
+
+`/v1/complete/batch` models batched inference: one slot, one `overhead_ms` and one first-token latency
+for the whole batch, `batch_item_ms` for each item, and its items decode in lockstep (`token_ms` per
+token of the longest).
+
+Failure injection:
+
+- `error_rate` of calls answer `error_status` at once.
+- `hang_rate` of calls stall `hang_s` before answering, to exercise client timeouts.
+- `stream_error_rate` of streams break off after their first token.
+
+Settings come from `MOCK_LLM_*` env at startup and can be changed at runtime:
+
+    curl -X PUT localhost:8010/config -H 'content-type: application/json' \\
+      -d '{"latency": "lognormal:80,0.6", "error_rate": 0.02}'
+
+Latency specs (milliseconds): `fixed:MS`, `uniform:LO,HI`, `lognormal:MEDIAN,SIGMA`, `exponential:MEAN`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import os
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+from services.common.app_factory import create_app
+from services.common.logging import get_logger
+
+
+log = get_logger("mock-llm")
+
+_WORDS = tuple(
+    "sure that sounds good tell me more about it i think you can try again later today maybe we should talk soon".split()
+)
+
+Sampler = Callable[[random.Random], float]
+
+
+def parse_latency(spec: str) -> Sampler:
+    """Sampler of seconds for a spec like `lognormal:80,0.5` (milliseconds); ValueError if invalid."""
+    kind, _, raw = spec.partition(":")
+    try:
+        args = [float(x) for x in raw.split(",")] if raw else []
+    except ValueError:
+        raise ValueError(f"bad latency spec {spec!r}") from None
+    if kind == "fixed" and len(args) == 1 and args[0] >= 0:
+        return lambda rng: args[0] / 1000.0
+    if kind == "uniform" and len(args) == 2 and 0 <= args[0] <= args[1]:
+        return lambda rng: rng.uniform(args[0], args[1]) / 1000.0
+    if kind == "lognormal" and len(args) == 2 and args[0] > 0 and args[1] >= 0:
+        mu = math.log(args[0])
+        return lambda rng: rng.lognormvariate(mu, args[1]) / 1000.0
+    if kind == "exponential" and len(args) == 1 and args[0] > 0:
+        return lambda rng: rng.expovariate(1.0 / args[0]) / 1000.0
+    raise ValueError(f"bad latency spec {spec!r} (fixed:MS, uniform:LO,HI, lognormal:MEDIAN,SIGMA, exponential:MEAN)")
+
+
+class MockConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    latency: str = "lognormal:60,0.5"
+    overhead_ms: float = Field(0.0, ge=0)
+    token_ms: float = Field(2.0, ge=0)
+    tokens: int = Field(24, ge=1, le=4096)
+    max_concurrency: int = Field(0, ge=0)
+    error_rate: float = Field(0.0, ge=0, le=1)
+    error_status: int = Field(503, ge=400, le=599)
+    hang_rate: float = Field(0.0, ge=0, le=1)
+    hang_s: float = Field(30.0, ge=0)
+    stream_error_rate: float = Field(0.0, ge=0, le=1)
+    batch_item_ms: float = Field(1.0, ge=0)
+
+    @field_validator("latency")
+    @classmethod
+    def _check_latency(cls, v: str) -> str:
+        parse_latency(v)
+        return v
+
+
+def config_from_env() -> MockConfig:
+    env = {name: os.getenv(f"MOCK_LLM_{name.upper()}") for name in MockConfig.model_fields}
+    return MockConfig(**{name: value for name, value in env.items() if value is not None})
+
+
+class MockState:
+    def __init__(self, config: MockConfig, *, seed: Optional[int] = None) -> None:
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.batched_items = 0
+        self.inflight = 0
+        self.injected = {"error": 0, "hang": 0, "stream_error": 0}
+        self.configure(config)
+
+    def configure(self, config: MockConfig) -> None:
+        self.config = config
+        self.sample_latency = parse_latency(config.latency)
+        self.slots = asyncio.Semaphore(config.max_concurrency) if config.max_concurrency else None
+
+    def fault(self) -> Optional[str]:
+        cfg = self.config
+        roll = self.rng.random()
+        if roll < cfg.error_rate:
+            return "error"
+        if roll < cfg.error_rate + cfg.hang_rate:
+            return "hang"
+        return None
+
+    def tokens(self, max_tokens: int) -> list[str]:
+        n = min(max_tokens, self.config.tokens)
+        return [w if i == 0 else f" {w}" for i, w in enumerate(self.rng.choice(_WORDS) for _ in range(n))]
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        slots = self.slots
+        if slots is not None:
+            await slots.acquire()
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            if slots is not None:
+                slots.release()
+
+
+state = MockState(config_from_env(), seed=int(os.environ["MOCK_LLM_SEED"]) if "MOCK_LLM_SEED" in os.environ else None)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    log.info("mock_llm_config", extra={"extra": state.config.model_dump()})
+    yield
+
+
+app = create_app(service="mock-llm", lifespan=lifespan)
+
+
+class CompleteItem(BaseModel):
+    prompt: str = Field(..., max_length=32_000)
+    tone: Optional[str] = None
+    max_tokens: int = Field(128, ge=1, le=4096)
+
+
+class CompleteRequest(CompleteItem):
+    stream: bool = False
+
+
+class CompleteBatchRequest(BaseModel):
+    items: list[CompleteItem] = Field(..., min_length=1, max_length=256)
+
+
+async def _generate(tokens: list[str], *, break_after_first: bool) -> AsyncIterator[str]:
+    cfg = state.config
+    async with state.slot():
+        await asyncio.sleep(cfg.overhead_ms / 1000.0 + state.sample_latency(state.rng))
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(cfg.token_ms / 1000.0)
+            yield token
+            if break_after_first:
+                return
+
+
+async def _inject_fault() -> Optional[JSONResponse]:
+    fault = state.fault()
+    if fault == "error":
+        state.injected["error"] += 1
+        return JSONResponse({"error": "injected"}, status_code=state.config.error_status)
+    if fault == "hang":
+        state.injected["hang"] += 1
+        await asyncio.sleep(state.config.hang_s)
+    return None
+
+
+@app.post("/v1/complete")
+async def complete(req: CompleteRequest):
+    state.calls += 1
+    if (error := await _inject_fault()) is not None:
+        return error
+
+    tokens = state.tokens(req.max_tokens)
+    if not req.stream:
+        text = "".join([t async for t in _generate(tokens, break_after_first=False)])
+        return {"text": text, "tokens": len(tokens)}
+
+    break_off = state.rng.random() < state.config.stream_error_rate
+    if break_off:
+        state.injected["stream_error"] += 1
+
+    async def lines() -> AsyncIterator[str]:
+        n = 0
+        async for token in _generate(tokens, break_after_first=break_off):
+            n += 1
+            yield json.dumps({"token": token}) + "\n"
+        yield json.dumps({"error": "injected"} if break_off else {"done": True, "tokens": n}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/v1/complete/batch")
+async def complete_batch(req: CompleteBatchRequest):
+    state.calls += 1
+    state.batched_items += len(req.items)
+    if (error := await _inject_fault()) is not None:
+        return error
+
+    cfg = state.config
+    outputs = [state.tokens(item.max_tokens) for item in req.items]
+    longest = max(len(tokens) for tokens in outputs)
+    async with state.slot():
+        await asyncio.sleep(
+            (cfg.overhead_ms + cfg.batch_item_ms * len(outputs) + cfg.token_ms * (longest - 1)) / 1000.0
+            + state.sample_latency(state.rng)
+        )
+    return {"results": [{"text": "".join(tokens), "tokens": len(tokens)} for tokens in outputs]}
+
+
+@app.get("/config")
+async def get_config():
+    return {
+        "config": state.config.model_dump(),
+        "calls": state.calls,
+        "batched_items": state.batched_items,
+        "inflight": state.inflight,
+        "injected": state.injected,
+    }
+
+
+@app.put("/config")
+async def put_config(changes: dict):
+    try:
+        state.configure(MockConfig.model_validate({**state.config.model_dump(), **changes}))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json())) from None
+    log.info("mock_llm_config", extra={"extra": state.config.model_dump()})
+    return {"config": state.config.model_dump()}
@@ -7,16 +7,23 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from pydantic import BaseModel, Field
 
+from services.common import metrics
+from services.common.app_factory import create_app
 from services.common.logging import get_logger
 from services.common.analytics import start as analytics_start, stop as analytics_stop, track as analytics_track
-from services.common.http import install_request_context_middleware
-from services.common.request_context import RequestContext, get_request_context, set_request_context
+from services.common.mongo import warm_up as warm_up_mongo
+from services.common.request_context import RequestContext, StageTimings, get_request_context, set_request_context
 from services.router.app.pools import PoolManager, load_pool_configs_from_env
 from services.router.app.tier_router import Tier, TierRouter
 
 
 log = get_logger("router")
 
+_CHAT_REQUESTS = metrics.counter(
+    "ira_chat_requests_total", "Routed /chat requests by tier, action (forward|shed) and pool.", ["tier", "action", "pool"]
+)
+_CHAT_LATENCY = metrics.histogram("ira_chat_latency_seconds", "End-to-end /chat latency in the router.", ["tier"])
+
 pool_manager: PoolManager | None = None
 tier_router: TierRouter | None = None
 
@@ -26,6 +33,7 @@ async def lifespan(_: FastAPI):
     global pool_manager, tier_router
     # Router owns the pool manager + http client.
     pool_manager = PoolManager(load_pool_configs_from_env())
+    await warm_up_mongo()
     await analytics_start()
     await pool_manager.start_health_polling(interval_s=float(os.getenv("POOL_HEALTH_INTERVAL_S", "1.0")))
     tier_router = TierRouter(pool_manager)
@@ -35,8 +43,7 @@ async def lifespan(_: FastAPI):
     await analytics_stop()
 
 
-app = FastAPI(title="ira-router", lifespan=lifespan)
-install_request_context_middleware(app, service="router")
+app = create_app(service="router", lifespan=lifespan)
 
 
 class ChatRequest(BaseModel):
@@ -53,6 +60,7 @@ async def chat(req: ChatRequest, request: Request):
     # while preserving middleware-generated correlation ID.
     ctx = get_request_context()
     correlation_id = ctx.correlation_id if ctx is not None else "missing-correlation-id"
+    timings = ctx.timings if ctx is not None else StageTimings()
     set_request_context(
         RequestContext(
             correlation_id=correlation_id,
@@ -60,6 +68,7 @@ async def chat(req: ChatRequest, request: Request):
             user_id=req.user_id,
             tier=req.tier,
             operation="chat",
+            timings=timings,
         )
     )
 
@@ -81,7 +90,10 @@ async def chat(req: ChatRequest, request: Request):
         },
     )
 
-    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    elapsed_s = time.perf_counter() - started
+    elapsed_ms = elapsed_s * 1000.0
+    _CHAT_REQUESTS.labels(req.tier, decision.action, decision.pool or "none").inc()
+    _CHAT_LATENCY.labels(req.tier).observe(elapsed_s)
 
     # Fire-and-forget analytics (non-blocking enqueue).
     await analytics_track(
@@ -90,8 +102,10 @@ async def chat(req: ChatRequest, request: Request):
             "correlation_id": correlation_id,
             "user_id": req.user_id,
             "tier": req.tier,
+            "message_chars": len(req.message),
             "pool": decision.pool,
             "latency_ms": round(elapsed_ms, 2),
+            "stages": timings.as_dict(),
             "rate_limited": bool((result or {}).get("rate_limited")),
             "safety_blocked": bool((result or {}).get("blocked")),
             "degraded": decision.action == "shed",
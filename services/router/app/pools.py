@@ -8,8 +8,18 @@ from typing import Any, Literal, Optional
 
 import httpx
 
+from services.common import metrics
+from services.common.request_context import get_request_context, stage
+
 PoolName = Literal["priority", "standard", "overflow"]
 
+_QUEUE_WAIT = metrics.histogram("ira_pool_queue_wait_seconds", "Time waiting for a pool admission slot.", ["pool"])
+_UPSTREAM = metrics.histogram("ira_pool_upstream_seconds", "Worker /process call duration.", ["pool", "status"])
+_REJECTED = metrics.counter(
+    "ira_pool_rejected_total", "Calls refused at admission (overloaded | queue_timeout).", ["pool", "reason"]
+)
+_INFLIGHT = metrics.gauge("ira_pool_inflight", "In-flight worker calls per pool.", ["pool"])
+
 
 @dataclass
 class PoolConfig:
@@ -30,11 +40,12 @@ class PoolState:
 
 
 class PoolManager:
-    def __init__(self, configs: list[PoolConfig]) -> None:
+    def __init__(self, configs: list[PoolConfig], *, client: Optional[httpx.AsyncClient] = None) -> None:
         self.configs = {c.name: c for c in configs}
         self.state = {c.name: PoolState() for c in configs}
         self._semaphores = {c.name: asyncio.Semaphore(c.max_concurrency) for c in configs}
-        self._client = httpx.AsyncClient(
+        # `client` lets callers supply the transport (scripts/harness.py mounts the workers in-process).
+        self._client = client or httpx.AsyncClient(
             timeout=httpx.Timeout(connect=1.0, read=5.0, write=5.0, pool=1.0),
             limits=httpx.Limits(max_keepalive_connections=50, max_connections=200),
         )
@@ -107,21 +118,41 @@ class PoolManager:
         #
         # Note: asyncio.Semaphore does not provide a stable acquire_nowait() API across versions.
         # For "no wait" we check locked() and then acquire (which will not block if unlocked).
-        if max_queue_wait_s > 0:
-            await asyncio.wait_for(sem.acquire(), timeout=max_queue_wait_s)
-        else:
-            if sem.locked():
-                raise PoolOverloaded(pool)
-            await sem.acquire()
+        queued = time.perf_counter()
+        with stage("queue"):
+            if max_queue_wait_s > 0:
+                try:
+                    await asyncio.wait_for(sem.acquire(), timeout=max_queue_wait_s)
+                except asyncio.TimeoutError:
+                    _REJECTED.labels(pool, "queue_timeout").inc()
+                    raise
+            else:
+                if sem.locked():
+                    _REJECTED.labels(pool, "overloaded").inc()
+                    raise PoolOverloaded(pool)
+                await sem.acquire()
 
         st.inflight += 1
+        inflight = _INFLIGHT.labels(pool)
+        inflight.inc()
         start = time.perf_counter()
+        _QUEUE_WAIT.labels(pool).observe(start - queued)
+        status = "error"
         try:
-            return await self._client.post(f"{cfg.base_url}{cfg.process_path}", json=payload)
+            with stage("upstream"):
+                resp = await self._client.post(f"{cfg.base_url}{cfg.process_path}", json=payload)
+            status = str(resp.status_code)
+            # Fold the worker's own stage breakdown (safety/redis/mongo/llm) into ours.
+            ctx = get_request_context()
+            if ctx is not None:
+                ctx.timings.merge_server_timing(resp.headers.get("server-timing"), prefix="worker-")
+            return resp
         finally:
-            elapsed_ms = (time.perf_counter() - start) * 1000.0
-            self._record_latency(pool, elapsed_ms)
+            elapsed_s = time.perf_counter() - start
+            _UPSTREAM.labels(pool, status).observe(elapsed_s)
+            self._record_latency(pool, elapsed_s * 1000.0)
             st.inflight -= 1
+            inflight.dec()
             sem.release()
 
 
@@ -0,0 +1,475 @@
+"""Multiprocess, streaming seeding engine (see docs/seed_distribution.md).
+
+Each collection is split into shards of `shard_size` documents. A shard is generated and inserted
+by one worker process (own `pymongo.MongoClient`, `insert_many(ordered=False)` per `batch_size`
+batch), so generation and inserts run in parallel across processes and each process holds at
+most one batch. The parent only keeps shard descriptors, at most `2 * processes` of them in flight.
+
+Everything is derived from `SeedPlan.seed`:
+
+- Shard `i` of a collection draws from `random.Random(f"{seed}:{collection}:{i}")`, so a shard
+  generates the same documents whichever process runs it, and in whichever order.
+- `_id`s are a function of the document index and user/session links are computed (a user's tier,
+  the user owning session `j`), so no id lists are kept. Re-running a shard re-inserts the same
+  `_id`s; duplicate-key errors are skipped, which makes shards idempotent.
+
+`SeedPlan.raw` and `seed(export_dir=...)` use the columnar generator in `raw.py` instead.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import multiprocessing
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Awaitable, Callable, Collection, Iterator, Mapping, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+
+from services.common.indexes import create_indexes, drop_secondary_indexes
+from services.common.mongo import PROFILES, client_options
+
+
+COLLECTIONS = ("users", "personalities", "sessions", "messages")
+
+TIERS = ("free", "premium", "enterprise")
+TIER_WEIGHTS = (0.90, 0.09, 0.01)
+
+TODAY_USER_SHARE = 0.10  # users with a session today
+HEAVY_TODAY_SHARE = 0.30  # of those, sessions with 30-200 messages
+HOT_SESSION_SHARE = 0.05  # sessions that receive...
+HOT_MESSAGE_SHARE = 0.35  # ...this share of messages
+
+TONES = ("warm", "playful", "direct")
+STYLE_SNIPPETS = (
+    "Keep replies concise and friendly.",
+    "Ask one clarifying question if needed.",
+    "Avoid harsh system-sounding language.",
+)
+WORDS = (
+    "hey", "ira", "today", "feel", "like", "need", "help", "plan", "work", "focus",
+    "stress", "sleep", "schedule", "ideas", "quick", "question", "thanks", "understand", "explain", "steps",
+)  # fmt: skip
+
+_M64 = (1 << 64) - 1
+_ID_INDEX_BITS = 48  # the UUID "node" field; version/variant bits sit above it
+
+
+def day_key(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d")
+
+
+def _utc_now_ms() -> datetime:
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def _splitmix64(x: int) -> int:
+    x = (x + 0x9E3779B97F4A7C15) & _M64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _M64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _M64
+    return x ^ (x >> 31)
+
+
+@dataclass(frozen=True)
+class SeedPlan:
+    users: int
+    personalities: int
+    sessions: int
+    messages: int
+    seed: int = 1337
+    day_span: int = 30  # sessions spread across the last N days
+    batch_size: int = 2_000
+    shard_size: int = 50_000
+    # Columnar generation + pre-encoded BSON (services/seeder/app/raw.py).
+    raw: bool = False
+    # Fixed once per plan so every shard agrees on "today". Millisecond precision, like BSON dates,
+    # so a plan stored in Mongo (seeder jobs) reloads equal.
+    now: datetime = field(default_factory=_utc_now_ms)
+
+    def target(self, collection: str) -> int:
+        if collection == "personalities":
+            return min(self.personalities, self.users)
+        if collection == "sessions":
+            # One session per chosen user (users sampled without replacement).
+            return min(self.sessions, self.users)
+        return getattr(self, collection)
+
+    def shards(self, collection: str) -> list["Shard"]:
+        n = self.target(collection)
+        return [
+            Shard(collection, i, i * self.shard_size, min(n, (i + 1) * self.shard_size))
+            for i in range(math.ceil(n / self.shard_size))
+        ]
+
+
+@dataclass(frozen=True)
+class Shard:
+    collection: str
+    index: int
+    start: int
+    stop: int
+
+
+@dataclass(frozen=True)
+class ShardResult:
+    collection: str
+    index: int
+    inserted: int
+    generated: int
+    gen_s: float
+    insert_s: float
+
+
+@dataclass
+class CollectionReport:
+    collection: str
+    target: int
+    shards: int
+    inserted: int = 0
+    shards_done: int = 0
+    elapsed_s: float = 0.0
+    gen_s: float = 0.0  # summed over processes
+    insert_s: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.inserted / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+
+class Keys:
+    """Deterministic ids and cross-collection links for a plan (cheap to rebuild per process)."""
+
+    def __init__(self, plan: SeedPlan) -> None:
+        rng = random.Random(f"{plan.seed}:keys")
+        # The index fills the UUID's last 12 hex digits (node field), under a per-collection prefix.
+        self._prefix = {
+            c: str(uuid.UUID(int=rng.getrandbits(128) & ~((1 << _ID_INDEX_BITS) - 1), version=4))[:-12]
+            for c in COLLECTIONS
+        }
+        self.tier_salt = rng.getrandbits(64)
+        self.today_salt = rng.getrandbits(64)
+        cumulative, acc = [], 0.0
+        for w in TIER_WEIGHTS:
+            acc += w
+            cumulative.append(acc)
+        self.tier_cutoffs = cumulative
+        # Session j belongs to user (a*j + b) mod users: a permutation, i.e. sampling without replacement.
+        n = max(1, plan.users)
+        a = rng.randrange(1, n + 1) | 1
+        while math.gcd(a, n) != 1:
+            a += 1
+        self.perm = (a % n or 1, rng.randrange(n), n)
+        self.hot_sessions = max(1, int(HOT_SESSION_SHARE * plan.target("sessions")))
+
+    def id(self, collection: str, i: int) -> str:
+        return f"{self._prefix[collection]}{i:012x}"
+
+    def _unit(self, salt: int, i: int) -> float:
+        return _splitmix64(salt ^ i) / 2.0**64
+
+    def tier_of_user(self, u: int) -> str:
+        x = self._unit(self.tier_salt, u)
+        for tier, cutoff in zip(TIERS, self.tier_cutoffs):
+            if x < cutoff:
+                return tier
+        return TIERS[-1]
+
+    def has_today_session(self, u: int) -> bool:
+        return self._unit(self.today_salt, u) < TODAY_USER_SHARE
+
+    def user_of_session(self, j: int) -> int:
+        a, b, n = self.perm
+        return (a * j + b) % n
+
+
+# --- document generators -------------------------------------------------------------------------
+
+
+def rand_text(rng: random.Random, min_len: int = 20, max_len: int = 220) -> str:
+    target = rng.randint(min_len, max_len)
+    out: list[str] = []
+    total = 0
+    while total < target:
+        w = rng.choice(WORDS)
+        out.append(w)
+        total += len(w) + 1
+    s = " ".join(out)[:target].strip()
+    if rng.random() < 0.2:
+        s += rng.choice(".?!")
+    return s
+
+
+def _user(plan: SeedPlan, keys: Keys, rng: random.Random, i: int) -> dict[str, Any]:
+    tier = keys.tier_of_user(i)
+    return {
+        "_id": keys.id("users", i),
+        "tier": tier,
+        "created_at": plan.now - timedelta(days=rng.randint(0, 365)),
+        "status": "active",
+        "active_session_key": None,  # set after sessions are seeded
+        "last_seen_at": plan.now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+        "limits": {"tier": tier},
+    }
+
+
+def _personality(plan: SeedPlan, keys: Keys, rng: random.Random, i: int) -> dict[str, Any]:
+    # One personality per user, for the first `personalities` users.
+    return {
+        "_id": keys.id("personalities", i),
+        "user_id": keys.id("users", i),
+        "version": 1,
+        "tone": rng.choice(TONES),
+        "style_prompts": rng.sample(STYLE_SNIPPETS, k=rng.randint(1, len(STYLE_SNIPPETS))),
+        "safety_voice": {
+            "refuse_soft": "I can’t help with that, but I can help with something safer if you want.",
+        },
+        "updated_at": plan.now - timedelta(days=rng.randint(0, 120)),
+    }
+
+
+def _session(plan: SeedPlan, keys: Keys, rng: random.Random, j: int) -> dict[str, Any]:
+    u = keys.user_of_session(j)
+    today = keys.has_today_session(u)
+    day_dt = plan.now if today else plan.now - timedelta(days=rng.randint(0, max(0, plan.day_span - 1)))
+    started_at = day_dt.replace(hour=rng.randint(0, 23), minute=rng.randint(0, 59))
+    if today and rng.random() < HEAVY_TODAY_SHARE:
+        msg_count = rng.randint(30, 200)
+    else:
+        msg_count = max(1, int(rng.paretovariate(2.0)))  # typically 1-5
+    day = day_key(day_dt)
+    return {
+        "_id": keys.id("sessions", j),
+        "user_id": keys.id("users", u),
+        "day": day,
+        "status": "active" if day == day_key(plan.now) else "closed",
+        "started_at": started_at,
+        "last_activity_at": started_at + timedelta(minutes=rng.randint(0, 8 * 60)),
+        "message_count": msg_count,
+        "tier": keys.tier_of_user(u),
+    }
+
+
+def _message(plan: SeedPlan, keys: Keys, rng: random.Random, k: int) -> dict[str, Any]:
+    n_sessions = plan.target("sessions")
+    j = rng.randrange(keys.hot_sessions) if rng.random() < HOT_MESSAGE_SHARE else rng.randrange(n_sessions)
+    u = keys.user_of_session(j)
+    return {
+        "_id": keys.id("messages", k),
+        "user_id": keys.id("users", u),
+        "session_id": keys.id("sessions", j),
+        "role": "user" if rng.random() < 0.5 else "assistant",
+        "content": rand_text(rng),
+        "created_at": plan.now - timedelta(minutes=rng.randint(0, 60 * 24 * plan.day_span)),
+        "tier": keys.tier_of_user(u),
+        "safety": {"blocked": False},
+    }
+
+
+_GENERATORS: dict[str, Callable[[SeedPlan, Keys, random.Random, int], dict[str, Any]]] = {
+    "users": _user,
+    "personalities": _personality,
+    "sessions": _session,
+    "messages": _message,
+}
+
+
+def shard_batches(plan: SeedPlan, shard: Shard, keys: Optional[Keys] = None) -> Iterator[list[dict[str, Any]]]:
+    """The shard's documents in `batch_size` batches (deterministic)."""
+    keys = keys or Keys(plan)
+    rng = random.Random(f"{plan.seed}:{shard.collection}:{shard.index}")
+    make = _GENERATORS[shard.collection]
+    for lo in range(shard.start, shard.stop, plan.batch_size):
+        yield [make(plan, keys, rng, i) for i in range(lo, min(shard.stop, lo + plan.batch_size))]
+
+
+# --- worker processes ----------------------------------------------------------------------------
+
+_worker_db: Any = None
+_worker_keys: dict[SeedPlan, Keys] = {}
+
+
+def _init_worker(uri: str, db_name: str) -> None:
+    global _worker_db
+    _worker_db = MongoClient(uri, **client_options(PROFILES["bulk"]))[db_name]
+
+
+def _insert(collection: Any, batch: list[dict[str, Any]]) -> int:
+    try:
+        collection.insert_many(batch, ordered=False)
+        return len(batch)
+    except BulkWriteError as e:
+        # Documents of a re-run shard already exist; anything but duplicate keys is a real failure.
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+        return e.details.get("nInserted", 0)
+
+
+def _seed_shard(plan: SeedPlan, shard: Shard, export_dir: Optional[str] = None) -> ShardResult:
+    from services.seeder.app import raw
+
+    keys = _worker_keys.get(plan)
+    if keys is None:
+        keys = _worker_keys[plan] = Keys(plan)
+    if export_dir is not None:
+        t0 = time.perf_counter()
+        n = raw.export_shard(plan, shard, export_dir, keys)
+        return ShardResult(shard.collection, shard.index, n, n, time.perf_counter() - t0, 0.0)
+
+    collection = _worker_db[shard.collection]
+    inserted = generated = 0
+    gen_s = insert_s = 0.0
+    batches: Iterator[list[Any]] = (raw.raw_batches if plan.raw else shard_batches)(plan, shard, keys)
+    while True:
+        t0 = time.perf_counter()
+        batch = next(batches, None)
+        t1 = time.perf_counter()
+        gen_s += t1 - t0
+        if batch is None:
+            break
+        generated += len(batch)
+        # Synchronous insert: the next batch is not generated until this one is acknowledged.
+        inserted += _insert(collection, batch)
+        insert_s += time.perf_counter() - t1
+    return ShardResult(shard.collection, shard.index, inserted, generated, gen_s, insert_s)
+
+
+# --- orchestration -------------------------------------------------------------------------------
+
+Progress = Callable[[CollectionReport], None]
+# Called in the parent after each completed shard (e.g. to checkpoint it).
+ShardDone = Callable[[ShardResult], Awaitable[None]]
+
+
+@dataclass
+class SeedReport:
+    collections: list[CollectionReport] = field(default_factory=list)
+    # Wall-clock seconds per phase: drop, drop_indexes, load, indexes, denormalize.
+    phases: dict[str, float] = field(default_factory=dict)
+    # Seconds per collection for the (concurrent) index builds.
+    index_builds: dict[str, float] = field(default_factory=dict)
+
+
+@contextmanager
+def _timed(phases: dict[str, float], name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = time.perf_counter() - started
+
+
+def active_session_keys_pipeline(today: str) -> list[dict[str, Any]]:
+    """`users.active_session_key` for users with a session today, computed and written server-side."""
+    return [
+        {"$match": {"day": today}},
+        {"$project": {"_id": "$user_id", "active_session_key": {"$concat": [today, ":", "$_id"]}}},
+        {"$merge": {"into": "users", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}},
+    ]
+
+
+async def set_active_session_keys(db: AsyncIOMotorDatabase, today: str) -> None:
+    async for _ in db.sessions.aggregate(active_session_keys_pipeline(today)):
+        pass
+
+
+async def seed(
+    plan: SeedPlan,
+    *,
+    uri: str,
+    db_name: str,
+    processes: int,
+    drop: bool = False,
+    defer_indexes: bool = False,
+    progress: Optional[Progress] = None,
+    on_shard: Optional[ShardDone] = None,
+    skip: Optional[Mapping[str, Collection[int]]] = None,
+    export_dir: Optional[str] = None,
+) -> SeedReport:
+    """Seed every collection of `plan` into `db_name`.
+
+    `defer_indexes` drops the collections' secondary indexes before loading (inserts then only maintain
+    `_id`) and builds every index in `services/common/indexes.py` afterwards, all collections at once.
+    `skip` lists shard indexes per collection that are already done (resuming); `on_shard` is awaited
+    after each shard completes. Cancelling the caller stops scheduling shards; shards already running in
+    worker processes finish, and are not reported.
+    With `export_dir`, nothing is written to Mongo: each shard becomes a mongoimport file
+    `<export_dir>/<collection>/<shard>.json` (see `raw.export_shard`).
+    """
+    loop = asyncio.get_running_loop()
+    client = AsyncIOMotorClient(uri, **client_options(PROFILES["bulk"])) if export_dir is None else None
+    db = client[db_name] if client is not None else None
+    # spawn: forking a parent that runs Motor's threads is unsafe.
+    pool = ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker if client is not None else None,
+        initargs=(uri, db_name) if client is not None else (),
+    )
+    in_flight = asyncio.Semaphore(2 * processes)
+    report = SeedReport()
+    _phase = partial(_timed, report.phases)
+    try:
+        if db is not None and drop:
+            with _phase("drop"):
+                await db.client.drop_database(db_name)
+        if db is not None and defer_indexes:
+            with _phase("drop_indexes"):
+                await drop_secondary_indexes(db, COLLECTIONS)
+        with _phase("load"):
+            for collection in COLLECTIONS:
+                done = (skip or {}).get(collection, ())
+                shards = [s for s in plan.shards(collection) if s.index not in done]
+                coll_report = CollectionReport(collection, plan.target(collection), len(shards))
+                report.collections.append(coll_report)
+                await _load(loop, pool, in_flight, plan, shards, coll_report, export_dir, progress, on_shard)
+        if db is not None and defer_indexes:
+            with _phase("indexes"):
+                report.index_builds = await create_indexes(db)
+        if db is not None:
+            with _phase("denormalize"):
+                await set_active_session_keys(db, day_key(plan.now))
+    finally:
+        if client is not None:
+            client.close()
+        await loop.run_in_executor(None, partial(pool.shutdown, cancel_futures=True))
+    return report
+
+
+async def _load(
+    loop: asyncio.AbstractEventLoop,
+    pool: ProcessPoolExecutor,
+    in_flight: asyncio.Semaphore,
+    plan: SeedPlan,
+    shards: list[Shard],
+    report: CollectionReport,
+    export_dir: Optional[str],
+    progress: Optional[Progress],
+    on_shard: Optional[ShardDone],
+) -> None:
+    started = time.perf_counter()
+
+    async def run(shard: Shard) -> None:
+        async with in_flight:
+            res = await loop.run_in_executor(pool, _seed_shard, plan, shard, export_dir)
+        report.inserted += res.inserted
+        report.shards_done += 1
+        report.gen_s += res.gen_s
+        report.insert_s += res.insert_s
+        report.elapsed_s = time.perf_counter() - started
+        if on_shard is not None:
+            await on_shard(res)
+        if progress is not None:
+            progress(report)
+
+    await asyncio.gather(*(run(s) for s in shards))
+    report.elapsed_s = time.perf_counter() - started
@@ -0,0 +1,303 @@
+"""Background seeding jobs with progress, cancellation and shard-level checkpoints.
+
+A job runs `engine.seed` as an asyncio task. Each completed shard is checkpointed in the
+`seed_jobs` collection (`SEEDER_JOBS_DB`, kept apart from the seeded database, which a job may drop).
+Shards are deterministic and idempotent, so resuming re-runs the plan while skipping checkpointed
+shards. A shard that was in flight when the job stopped is simply generated again.
+
+Statuses: `running` → `completed` | `failed` | `cancelled` (DELETE) | `interrupted` (service shutdown
+or crash). All but `running` and `completed` can be resumed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from services.common.logging import get_logger
+from services.common.mongo import get_mongo_client
+from services.seeder.app.engine import COLLECTIONS, SeedPlan, ShardResult, seed
+
+
+log = get_logger("seeder.jobs")
+
+RESUMABLE = ("failed", "cancelled", "interrupted")
+
+
+class JobNotFound(KeyError):
+    pass
+
+
+class JobConflict(RuntimeError):
+    """Another job is running, or the job is not in a state that allows the operation."""
+
+
+@dataclass
+class SeedJob:
+    id: str
+    plan: SeedPlan
+    db_name: str
+    processes: int
+    defer_indexes: bool
+    drop: bool
+    status: str = "running"
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    # Checkpoint: completed shard indexes and documents inserted, per collection.
+    done: dict[str, set[int]] = field(default_factory=lambda: {c: set() for c in COLLECTIONS})
+    inserted: dict[str, int] = field(default_factory=lambda: {c: 0 for c in COLLECTIONS})
+    phases: dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+    # Current run only (not persisted): rate and ETA are computed from it.
+    run_started: float = 0.0
+    run_inserted: int = 0
+
+    def view(self) -> dict[str, Any]:
+        target = sum(self.plan.target(c) for c in COLLECTIONS)
+        inserted = sum(self.inserted.values())
+        elapsed = time.perf_counter() - self.run_started if self.status == "running" else 0.0
+        rate = self.run_inserted / elapsed if elapsed > 0 else 0.0
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "db": self.db_name,
+            "docs_inserted": inserted,
+            "docs_target": target,
+            "rate_docs_per_s": round(rate, 1),
+            "eta_s": round((target - inserted) / rate, 1) if rate > 0 else None,
+            "collections": {
+                c: {
+                    "inserted": self.inserted[c],
+                    "target": self.plan.target(c),
+                    "shards_done": len(self.done[c]),
+                    "shards": len(self.plan.shards(c)),
+                }
+                for c in COLLECTIONS
+            },
+            "phases": {k: round(v, 2) for k, v in self.phases.items()},
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+        }
+
+    def to_doc(self) -> dict[str, Any]:
+        return {
+            "_id": self.id,
+            "plan": asdict(self.plan),
+            "db": self.db_name,
+            "processes": self.processes,
+            "defer_indexes": self.defer_indexes,
+            "drop": self.drop,
+            "status": self.status,
+            "created_at": self.created_at,
+            "done": {c: sorted(v) for c, v in self.done.items()},
+            "inserted": self.inserted,
+            "phases": self.phases,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_doc(cls, doc: dict[str, Any]) -> "SeedJob":
+        plan_fields = dict(doc["plan"])
+        # Mongo returns naive UTC datetimes.
+        plan_fields["now"] = plan_fields["now"].replace(tzinfo=timezone.utc)
+        return cls(
+            id=doc["_id"],
+            plan=SeedPlan(**plan_fields),
+            db_name=doc["db"],
+            processes=doc["processes"],
+            defer_indexes=doc["defer_indexes"],
+            drop=doc["drop"],
+            status=doc["status"],
+            created_at=doc["created_at"].replace(tzinfo=timezone.utc),
+            done={c: set(doc.get("done", {}).get(c, [])) for c in COLLECTIONS},
+            inserted={c: doc.get("inserted", {}).get(c, 0) for c in COLLECTIONS},
+            phases=doc.get("phases", {}),
+            error=doc.get("error"),
+        )
+
+
+class SeedJobs:
+    """At most one running job per service process; state survives restarts through `seed_jobs`."""
+
+    def __init__(
+        self,
+        col: Optional[AsyncIOMotorCollection] = None,
+        *,
+        uri: Optional[str] = None,
+        max_processes: int = 4,
+    ) -> None:
+        self._col = col
+        self.uri = uri or os.getenv("MONGO_URI", "mongodb://localhost:27017")
+        self.max_processes = max_processes
+        self._jobs: dict[str, SeedJob] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    @property
+    def col(self) -> AsyncIOMotorCollection:
+        if self._col is None:
+            self._col = get_mongo_client()[os.getenv("SEEDER_JOBS_DB", "ira_seeder")].seed_jobs
+        return self._col
+
+    def _running(self) -> Optional[SeedJob]:
+        return next((j for j in self._jobs.values() if j.status == "running"), None)
+
+    def _reserve(self, job: SeedJob) -> None:
+        """Claim the running slot for `job`. Synchronous, so call it before the first await: a check
+        followed by an await would let a concurrent request pass the same check."""
+        if self._running() is not None:
+            raise JobConflict("a seed job is already running")
+        job.status = "running"
+        self._jobs[job.id] = job
+
+    async def start(self, plan: SeedPlan, *, db_name: str, processes: int, defer_indexes: bool, drop: bool) -> SeedJob:
+        job = SeedJob(
+            id=uuid.uuid4().hex[:12],
+            plan=plan,
+            db_name=db_name,
+            processes=min(processes, self.max_processes),
+            defer_indexes=defer_indexes,
+            drop=drop,
+        )
+        self._reserve(job)
+        try:
+            await self.col.insert_one(job.to_doc())
+        except BaseException:
+            del self._jobs[job.id]
+            raise
+        self._launch(job, drop=drop)
+        return job
+
+    async def resume(self, job_id: str) -> SeedJob:
+        job = await self.get(job_id)
+        if job.status not in RESUMABLE:
+            raise JobConflict(f"job is {job.status}")
+        before, was_known = (job.status, job.error), job.id in self._jobs
+        self._reserve(job)
+        job.error = None
+        try:
+            await self._save_status(job)
+        except BaseException:
+            job.status, job.error = before
+            if not was_known:
+                del self._jobs[job.id]
+            raise
+        # Never drop on resume: that would discard the checkpointed shards.
+        self._launch(job, drop=False)
+        return job
+
+    async def cancel(self, job_id: str) -> SeedJob:
+        job = await self.get(job_id)
+        task = self._tasks.get(job_id)
+        if job.status != "running" or task is None:
+            raise JobConflict(f"job is {job.status}")
+        job.status = "cancelled"
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return job
+
+    async def get(self, job_id: str) -> SeedJob:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        doc = await self.col.find_one({"_id": job_id})
+        if doc is None:
+            raise JobNotFound(job_id)
+        return SeedJob.from_doc(doc)
+
+    async def recent(self, limit: int = 20) -> list[SeedJob]:
+        cursor = self.col.find({}, sort=[("created_at", -1)], limit=limit)
+        return [self._jobs.get(doc["_id"]) or SeedJob.from_doc(doc) async for doc in cursor]
+
+    async def recover(self, *, auto_resume: bool = False) -> None:
+        """At startup: jobs still marked running were cut off by a restart."""
+        cursor = self.col.find({"status": "running"}, {"_id": 1})
+        ids = [doc["_id"] async for doc in cursor]
+        if not ids:
+            return
+        await self.col.update_many({"_id": {"$in": ids}}, {"$set": {"status": "interrupted"}})
+        log.warning("seed_jobs_interrupted", extra={"extra": {"jobs": ids, "auto_resume": auto_resume}})
+        if auto_resume:
+            # One job at a time: resume the most recent, leave the others for the API.
+            latest = await self.col.find_one({"_id": {"$in": ids}}, sort=[("created_at", -1)])
+            if latest is not None:
+                await self.resume(latest["_id"])
+
+    async def stop(self) -> None:
+        """Service shutdown: stop running jobs as `interrupted`, so they can be resumed."""
+        for job_id, task in list(self._tasks.items()):
+            self._jobs[job_id].status = "interrupted"
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def _launch(self, job: SeedJob, *, drop: bool) -> None:
+        job.run_started, job.run_inserted = time.perf_counter(), 0
+        self._tasks[job.id] = asyncio.create_task(self._run(job, drop=drop))
+
+    async def _run(self, job: SeedJob, *, drop: bool) -> None:
+        async def checkpoint(res: ShardResult) -> None:
+            # `generated`, not `inserted`: a re-run shard skips documents an interrupted run already wrote.
+            job.done[res.collection].add(res.index)
+            job.inserted[res.collection] += res.generated
+            job.run_inserted += res.generated
+            await self.col.update_one(
+                {"_id": job.id},
+                {
+                    "$addToSet": {f"done.{res.collection}": res.index},
+                    "$inc": {f"inserted.{res.collection}": res.generated},
+                    "$set": {"updated_at": datetime.now(timezone.utc)},
+                },
+            )
+
+        log.info("seed_job_started", extra={"extra": {"job_id": job.id, "db": job.db_name, "drop": drop}})
+        try:
+            report = await seed(
+                job.plan,
+                uri=self.uri,
+                db_name=job.db_name,
+                processes=job.processes,
+                drop=drop,
+                defer_indexes=job.defer_indexes,
+                on_shard=checkpoint,
+                skip=job.done,
+            )
+            job.status, job.phases = "completed", report.phases
+        except asyncio.CancelledError:
+            # `cancel()` / `stop()` set the status before cancelling.
+            if job.status == "running":
+                job.status = "interrupted"
+        except Exception as e:  # noqa: BLE001
+            job.status, job.error = "failed", f"{type(e).__name__}: {e}"
+            log.warning("seed_job_failed", extra={"extra": {"job_id": job.id, "err": job.error}})
+        finally:
+            self._tasks.pop(job.id, None)
+            await asyncio.shield(self._save_status(job))
+        log.info("seed_job_finished", extra={"extra": {"job_id": job.id, "status": job.status}})
+
+    async def _save_status(self, job: SeedJob) -> None:
+        await self.col.update_one(
+            {"_id": job.id},
+            {
+                "$set": {
+                    "status": job.status,
+                    "phases": job.phases,
+                    "error": job.error,
+                    "updated_at": datetime.now(timezone.utc),
+                }
+            },
+        )
+
+
+_jobs: Optional[SeedJobs] = None
+
+
+def get_seed_jobs() -> SeedJobs:
+    global _jobs
+    if _jobs is None:
+        _jobs = SeedJobs(max_processes=int(os.getenv("SEEDER_MAX_PROCESSES", str(os.cpu_count() or 4))))
+    return _jobs
@@ -1,33 +1,113 @@
 from __future__ import annotations
 
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
 
 from services.common.app_factory import create_app
 from services.common.logging import get_logger
+from services.common.mongo import close_mongo
 from services.common.request_context import RequestContext, get_request_context, set_request_context
+from services.seeder.app.engine import SeedPlan
+from services.seeder.app.jobs import JobConflict, JobNotFound, SeedJob, get_seed_jobs
 
 
-app = create_app(service="seeder")
 log = get_logger("seeder")
+jobs = get_seed_jobs()
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await jobs.recover(auto_resume=os.getenv("SEEDER_AUTO_RESUME", "false").lower() in {"1", "true", "yes"})
+    yield
+    await jobs.stop()  # running jobs become `interrupted`, resumable after restart
+    await close_mongo()
+
+
+app = create_app(service="seeder", lifespan=lifespan)
 
 
 class SeedRequest(BaseModel):
-    total_users: int = Field(1_000, ge=1, le=10_000_000)
+    users: int = Field(1_000, ge=1, le=50_000_000)
+    personalities: int | None = Field(None, ge=0, le=50_000_000, description="default: users")
+    sessions: int = Field(1_000, ge=0, le=50_000_000)
+    messages: int = Field(2_000, ge=0, le=50_000_000)
+    seed: int = 1337
+    day_span: int = Field(30, ge=1, le=365)
+    batch_size: int = Field(2_000, ge=100, le=50_000)
+    shard_size: int = Field(50_000, ge=1_000, le=1_000_000)
+    raw: bool = False
+    db: str = Field(default_factory=lambda: os.getenv("MONGO_DB", "ira"), min_length=1, max_length=64)
+    drop: bool = False
+    defer_indexes: bool = True
+    # Worker processes; capped by SEEDER_MAX_PROCESSES.
+    processes: int = Field(4, ge=1, le=64)
 
 
-@app.post("/seed")
-async def seed(req: SeedRequest):
+def _set_context(operation: str) -> None:
     ctx = get_request_context()
     correlation_id = ctx.correlation_id if ctx is not None else "missing-correlation-id"
-    set_request_context(
-        RequestContext(
-            correlation_id=correlation_id,
-            service="seeder",
-            operation="seed",
-        )
+    set_request_context(RequestContext(correlation_id=correlation_id, service="seeder", operation=operation))
+
+
+async def _job(job_id: str) -> SeedJob:
+    try:
+        return await jobs.get(job_id)
+    except JobNotFound:
+        raise HTTPException(status_code=404, detail="job not found") from None
+
+
+@app.post("/seed", status_code=202)
+async def seed(req: SeedRequest):
+    _set_context("seed")
+    plan = SeedPlan(
+        users=req.users,
+        personalities=req.users if req.personalities is None else req.personalities,
+        sessions=req.sessions,
+        messages=req.messages,
+        seed=req.seed,
+        day_span=req.day_span,
+        batch_size=req.batch_size,
+        shard_size=req.shard_size,
+        raw=req.raw,
     )
-    # Stub only: real seeding is Part 1/2 via scripts (and a one-shot compose service).
-    log.info("seed_requested", extra={"extra": {"total_users": req.total_users}})
-    return {"ok": True, "note": "Seeder is stubbed; real seeding comes in Part 1."}
+    try:
+        job = await jobs.start(plan, db_name=req.db, processes=req.processes, defer_indexes=req.defer_indexes, drop=req.drop)
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    log.info("seed_requested", extra={"extra": {"job_id": job.id, "db": req.db, "users": req.users}})
+    return job.view()
+
+
+@app.get("/seed")
+async def list_jobs(limit: int = 20):
+    return [job.view() for job in await jobs.recent(limit)]
+
+
+@app.get("/seed/{job_id}")
+async def job_status(job_id: str):
+    return (await _job(job_id)).view()
+
+
+@app.delete("/seed/{job_id}")
+async def cancel_job(job_id: str):
+    _set_context("seed_cancel")
+    await _job(job_id)
+    try:
+        job = await jobs.cancel(job_id)
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    return job.view()
 
 
+@app.post("/seed/{job_id}/resume", status_code=202)
+async def resume_job(job_id: str):
+    _set_context("seed_resume")
+    await _job(job_id)
+    try:
+        job = await jobs.resume(job_id)
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    return job.view()
@@ -0,0 +1,303 @@
+"""Columnar fast path for the seeding engine (`SeedPlan.raw`) and mongoimport export.
+
+The default path builds one dict per document from `random.Random` draws, with `datetime`s, and
+lets pymongo encode it. Here each batch is drawn column by column: tiers, day offsets, timestamps,
+message lengths and so on, vectorized with NumPy when it is installed and drawn in plain loops
+otherwise. Dates are `DatetimeMS` (epoch milliseconds, no `datetime` objects). Message text is a
+slice of a per-process word corpus. Documents are then encoded with `bson.encode` (C extension)
+into `RawBSONDocument`s, which pymongo sends as they are.
+
+Ids, links and tiers come from `Keys`, as on the default path. The other random fields come from a
+different RNG stream: a raw dataset is as deterministic as the default one and follows the same
+distributions, but the two are not identical.
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import random
+from bisect import bisect_right
+from datetime import timedelta
+from typing import Any, Iterator, Optional, Sequence
+
+import bson
+from bson import json_util
+from bson.datetime_ms import DatetimeMS
+from bson.raw_bson import RawBSONDocument
+
+from services.seeder.app.engine import (
+    HEAVY_TODAY_SHARE,
+    HOT_MESSAGE_SHARE,
+    STYLE_SNIPPETS,
+    TIERS,
+    TODAY_USER_SHARE,
+    TONES,
+    WORDS,
+    Keys,
+    SeedPlan,
+    Shard,
+    day_key,
+)
+
+try:
+    import numpy as np
+except ImportError:  # optional: plain-Python draws
+    np = None  # type: ignore[assignment]
+
+
+_DAY_MS = 86_400_000
+_MINUTE_MS = 60_000
+_CORPUS_CHARS = 1 << 20
+_STYLE_CHOICES = [list(p[:k]) for k in range(1, len(STYLE_SNIPPETS) + 1) for p in itertools.permutations(STYLE_SNIPPETS)]
+_SAFETY_VOICE = {"refuse_soft": "I can’t help with that, but I can help with something safer if you want."}
+_M64 = (1 << 64) - 1
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+class _Draws:
+    """Batch draws of Python ints/floats, from NumPy's generator when available."""
+
+    def __init__(self, seed: str) -> None:
+        self._rng = random.Random(seed)
+        self._np = np.random.default_rng(self._rng.getrandbits(64)) if np is not None else None
+
+    def integers(self, lo: int, hi: int, n: int) -> list[int]:
+        """`n` ints in [lo, hi]."""
+        if self._np is not None:
+            return self._np.integers(lo, hi + 1, n).tolist()
+        # random() scaling instead of randint: ~3x cheaper, bias far below anything a seed can show.
+        r, span = self._rng.random, hi - lo + 1
+        return [lo + int(r() * span) for _ in range(n)]
+
+    def uniform(self, n: int) -> list[float]:
+        if self._np is not None:
+            return self._np.random(n).tolist()
+        r = self._rng.random
+        return [r() for _ in range(n)]
+
+    def pareto_counts(self, alpha: float, n: int) -> list[int]:
+        # Same as int(random.paretovariate(alpha)); NumPy's pareto is shifted by one (Lomax).
+        if self._np is not None:
+            return (self._np.pareto(alpha, n) + 1.0).astype(np.int64).tolist()
+        r = self._rng.paretovariate
+        return [int(r(alpha)) for _ in range(n)]
+
+
+def _units(salt: int, idx: Sequence[int]) -> list[float]:
+    """`Keys._unit` over many indexes (bit-identical)."""
+    if np is None:
+        out = []
+        for i in idx:
+            x = ((salt ^ i) + 0x9E3779B97F4A7C15) & _M64
+            x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _M64
+            x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _M64
+            out.append((x ^ (x >> 31)) / 2.0**64)
+        return out
+    x = np.asarray(idx, dtype=np.uint64) ^ np.uint64(salt)
+    with np.errstate(over="ignore"):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    x = x ^ (x >> np.uint64(31))
+    # float64 of the uint64 then scale: same value as Python's int / 2.0**64.
+    return (x.astype(np.float64) / 2.0**64).tolist()
+
+
+def _tiers(keys: Keys, users: Sequence[int]) -> list[str]:
+    cutoffs, last = keys.tier_cutoffs, len(TIERS) - 1
+    return [TIERS[min(bisect_right(cutoffs, x), last)] for x in _units(keys.tier_salt, users)]
+
+
+def _users_of_sessions(keys: Keys, sessions: Sequence[int]) -> list[int]:
+    a, b, n = keys.perm
+    return [(a * j + b) % n for j in sessions]
+
+
+class _Corpus:
+    """Random words joined into one long string; message text is a slice starting at a word."""
+
+    def __init__(self, seed: str) -> None:
+        words = random.Random(seed).choices(WORDS, k=_CORPUS_CHARS // 6)
+        starts, total = [], 0
+        for w in words:
+            starts.append(total)
+            total += len(w) + 1
+        self.text = " ".join(words) + " "
+        self.starts = starts
+
+    def slices(self, draws: _Draws, lengths: list[int], punct: list[float]) -> list[str]:
+        n_starts = len(self.starts) - 1
+        # Starts near the end would run out of text: the corpus is far longer than any message.
+        picks = draws.integers(0, n_starts - 64, len(lengths))
+        out = []
+        for p, length, q in zip(picks, lengths, punct):
+            start = self.starts[p]
+            s = self.text[start : start + length].strip()
+            if q < 0.2:
+                s += ".?!"[int(q * 15)]
+            out.append(s)
+        return out
+
+
+_corpus: Optional[_Corpus] = None
+
+
+def _get_corpus(plan: SeedPlan) -> _Corpus:
+    global _corpus
+    if _corpus is None:
+        _corpus = _Corpus(f"{plan.seed}:corpus")
+    return _corpus
+
+
+def _now_ms(plan: SeedPlan) -> int:
+    return int(plan.now.timestamp() * 1000)
+
+
+def _users(plan: SeedPlan, keys: Keys, d: _Draws, idx: range) -> list[dict[str, Any]]:
+    n, now = len(idx), _now_ms(plan)
+    tiers = _tiers(keys, idx)
+    created = d.integers(0, 365, n)
+    seen = d.integers(0, 60 * 24 * 30, n)
+    return [
+        {
+            "_id": keys.id("users", i),
+            "tier": tier,
+            "created_at": DatetimeMS(now - c * _DAY_MS),
+            "status": "active",
+            "active_session_key": None,
+            "last_seen_at": DatetimeMS(now - s * _MINUTE_MS),
+            "limits": {"tier": tier},
+        }
+        for i, tier, c, s in zip(idx, tiers, created, seen)
+    ]
+
+
+def _personalities(plan: SeedPlan, keys: Keys, d: _Draws, idx: range) -> list[dict[str, Any]]:
+    n, now = len(idx), _now_ms(plan)
+    tones = d.integers(0, len(TONES) - 1, n)
+    styles = d.integers(0, len(_STYLE_CHOICES) - 1, n)
+    updated = d.integers(0, 120, n)
+    return [
+        {
+            "_id": keys.id("personalities", i),
+            "user_id": keys.id("users", i),
+            "version": 1,
+            "tone": TONES[t],
+            "style_prompts": _STYLE_CHOICES[s],
+            "safety_voice": _SAFETY_VOICE,
+            "updated_at": DatetimeMS(now - u * _DAY_MS),
+        }
+        for i, t, s, u in zip(idx, tones, styles, updated)
+    ]
+
+
+def _sessions(plan: SeedPlan, keys: Keys, d: _Draws, idx: range) -> list[dict[str, Any]]:
+    n, now = len(idx), _now_ms(plan)
+    midnight = now - now % _DAY_MS
+    days = [day_key(plan.now - timedelta(days=o)) for o in range(max(1, plan.day_span))]
+    today_key = days[0]
+    users = _users_of_sessions(keys, idx)
+    tiers = _tiers(keys, users)
+    today = [x < TODAY_USER_SHARE for x in _units(keys.today_salt, users)]
+    offsets = d.integers(0, max(0, plan.day_span - 1), n)
+    minute_of_day = d.integers(0, 24 * 60 - 1, n)
+    active_for = d.integers(0, 8 * 60, n)
+    heavy = d.uniform(n)
+    heavy_counts = d.integers(30, 200, n)
+    light_counts = d.pareto_counts(2.0, n)
+    docs = []
+    for k, j in enumerate(idx):
+        offset = 0 if today[k] else offsets[k]
+        started = midnight - offset * _DAY_MS + minute_of_day[k] * _MINUTE_MS
+        day = days[offset]
+        docs.append(
+            {
+                "_id": keys.id("sessions", j),
+                "user_id": keys.id("users", users[k]),
+                "day": day,
+                "status": "active" if day == today_key else "closed",
+                "started_at": DatetimeMS(started),
+                "last_activity_at": DatetimeMS(started + active_for[k] * _MINUTE_MS),
+                "message_count": heavy_counts[k] if today[k] and heavy[k] < HEAVY_TODAY_SHARE else max(1, light_counts[k]),
+                "tier": tiers[k],
+            }
+        )
+    return docs
+
+
+def _messages(plan: SeedPlan, keys: Keys, d: _Draws, idx: range) -> list[dict[str, Any]]:
+    n, now = len(idx), _now_ms(plan)
+    hot = d.uniform(n)
+    hot_pick = d.integers(0, keys.hot_sessions - 1, n)
+    any_pick = d.integers(0, plan.target("sessions") - 1, n)
+    sessions = [h if x < HOT_MESSAGE_SHARE else a for x, h, a in zip(hot, hot_pick, any_pick)]
+    users = _users_of_sessions(keys, sessions)
+    tiers = _tiers(keys, users)
+    roles = d.uniform(n)
+    lengths = d.integers(20, 220, n)
+    content = _get_corpus(plan).slices(d, lengths, d.uniform(n))
+    ages = d.integers(0, 60 * 24 * plan.day_span, n)
+    return [
+        {
+            "_id": keys.id("messages", i),
+            "user_id": keys.id("users", u),
+            "session_id": keys.id("sessions", j),
+            "role": "user" if r < 0.5 else "assistant",
+            "content": c,
+            "created_at": DatetimeMS(now - a * _MINUTE_MS),
+            "tier": t,
+            "safety": {"blocked": False},
+        }
+        for i, j, u, t, r, c, a in zip(idx, sessions, users, tiers, roles, content, ages)
+    ]
+
+
+_COLUMNAR = {"users": _users, "personalities": _personalities, "sessions": _sessions, "messages": _messages}
+
+
+def columnar_batches(plan: SeedPlan, shard: Shard, keys: Optional[Keys] = None) -> Iterator[list[dict[str, Any]]]:
+    """The shard's documents in `batch_size` batches, drawn column-wise (dates as `DatetimeMS`)."""
+    keys = keys or Keys(plan)
+    draws = _Draws(f"{plan.seed}:{shard.collection}:{shard.index}:columnar")
+    make = _COLUMNAR[shard.collection]
+    for lo in range(shard.start, shard.stop, plan.batch_size):
+        yield make(plan, keys, draws, range(lo, min(shard.stop, lo + plan.batch_size)))
+
+
+def raw_batches(plan: SeedPlan, shard: Shard, keys: Optional[Keys] = None) -> Iterator[list[RawBSONDocument]]:
+    """`columnar_batches`, pre-encoded: pymongo inserts `RawBSONDocument`s without re-encoding."""
+    for batch in columnar_batches(plan, shard, keys):
+        yield [RawBSONDocument(bson.encode(doc)) for doc in batch]
+
+
+def export_path(out_dir: str, shard: Shard) -> str:
+    return os.path.join(out_dir, shard.collection, f"{shard.index:05d}.json")
+
+
+def export_shard(plan: SeedPlan, shard: Shard, out_dir: str, keys: Optional[Keys] = None) -> int:
+    """Write the shard as mongoimport input (one Extended JSON document per line); returns docs written."""
+    path = export_path(out_dir, shard)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for batch in columnar_batches(plan, shard, keys):
+            for doc in batch:
+                f.write(json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS))
+                f.write("\n")
+            written += len(batch)
+    # A shard file exists only once complete.
+    os.replace(tmp, path)
+    return written
+
+
+def read_export(path: str) -> Iterator[dict[str, Any]]:
+    """Documents of an export file, decoded as mongoimport would."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield json_util.loads(line, json_options=json_util.RELAXED_JSON_OPTIONS)
+
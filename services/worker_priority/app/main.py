@@ -1,20 +1,43 @@
 from __future__ import annotations
 
-import asyncio
-import random
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
 
 from services.common.app_factory import create_app
+from services.common.llm import LLMError, create_llm_client
 from services.common.logging import get_logger
-from services.common.request_context import RequestContext, get_request_context, set_request_context
+from services.common.message_writer import get_message_writer, record_turn
+from services.common.mongo import close_mongo, warm_up as warm_up_mongo
+from services.common.personality_cache import get_personality_cache
+from services.common.request_context import RequestContext, StageTimings, get_request_context, set_request_context, stage
 from services.common.rate_limit import SessionDayLimiter, human_reset_message
 from services.common.safety import detect_unsafe, refusal_message
 
 
-app = create_app(service="worker-priority")
 log = get_logger("worker-priority")
 limiter = SessionDayLimiter()
+personalities = get_personality_cache()
+messages = get_message_writer()
+llm = create_llm_client("priority")
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await warm_up_mongo()
+    await personalities.start()
+    await messages.start()
+    await llm.start()
+    yield
+    await llm.aclose()
+    await messages.stop()  # drains queued messages before Mongo closes
+    await personalities.stop()
+    await close_mongo()
+
+
+app = create_app(service="worker-priority", lifespan=lifespan)
 
 
 class ProcessRequest(BaseModel):
@@ -25,6 +48,7 @@ class ProcessRequest(BaseModel):
 
 @app.post("/process")
 async def process(req: ProcessRequest):
+    received_at = datetime.now(timezone.utc)
     ctx = get_request_context()
     correlation_id = ctx.correlation_id if ctx is not None else "missing-correlation-id"
     set_request_context(
@@ -34,13 +58,18 @@ async def process(req: ProcessRequest):
             user_id=req.user_id,
             tier=req.tier,
             operation="process",
+            timings=ctx.timings if ctx is not None else StageTimings(),
         )
     )
 
+    # Personality tone (served from the per-worker cache; Mongo only on miss).
+    tone = await personalities.tone_for(req.user_id)
+
     # 1) Safety check (does not consume quota)
-    safety = detect_unsafe(req.message)
+    with stage("safety"):
+        safety = detect_unsafe(req.message)
     if not safety.allowed:
-        return {"ok": True, "reply": refusal_message(tone="warm", category=safety.category), "blocked": True}
+        return {"ok": True, "reply": refusal_message(tone=tone, category=safety.category), "blocked": True}
 
     # 2) Rate limit (enterprise is unlimited)
     rl = await limiter.check_and_increment(user_id=req.user_id, tier=req.tier)  # type: ignore[arg-type]
@@ -54,9 +83,21 @@ async def process(req: ProcessRequest):
             }
         return {"ok": True, "reply": None, "rate_limited": True, "silent": True}
 
-    # Stub "LLM" latency: faster / more stable for priority pool.
-    await asyncio.sleep(random.uniform(0.02, 0.06))
+    with stage("llm"):
+        try:
+            completion = await llm.complete(req.message, tone=tone)
+        except LLMError as e:
+            # 503 sends the router on to its next candidate pool (or a graceful shed). That pool counts the
+            # message again, so give this one back: a message is counted once, and only when answered.
+            log.warning("llm_failed", extra={"extra": {"user_id": req.user_id, "reason": e.reason}})
+            await limiter.refund(user_id=req.user_id, tier=req.tier, result=rl)  # type: ignore[arg-type]
+            raise HTTPException(status_code=503, detail="llm_unavailable") from None
+    reply = completion.text
     log.info("processed", extra={"extra": {"user_id": req.user_id, "tier": req.tier}})
-    return {"ok": True, "reply": "Processed by priority pool (stub)."}
+    # Persisted write-behind; only the session lookup (usually one Redis GET) is on the request path.
+    await record_turn(
+        messages, user_id=req.user_id, tier=req.tier, message=req.message, reply=reply, received_at=received_at
+    )
+    return {"ok": True, "reply": reply}
 
 
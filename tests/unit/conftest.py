@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import httpx
+import pytest
+
+
+@pytest.fixture
+def asgi_client() -> Callable[[Any], httpx.AsyncClient]:
+    """Factory for an in-process client of an ASGI app (no lifespan; use as `async with asgi_client(app)`)."""
+
+    def make(app: Any) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+    return make
@@ -0,0 +1,714 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+from datetime import datetime, timezone
+from typing import Any, Iterable, Optional
+
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import (
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+)
+
+
+_MISSING = object()
+_CHANGE_STREAM_UNSUPPORTED = 40573
+
+
+# --- documents ---------------------------------------------------------------------------------
+
+
+def _get(doc: Any, path: str) -> Any:
+    for part in path.split("."):
+        if isinstance(doc, dict) and part in doc:
+            doc = doc[part]
+        else:
+            return _MISSING
+    return doc
+
+
+def _set(doc: dict[str, Any], path: str, value: Any) -> None:
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def _unset(doc: dict[str, Any], path: str) -> None:
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(last, None)
+
+
+def _utc(value: Any) -> Any:
+    # Mongo compares dates as UTC instants; a real client returns them naive, callers pass them aware.
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _cmp_key(value: Any) -> tuple[int, Any]:
+    # Missing and null sort first, as in Mongo.
+    return (0, 0) if value is _MISSING or value is None else (1, _utc(value))
+
+
+def _match_op(value: Any, op: str, arg: Any) -> bool:
+    present = value is not _MISSING
+    if op == "$eq":
+        return _equals(value, arg)
+    if op == "$ne":
+        return not _equals(value, arg)
+    if op == "$in":
+        return any(_equals(value, a) for a in arg)
+    if op == "$nin":
+        return not any(_equals(value, a) for a in arg)
+    if op == "$exists":
+        return present == bool(arg)
+    if op in {"$gt", "$gte", "$lt", "$lte"}:
+        if not present or value is None:
+            return False
+        value, arg = _utc(value), _utc(arg)
+        if op == "$gt":
+            return value > arg
+        if op == "$gte":
+            return value >= arg
+        if op == "$lt":
+            return value < arg
+        return value <= arg
+    raise NotImplementedError(f"fake_mongo: query operator {op}")
+
+
+def _equals(value: Any, arg: Any) -> bool:
+    if value is _MISSING:
+        return arg is None
+    if isinstance(value, list) and not isinstance(arg, list):
+        return any(_utc(v) == _utc(arg) for v in value)
+    return _utc(value) == _utc(arg)
+
+
+def matches(doc: dict[str, Any], flt: Optional[dict[str, Any]]) -> bool:
+    for key, cond in (flt or {}).items():
+        if key == "$and":
+            if not all(matches(doc, f) for f in cond):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, f) for f in cond):
+                return False
+        elif isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            value = _get(doc, key)
+            if not all(_match_op(value, op, arg) for op, arg in cond.items()):
+                return False
+        elif not _equals(_get(doc, key), cond):
+            return False
+    return True
+
+
+def project(doc: dict[str, Any], projection: Optional[Any]) -> dict[str, Any]:
+    if not projection:
+        return copy.deepcopy(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = dict.fromkeys(projection, 1)
+    include = [k for k, v in projection.items() if v and k != "_id"]
+    if include:
+        out = {}
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        for path in include:
+            value = _get(doc, path)
+            if value is not _MISSING:
+                _set(out, path, copy.deepcopy(value))
+        return out
+    out = copy.deepcopy(doc)
+    for path, v in projection.items():
+        if not v:
+            _unset(out, path)
+    return out
+
+
+def _sort_spec(sort: Any) -> list[tuple[str, int]]:
+    if not sort:
+        return []
+    if isinstance(sort, dict):
+        return list(sort.items())
+    if isinstance(sort, str):
+        return [(sort, 1)]
+    return [tuple(s) for s in sort]  # type: ignore[misc]
+
+
+def sort_docs(docs: list[dict[str, Any]], sort: Any) -> list[dict[str, Any]]:
+    for field, direction in reversed(_sort_spec(sort)):
+        docs = sorted(docs, key=lambda d: _cmp_key(_get(d, field)), reverse=direction < 0)
+    return docs
+
+
+def apply_update(doc: dict[str, Any], update: dict[str, Any], *, inserting: bool = False) -> None:
+    if not any(k.startswith("$") for k in update):
+        _id = doc.get("_id")
+        doc.clear()
+        doc.update(copy.deepcopy(update))
+        if _id is not None:
+            doc.setdefault("_id", _id)
+        return
+    for op, fields in update.items():
+        for path, arg in fields.items():
+            current = _get(doc, path)
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                _set(doc, path, copy.deepcopy(arg))
+            elif op == "$setOnInsert":
+                continue
+            elif op == "$unset":
+                _unset(doc, path)
+            elif op == "$inc":
+                _set(doc, path, (0 if current is _MISSING else current) + arg)
+            elif op == "$max":
+                if current is _MISSING or _utc(arg) > _utc(current):
+                    _set(doc, path, arg)
+            elif op == "$min":
+                if current is _MISSING or _utc(arg) < _utc(current):
+                    _set(doc, path, arg)
+            elif op == "$push":
+                _set(doc, path, ([] if current is _MISSING else current) + [copy.deepcopy(arg)])
+            elif op == "$addToSet":
+                values = [] if current is _MISSING else current
+                if arg not in values:
+                    _set(doc, path, values + [copy.deepcopy(arg)])
+            else:
+                raise NotImplementedError(f"fake_mongo: update operator {op}")
+
+
+def _upsert_doc(flt: dict[str, Any], update: dict[str, Any]) -> dict[str, Any]:
+    doc: dict[str, Any] = {}
+    for key, cond in flt.items():
+        if not key.startswith("$") and not (isinstance(cond, dict) and any(k.startswith("$") for k in cond)):
+            _set(doc, key, copy.deepcopy(cond))
+    apply_update(doc, update, inserting=True)
+    doc.setdefault("_id", ObjectId())
+    return doc
+
+
+# --- aggregation -------------------------------------------------------------------------------
+
+
+def _eval(expr: Any, doc: dict[str, Any]) -> Any:
+    if isinstance(expr, str) and expr.startswith("$"):
+        if expr == "$$ROOT":
+            return doc
+        if expr == "$$NOW":
+            return datetime.now(timezone.utc)
+        value = _get(doc, expr[1:])
+        return None if value is _MISSING else value
+    if isinstance(expr, dict):
+        if len(expr) == 1 and next(iter(expr)).startswith("$"):
+            op, args = next(iter(expr.items()))
+            if op == "$concat":
+                return "".join(str(_eval(a, doc)) for a in args)
+            if op == "$literal":
+                return args
+            if op == "$ifNull":
+                return next((v for v in (_eval(a, doc) for a in args) if v is not None), None)
+            if op == "$arrayToObject":
+                return {item["k"]: item["v"] for item in _eval(args, doc)}
+            raise NotImplementedError(f"fake_mongo: expression {op}")
+        return {k: _eval(v, doc) for k, v in expr.items()}
+    return expr
+
+
+def _group(docs: list[dict[str, Any]], spec: dict[str, Any]) -> list[dict[str, Any]]:
+    groups: dict[Any, dict[str, Any]] = {}
+    keys: dict[Any, Any] = {}
+    for doc in docs:
+        key = _eval(spec["_id"], doc)
+        hashable = repr(key)
+        out = groups.get(hashable)
+        if out is None:
+            out = groups[hashable] = {"_id": key}
+            keys[hashable] = key
+            first = True
+        else:
+            first = False
+        for field, acc in spec.items():
+            if field == "_id":
+                continue
+            (op, arg), = acc.items()
+            value = _eval(arg, doc)
+            if op == "$first":
+                if first:
+                    out[field] = copy.deepcopy(value)
+            elif op == "$last":
+                out[field] = copy.deepcopy(value)
+            elif op == "$sum":
+                out[field] = out.get(field, 0) + (value if isinstance(value, (int, float)) else 0)
+            elif op == "$max":
+                out[field] = value if first or value > out[field] else out[field]
+            elif op == "$min":
+                out[field] = value if first or value < out[field] else out[field]
+            elif op == "$push":
+                out.setdefault(field, []).append(copy.deepcopy(value))
+            else:
+                raise NotImplementedError(f"fake_mongo: accumulator {op}")
+    return list(groups.values())
+
+
+def run_pipeline(docs: list[dict[str, Any]], pipeline: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    for stage in pipeline:
+        (name, arg), = stage.items()
+        if name == "$match":
+            docs = [d for d in docs if matches(d, arg)]
+        elif name == "$sort":
+            docs = sort_docs(docs, arg)
+        elif name == "$limit":
+            docs = docs[:arg]
+        elif name == "$skip":
+            docs = docs[arg:]
+        elif name == "$group":
+            docs = _group(docs, arg)
+        elif name == "$project":
+            if all(v in (0, 1, True, False) for v in arg.values()):
+                docs = [project(d, arg) for d in docs]
+            else:
+                docs = [
+                    {**({"_id": d.get("_id")} if arg.get("_id", 1) else {}), **{k: _eval(v, d) for k, v in arg.items() if k != "_id"}}
+                    for d in docs
+                ]
+        elif name == "$count":
+            docs = [{arg: len(docs)}]
+        else:
+            raise NotImplementedError(f"fake_mongo: aggregation stage {name}")
+    return docs
+
+
+# --- motor stand-ins -----------------------------------------------------------------------------
+
+
+class FakeCursor:
+    """Sort/skip/limit apply to whole documents, then the projection (the sort key need not be projected)."""
+
+    def __init__(self, load: Any, *, projection: Any = None, sort: Any = None, limit: int = 0, skip: int = 0) -> None:
+        self._load = load
+        self._projection = projection
+        self._sort = sort
+        self._limit = limit
+        self._skip = skip
+        self._docs: Optional[list[dict[str, Any]]] = None
+        self._i = 0
+
+    def sort(self, key: Any, direction: Optional[int] = None) -> "FakeCursor":
+        self._sort = [(key, direction or 1)] if isinstance(key, str) else key
+        return self
+
+    def limit(self, n: int) -> "FakeCursor":
+        self._limit = n
+        return self
+
+    def skip(self, n: int) -> "FakeCursor":
+        self._skip = n
+        return self
+
+    def batch_size(self, n: int) -> "FakeCursor":
+        return self
+
+    async def _fetch(self) -> list[dict[str, Any]]:
+        if self._docs is None:
+            docs = await self._load()
+            docs = sort_docs(docs, self._sort)[self._skip :]
+            docs = docs[: self._limit] if self._limit else docs
+            self._docs = [project(d, self._projection) for d in docs]
+        return self._docs
+
+    def __aiter__(self) -> "FakeCursor":
+        return self
+
+    async def __anext__(self) -> dict[str, Any]:
+        docs = await self._fetch()
+        if self._i >= len(docs):
+            raise StopAsyncIteration
+        self._i += 1
+        return docs[self._i - 1]
+
+    async def to_list(self, length: Optional[int] = None) -> list[dict[str, Any]]:
+        docs = (await self._fetch())[self._i :]
+        docs = docs[:length] if length else docs
+        self._i += len(docs)
+        return docs
+
+    async def close(self) -> None:
+        self._docs = []
+
+
+class FakeCollection:
+    def __init__(self, database: "FakeDatabase", name: str) -> None:
+        self.database = database
+        self.name = name
+        self.docs: dict[Any, dict[str, Any]] = {}
+        # (operation, filter / pipeline / documents / requests) per round trip, oldest first.
+        self.calls: list[tuple[str, Any]] = []
+        # Equality lookups built on demand per field and dropped on any write (see `_candidates`).
+        self._version = 0
+        self._lookups: dict[str, tuple[int, Optional[dict[Any, list[Any]]]]] = {}
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.database.name}.{self.name}"
+
+    async def _round_trip(self, op: str, arg: Any = None) -> None:
+        self.calls.append((op, arg))
+        await self.database.client._round_trip()
+
+    def _insert(self, doc: dict[str, Any]) -> Any:
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.full_name} dup key: {{ _id: {doc['_id']!r} }}", 11000)
+        self.docs[doc["_id"]] = doc
+        self._version += 1
+        return doc["_id"]
+
+    def _merge(self, docs: list[dict[str, Any]], spec: dict[str, Any]) -> None:
+        """`$merge` on `_id` with `whenMatched` replace/merge/keepExisting and `whenNotMatched` insert/discard."""
+        if spec.get("on", "_id") != "_id":
+            raise NotImplementedError("fake_mongo: $merge on a field other than _id")
+        when_matched = spec.get("whenMatched", "merge")
+        when_not_matched = spec.get("whenNotMatched", "insert")
+        for doc in docs:
+            existing = self.docs.get(doc["_id"])
+            if existing is None:
+                if when_not_matched == "insert":
+                    self._insert(doc)
+                elif when_not_matched != "discard":
+                    raise NotImplementedError(f"fake_mongo: $merge whenNotMatched {when_not_matched}")
+            elif when_matched == "replace":
+                self.docs[doc["_id"]] = copy.deepcopy(doc)
+            elif when_matched == "merge":
+                existing.update(copy.deepcopy(doc))
+            elif when_matched != "keepExisting":
+                raise NotImplementedError(f"fake_mongo: $merge whenMatched {when_matched}")
+        self._version += 1
+
+    def load(self, documents: Iterable[dict[str, Any]]) -> None:
+        """Seed documents directly (no round trip, no copy); replaces documents with the same `_id`."""
+        for doc in documents:
+            self.docs[doc["_id"]] = doc
+        self._version += 1
+
+    def clear(self) -> None:
+        self.docs.clear()
+        self._version += 1
+
+    def _lookup(self, field: str) -> Optional[dict[Any, list[Any]]]:
+        version, lookup = self._lookups.get(field, (-1, None))
+        if version == self._version:
+            return lookup
+        lookup = {}
+        for _id, doc in self.docs.items():
+            value = _get(doc, field)
+            if isinstance(value, (list, dict)):
+                lookup = None  # array/document values match in ways a hash lookup does not
+                break
+            lookup.setdefault(None if value is _MISSING else value, []).append(_id)
+        self._lookups[field] = (self._version, lookup)
+        return lookup
+
+    def _candidates(self, flt: dict[str, Any]) -> Optional[list[dict[str, Any]]]:
+        # Narrow a scan by the first top-level equality or `$in` on a hashable value, like an index would.
+        for key, cond in flt.items():
+            if key.startswith("$"):
+                continue
+            if isinstance(cond, dict):
+                if list(cond) != ["$in"]:
+                    continue
+                values = cond["$in"]
+            else:
+                values = [cond]
+            if not all(isinstance(v, (str, int, float, bool, ObjectId, type(None))) for v in values):
+                continue
+            lookup = self._lookup(key)
+            if lookup is None:
+                continue
+            ids = [_id for v in dict.fromkeys(values) for _id in lookup.get(v, ())]
+            return [self.docs[_id] for _id in ids]
+        return None
+
+    def _find(self, flt: Optional[dict[str, Any]]) -> list[dict[str, Any]]:
+        _id = (flt or {}).get("_id", _MISSING)
+        if _id is not _MISSING and not isinstance(_id, dict):
+            doc = self.docs.get(_id)
+            return [doc] if doc is not None and matches(doc, flt) else []
+        candidates = self._candidates(flt) if flt else None
+        return [d for d in (self.docs.values() if candidates is None else candidates) if matches(d, flt)]
+
+    # --- writes ------------------------------------------------------------------------------
+
+    async def insert_one(self, document: dict[str, Any], **kwargs: Any) -> InsertOneResult:
+        await self._round_trip("insert_one", document)
+        _id = self._insert(document)
+        document.setdefault("_id", _id)
+        return InsertOneResult(_id, True)
+
+    async def insert_many(self, documents: Iterable[dict[str, Any]], ordered: bool = True, **kwargs: Any) -> InsertManyResult:
+        await self._round_trip("insert_many", documents)
+        ids, errors = [], []
+        for i, doc in enumerate(documents):
+            try:
+                ids.append(self._insert(doc))
+                doc.setdefault("_id", ids[-1])
+            except DuplicateKeyError as e:
+                errors.append({"index": i, "code": 11000, "errmsg": str(e), "op": doc})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(ids), "writeConcernErrors": [], "upserted": []})
+        return InsertManyResult(ids, True)
+
+    def _update(self, flt: dict[str, Any], update: dict[str, Any], *, upsert: bool, multi: bool) -> dict[str, Any]:
+        found = self._find(flt)
+        if not multi:
+            found = found[:1]
+        for doc in found:
+            apply_update(doc, update)
+        self._version += 1
+        result: dict[str, Any] = {"n": len(found), "nModified": len(found), "ok": 1.0}
+        if not found and upsert:
+            doc = _upsert_doc(flt, update)
+            self._insert(doc)
+            result.update(n=1, upserted=doc["_id"])
+        return result
+
+    async def update_one(self, filter: dict[str, Any], update: dict[str, Any], upsert: bool = False, **kwargs: Any) -> UpdateResult:
+        await self._round_trip("update_one", filter)
+        return UpdateResult(self._update(filter, update, upsert=upsert, multi=False), True)
+
+    async def update_many(self, filter: dict[str, Any], update: dict[str, Any], upsert: bool = False, **kwargs: Any) -> UpdateResult:
+        await self._round_trip("update_many", filter)
+        return UpdateResult(self._update(filter, update, upsert=upsert, multi=True), True)
+
+    async def replace_one(self, filter: dict[str, Any], replacement: dict[str, Any], upsert: bool = False, **kwargs: Any) -> UpdateResult:
+        await self._round_trip("replace_one", filter)
+        return UpdateResult(self._update(filter, replacement, upsert=upsert, multi=False), True)
+
+    def _delete(self, flt: dict[str, Any], *, multi: bool) -> int:
+        found = self._find(flt)
+        if not multi:
+            found = found[:1]
+        for doc in found:
+            del self.docs[doc["_id"]]
+        self._version += 1
+        return len(found)
+
+    async def delete_one(self, filter: dict[str, Any], **kwargs: Any) -> DeleteResult:
+        await self._round_trip("delete_one", filter)
+        return DeleteResult({"n": self._delete(filter, multi=False)}, True)
+
+    async def delete_many(self, filter: dict[str, Any], **kwargs: Any) -> DeleteResult:
+        await self._round_trip("delete_many", filter)
+        return DeleteResult({"n": self._delete(filter, multi=True)}, True)
+
+    async def find_one_and_update(
+        self,
+        filter: dict[str, Any],
+        update: dict[str, Any],
+        projection: Any = None,
+        sort: Any = None,
+        upsert: bool = False,
+        return_document: bool = ReturnDocument.BEFORE,
+        **kwargs: Any,
+    ) -> Optional[dict[str, Any]]:
+        await self._round_trip("find_one_and_update", filter)
+        found = sort_docs(self._find(filter), sort)[:1]
+        if found:
+            before = project(found[0], projection)
+            apply_update(found[0], update)
+            self._version += 1
+            return project(found[0], projection) if return_document == ReturnDocument.AFTER else before
+        if not upsert:
+            return None
+        doc = _upsert_doc(filter, update)
+        self._insert(doc)
+        return project(doc, projection) if return_document == ReturnDocument.AFTER else None
+
+    async def bulk_write(self, requests: list[Any], ordered: bool = True, **kwargs: Any) -> BulkWriteResult:
+        await self._round_trip("bulk_write", requests)
+        result = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nUpserted": 0, "nRemoved": 0, "upserted": [], "writeErrors": [], "writeConcernErrors": []}
+        for i, op in enumerate(requests):
+            try:
+                if isinstance(op, InsertOne):
+                    self._insert(op._doc)
+                    result["nInserted"] += 1
+                elif isinstance(op, (UpdateOne, UpdateMany, ReplaceOne)):
+                    res = self._update(op._filter, op._doc, upsert=op._upsert, multi=isinstance(op, UpdateMany))
+                    if "upserted" in res:
+                        result["nUpserted"] += 1
+                        result["upserted"].append({"index": i, "_id": res["upserted"]})
+                    else:
+                        result["nMatched"] += res["n"]
+                        result["nModified"] += res["nModified"]
+                elif isinstance(op, (DeleteOne, DeleteMany)):
+                    result["nRemoved"] += self._delete(op._filter, multi=isinstance(op, DeleteMany))
+                else:
+                    raise NotImplementedError(f"fake_mongo: bulk op {type(op).__name__}")
+            except DuplicateKeyError as e:
+                result["writeErrors"].append({"index": i, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    # --- reads -------------------------------------------------------------------------------
+
+    def find(
+        self,
+        filter: Optional[dict[str, Any]] = None,
+        projection: Any = None,
+        *,
+        sort: Any = None,
+        limit: int = 0,
+        skip: int = 0,
+        **kwargs: Any,
+    ) -> FakeCursor:
+        async def load() -> list[dict[str, Any]]:
+            await self._round_trip("find", filter)
+            return self._find(filter)
+
+        return FakeCursor(load, projection=projection, sort=sort, limit=limit, skip=skip)
+
+    async def find_one(self, filter: Optional[dict[str, Any]] = None, projection: Any = None, *, sort: Any = None, **kwargs: Any) -> Optional[dict[str, Any]]:
+        await self._round_trip("find_one", filter)
+        found = sort_docs(self._find(filter), sort)[:1]
+        return project(found[0], projection) if found else None
+
+    async def count_documents(self, filter: dict[str, Any], **kwargs: Any) -> int:
+        await self._round_trip("count_documents", filter)
+        return len(self._find(filter))
+
+    def aggregate(self, pipeline: list[dict[str, Any]], **kwargs: Any) -> FakeCursor:
+        async def load() -> list[dict[str, Any]]:
+            await self._round_trip("aggregate", pipeline)
+            stages, merge = pipeline, None
+            if pipeline and "$merge" in pipeline[-1]:
+                stages, merge = pipeline[:-1], pipeline[-1]["$merge"]
+            if stages and "$match" in stages[0]:
+                docs = run_pipeline(self._find(stages[0]["$match"]), stages[1:])
+            else:
+                docs = run_pipeline(list(self.docs.values()), stages)
+            if merge is None:
+                return docs
+            self.database[merge["into"]]._merge(docs, merge)
+            return []
+
+        return FakeCursor(load)
+
+    def watch(self, *args: Any, **kwargs: Any) -> Any:
+        # Like a standalone mongod: callers fall back to polling.
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", _CHANGE_STREAM_UNSUPPORTED)
+
+    # --- indexes -----------------------------------------------------------------------------
+
+    async def create_indexes(self, indexes: list[Any], **kwargs: Any) -> list[str]:
+        await self._round_trip("create_indexes", indexes)
+        return [ix.document["name"] for ix in indexes]
+
+    async def create_index(self, keys: Any, **kwargs: Any) -> str:
+        await self._round_trip("create_index", keys)
+        return kwargs.get("name", "index")
+
+    async def drop_index(self, name: str, **kwargs: Any) -> None:
+        await self._round_trip("drop_index", name)
+
+    async def drop_indexes(self, **kwargs: Any) -> None:
+        await self._round_trip("drop_indexes")
+
+    async def drop(self) -> None:
+        await self._round_trip("drop")
+        self.clear()
+
+
+class FakeDatabase:
+    def __init__(self, client: "FakeMongoClient", name: str) -> None:
+        self.client = client
+        self.name = name
+        self._collections: dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        col = self._collections.get(name)
+        if col is None:
+            col = self._collections[name] = FakeCollection(self, name)
+        return col
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str, **kwargs: Any) -> FakeCollection:
+        return self[name]
+
+    async def command(self, command: Any, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        await self.client._round_trip()
+        name = command if isinstance(command, str) else next(iter(command))
+        if name in {"ping", "buildInfo", "serverStatus"}:
+            return {"ok": 1.0, "version": "fake"}
+        raise NotImplementedError(f"fake_mongo: command {name}")
+
+    async def list_collection_names(self, **kwargs: Any) -> list[str]:
+        await self.client._round_trip()
+        return [n for n, c in self._collections.items() if c.docs]
+
+    async def drop_collection(self, name: str) -> None:
+        await self.client._round_trip()
+        self._collections.pop(name, None)
+
+
+class FakeMongoClient:
+    """In-memory stand-in for the subset of `AsyncIOMotorClient` this repo uses.
+
+    Queries support equality, dotted paths, `$in/$nin/$gt/$gte/$lt/$lte/$ne/$exists/$and/$or`; updates
+    `$set/$setOnInsert/$inc/$max/$min/$unset/$push/$addToSet` with upserts; aggregations
+    `$match/$sort/$limit/$skip/$group/$project/$count` and a final `$merge`. Anything else raises NotImplementedError.
+    `watch` fails like a standalone server. Documents are copied on the way in and out; datetimes are
+    returned as stored (a real client returns naive UTC) and compared as UTC instants, naive or aware.
+    Each collection logs its round trips in `calls` as (operation, filter/pipeline/documents/requests).
+
+    `latency_s` is slept once per round trip; 0 still yields to the event loop once, as I/O would.
+    """
+
+    def __init__(self, *, latency_s: float = 0.0) -> None:
+        self.latency_s = latency_s
+        self._dbs: dict[str, FakeDatabase] = {}
+        self.round_trips = 0
+
+    async def _round_trip(self) -> None:
+        self.round_trips += 1
+        await asyncio.sleep(self.latency_s)
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        db = self._dbs.get(name)
+        if db is None:
+            db = self._dbs[name] = FakeDatabase(self, name)
+        return db
+
+    def __getattr__(self, name: str) -> FakeDatabase:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_database(self, name: str, **kwargs: Any) -> FakeDatabase:
+        return self[name]
+
+    def reset(self) -> None:
+        """Drop all data and call logs; database and collection objects stay valid for holders of references."""
+        for db in self._dbs.values():
+            for col in db._collections.values():
+                col.clear()
+                col.calls.clear()
+
+    def close(self) -> None:
+        pass
@@ -1,46 +1,217 @@
 from __future__ import annotations
 
+import asyncio
+import fnmatch
+import hashlib
 import time
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Callable, Optional
+
+from redis.exceptions import NoScriptError, WatchError
+
+
+# A script's Python stand-in: fn(redis, keys, args) -> result, using `redis.call(...)` like Lua's redis.call.
+ScriptFn = Callable[["FakeRedis", list[str], list[Any]], Any]
+
+
+def _command(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Async command with one simulated round trip; `.sync` runs it inline (pipelines, scripts)."""
+
+    async def command(self: "FakeRedis", *args: Any, **kwargs: Any) -> Any:
+        await self._round_trip(1)
+        return fn(self, *args, **kwargs)
+
+    command.sync = fn  # type: ignore[attr-defined]
+    command.__name__ = fn.__name__
+    command.__doc__ = fn.__doc__
+    return command
+
+
+def _sha(script: str) -> str:
+    return hashlib.sha1(script.encode()).hexdigest()
 
 
 class FakePipeline:
+    """Queues any FakeRedis command; `execute` runs them in order in one round trip, with no other
+    client interleaving (so `transaction=True` and `False` behave alike).
+
+    Optimistic locking works like redis-py: after `await pipe.watch(*keys)` commands run immediately
+    until `pipe.multi()`, and `execute` raises `WatchError` if a watched key changed since the watch.
+    """
+
     def __init__(self, redis: "FakeRedis") -> None:
         self._redis = redis
         self._ops: list[tuple[str, tuple[Any, ...], dict[str, Any]]] = []
+        self._watched: dict[str, Any] = {}
+        self._immediate = False
 
-    def incr(self, key: str) -> "FakePipeline":
-        self._ops.append(("incr", (key,), {}))
+    def _queue(self, op: str, *args: Any, **kwargs: Any) -> "FakePipeline":
+        self._ops.append((op, args, kwargs))
         return self
 
-    def ttl(self, key: str) -> "FakePipeline":
-        self._ops.append(("ttl", (key,), {}))
+    def __getattr__(self, op: str) -> Callable[..., Any]:
+        if op.startswith("_") or not hasattr(getattr(type(self._redis), op, None), "sync"):
+            raise AttributeError(op)
+        if self._immediate:
+            return getattr(self._redis, op)
+        return lambda *args, **kwargs: self._queue(op, *args, **kwargs)
+
+    async def watch(self, *keys: str) -> bool:
+        await self._redis._round_trip(1)
+        self._watched.update({key: self._redis._snapshot(key) for key in keys})
+        self._immediate = True
+        return True
+
+    async def unwatch(self) -> bool:
+        self._watched.clear()
+        self._immediate = False
+        return True
+
+    def multi(self) -> None:
+        self._immediate = False
+
+    def __len__(self) -> int:
+        return len(self._ops)
+
+    async def __aenter__(self) -> "FakePipeline":
         return self
 
-    async def execute(self) -> list[Any]:
-        out: list[Any] = []
-        for op, args, kwargs in self._ops:
-            fn = getattr(self._redis, op)
-            res = await fn(*args, **kwargs)  # type: ignore[misc]
-            out.append(res)
+    async def __aexit__(self, *exc: Any) -> None:
+        self.reset()
+
+    def reset(self) -> None:
         self._ops.clear()
-        return out
+        self._watched.clear()
+        self._immediate = False
+
+    async def execute(self) -> list[Any]:
+        ops, self._ops = self._ops, []
+        watched, self._watched = self._watched, {}
+        self._immediate = False
+        await self._redis._round_trip(len(ops))
+        if any(self._redis._snapshot(key) != before for key, before in watched.items()):
+            raise WatchError("Watched variable changed.")
+        return [self._redis.call(op, *args, **kwargs) for op, args, kwargs in ops]
+
+
+class FakeScript:
+    """What `register_script` returns; `await script(keys=[...], args=[...])` runs it via EVALSHA."""
+
+    def __init__(self, redis: "FakeRedis", script: str) -> None:
+        self.redis = redis
+        self.script = script
+        self.sha = _sha(script)
+
+    async def __call__(self, keys: Any = (), args: Any = (), client: Optional["FakeRedis"] = None) -> Any:
+        return await (client or self.redis).evalsha(self.sha, len(keys), *keys, *args)
+
+
+class FakePubSub:
+    def __init__(self, redis: "FakeRedis") -> None:
+        self._redis = redis
+        self.channels: set[str] = set()
+        self.patterns: set[str] = set()
+        self._messages: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+
+    @property
+    def subscribed(self) -> bool:
+        return bool(self.channels or self.patterns)
+
+    def _deliver(self, message: dict[str, Any]) -> None:
+        self._messages.put_nowait(message)
+
+    def _ack(self, kind: str, name: str) -> None:
+        self._deliver({"type": kind, "pattern": None, "channel": name, "data": len(self.channels) + len(self.patterns)})
+
+    async def subscribe(self, *channels: str) -> None:
+        for ch in channels:
+            self.channels.add(ch)
+            self._redis._subscribers.setdefault(ch, set()).add(self)
+            self._ack("subscribe", ch)
+
+    async def psubscribe(self, *patterns: str) -> None:
+        for p in patterns:
+            self.patterns.add(p)
+            self._redis._psubscribers.setdefault(p, set()).add(self)
+            self._ack("psubscribe", p)
+
+    async def unsubscribe(self, *channels: str) -> None:
+        for ch in channels or tuple(self.channels):
+            self.channels.discard(ch)
+            self._redis._subscribers.get(ch, set()).discard(self)
+            self._ack("unsubscribe", ch)
+
+    async def punsubscribe(self, *patterns: str) -> None:
+        for p in patterns or tuple(self.patterns):
+            self.patterns.discard(p)
+            self._redis._psubscribers.get(p, set()).discard(self)
+            self._ack("punsubscribe", p)
+
+    async def get_message(self, ignore_subscribe_messages: bool = False, timeout: Optional[float] = 0.0) -> Optional[dict[str, Any]]:
+        while True:
+            try:
+                if timeout is None:
+                    message = await self._messages.get()
+                elif timeout > 0:
+                    message = await asyncio.wait_for(self._messages.get(), timeout)
+                else:
+                    message = self._messages.get_nowait()
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                return None
+            if ignore_subscribe_messages and message["type"] not in {"message", "pmessage"}:
+                continue
+            return message
+
+    async def listen(self) -> AsyncIterator[dict[str, Any]]:
+        while self.subscribed or not self._messages.empty():
+            yield await self._messages.get()
+
+    async def aclose(self) -> None:
+        await self.unsubscribe()
+        await self.punsubscribe()
+
+    close = aclose
+    reset = aclose
+
+    async def __aenter__(self) -> "FakePubSub":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.aclose()
 
 
 class FakeRedis:
-    """A minimal async Redis mock for unit tests.
+    """An in-memory async Redis stand-in for unit tests and the in-process harness.
 
     Supports:
-    - incr
-    - ttl
-    - expire
-    - set (NX + EX)
-    - pipeline with incr+ttl sequence
+    - strings/counters: get, set (NX, EX, PX), incr, incrby, decr, mget, exists
+    - keys: ttl, expire, delete, flushall
+    - lists: lpush, lpushx, rpush, ltrim, lrange, llen
+    - pipeline (ops run in order on execute, in one round trip; `transaction` is ignored), with
+      watch / multi / unwatch
+    - eval / evalsha / script_load / register_script, for scripts given a Python
+      implementation with `define_script` (there is no Lua interpreter)
+    - publish / pubsub (subscribe, psubscribe, get_message, listen)
+
+    `latency_s` is slept once per round trip (command, pipeline or script); 0 means commands never
+    yield to the event loop. `commands` and `round_trips` count what clients sent.
     """
 
-    def __init__(self) -> None:
-        self._store: dict[str, str] = {}
+    def __init__(self, *, latency_s: float = 0.0) -> None:
+        self.latency_s = latency_s
+        self._store: dict[str, Any] = {}
         self._expiry: dict[str, float] = {}  # unix timestamp seconds
+        self._scripts: dict[str, ScriptFn] = {}
+        self._loaded: set[str] = set()
+        self._subscribers: dict[str, set[FakePubSub]] = {}
+        self._psubscribers: dict[str, set[FakePubSub]] = {}
+        self.commands = 0
+        self.round_trips = 0
+
+    async def _round_trip(self, commands: int) -> None:
+        self.commands += commands
+        self.round_trips += 1
+        if self.latency_s > 0:
+            await asyncio.sleep(self.latency_s)
 
     def _purge_if_expired(self, key: str) -> None:
         exp = self._expiry.get(key)
@@ -48,16 +219,86 @@ class FakeRedis:
             self._store.pop(key, None)
             self._expiry.pop(key, None)
 
-    def pipeline(self) -> FakePipeline:
+    def _snapshot(self, key: str) -> Any:
+        # What WATCH compares: the value and expiry (a copy, since lists change in place).
+        self._purge_if_expired(key)
+        value = self._store.get(key)
+        return (list(value) if isinstance(value, list) else value, self._expiry.get(key))
+
+    def call(self, op: str, *args: Any, **kwargs: Any) -> Any:
+        """Run a command inline, without a round trip (what `redis.call` does inside a script)."""
+        fn = getattr(getattr(type(self), op.lower(), None), "sync", None)
+        if fn is None:
+            raise NotImplementedError(f"FakeRedis: {op} is not supported")
+        return fn(self, *args, **kwargs)
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
         return FakePipeline(self)
 
-    async def incr(self, key: str) -> int:
+    def pubsub(self) -> FakePubSub:
+        return FakePubSub(self)
+
+    async def aclose(self) -> None:
+        pass
+
+    def reset(self) -> None:
+        """Drop all keys and zero the counters; defined scripts and subscriptions are kept."""
+        self._store.clear()
+        self._expiry.clear()
+        self.commands = 0
+        self.round_trips = 0
+
+    # --- strings ---------------------------------------------------------------------------
+
+    @_command
+    def incr(self, key: str) -> int:
+        return self.call("incrby", key, 1)
+
+    @_command
+    def incrby(self, key: str, amount: int) -> int:
         self._purge_if_expired(key)
-        v = int(self._store.get(key, "0")) + 1
+        v = int(self._store.get(key, "0")) + amount
         self._store[key] = str(v)
         return v
 
-    async def ttl(self, key: str) -> int:
+    @_command
+    def decr(self, key: str) -> int:
+        return self.call("incrby", key, -1)
+
+    @_command
+    def set(self, key: str, value: str, *, ex: Optional[int] = None, px: Optional[int] = None, nx: bool = False) -> bool:
+        self._purge_if_expired(key)
+        if nx and key in self._store:
+            return False
+        self._store[key] = value
+        self._expiry.pop(key, None)
+        if ex is not None:
+            self._expiry[key] = time.time() + ex
+        elif px is not None:
+            self._expiry[key] = time.time() + px / 1000.0
+        return True
+
+    @_command
+    def get(self, key: str) -> Optional[str]:
+        self._purge_if_expired(key)
+        return self._store.get(key)
+
+    @_command
+    def mget(self, *keys: str) -> list[Optional[str]]:
+        return [self.call("get", k) for k in keys]
+
+    @_command
+    def exists(self, *keys: str) -> int:
+        n = 0
+        for key in keys:
+            self._purge_if_expired(key)
+            n += key in self._store
+        return n
+
+    # --- keys ------------------------------------------------------------------------------
+
+    @_command
+    def ttl(self, key: str) -> int:
         self._purge_if_expired(key)
         if key not in self._store:
             return -2  # redis: key does not exist
@@ -66,19 +307,117 @@ class FakeRedis:
             return -1  # redis: no expiry
         return max(0, int(exp - time.time()))
 
-    async def expire(self, key: str, seconds: int) -> bool:
+    @_command
+    def expire(self, key: str, seconds: int) -> bool:
         self._purge_if_expired(key)
         if key not in self._store:
             return False
         self._expiry[key] = time.time() + seconds
         return True
 
-    async def set(self, key: str, value: str, *, ex: Optional[int] = None, nx: bool = False) -> bool:
+    @_command
+    def delete(self, *keys: str) -> int:
+        n = 0
+        for key in keys:
+            self._purge_if_expired(key)
+            if self._store.pop(key, None) is not None:
+                n += 1
+            self._expiry.pop(key, None)
+        return n
+
+    @_command
+    def flushall(self) -> bool:
+        self._store.clear()
+        self._expiry.clear()
+        return True
+
+    # --- lists -----------------------------------------------------------------------------
+
+    @_command
+    def lpush(self, key: str, *values: str) -> int:
         self._purge_if_expired(key)
-        if nx and key in self._store:
-            return False
-        self._store[key] = value
-        if ex is not None:
-            self._expiry[key] = time.time() + ex
+        items = self._store.setdefault(key, [])
+        for v in values:
+            items.insert(0, v)
+        return len(items)
+
+    @_command
+    def lpushx(self, key: str, *values: str) -> int:
+        self._purge_if_expired(key)
+        if key not in self._store:
+            return 0
+        return self.call("lpush", key, *values)
+
+    @_command
+    def rpush(self, key: str, *values: str) -> int:
+        self._purge_if_expired(key)
+        self._store.setdefault(key, []).extend(values)
+        return len(self._store[key])
+
+    @_command
+    def ltrim(self, key: str, start: int, stop: int) -> bool:
+        self._purge_if_expired(key)
+        if key in self._store:
+            self._store[key] = self._store[key][start : stop + 1 if stop != -1 else None]
         return True
 
+    @_command
+    def lrange(self, key: str, start: int, stop: int) -> list[str]:
+        self._purge_if_expired(key)
+        return list(self._store.get(key, [])[start : stop + 1 if stop != -1 else None])
+
+    @_command
+    def llen(self, key: str) -> int:
+        self._purge_if_expired(key)
+        return len(self._store.get(key, []))
+
+    # --- scripts ---------------------------------------------------------------------------
+
+    def define_script(self, script: str, fn: ScriptFn) -> str:
+        """Give `script` a Python implementation; returns its SHA1 (as EVALSHA expects)."""
+        sha = _sha(script)
+        self._scripts[sha] = fn
+        return sha
+
+    def register_script(self, script: str) -> FakeScript:
+        return FakeScript(self, script)
+
+    @_command
+    def script_load(self, script: str) -> str:
+        sha = _sha(script)
+        self._loaded.add(sha)
+        return sha
+
+    def _run_script(self, sha: str, numkeys: int, keys_and_args: tuple[Any, ...]) -> Any:
+        fn = self._scripts.get(sha)
+        if fn is None:
+            raise NotImplementedError("FakeRedis: script has no Python implementation (define_script)")
+        return fn(self, list(keys_and_args[:numkeys]), list(keys_and_args[numkeys:]))
+
+    @_command
+    def eval(self, script: str, numkeys: int, *keys_and_args: Any) -> Any:
+        sha = _sha(script)
+        self._loaded.add(sha)
+        return self._run_script(sha, numkeys, keys_and_args)
+
+    @_command
+    def evalsha(self, sha: str, numkeys: int, *keys_and_args: Any) -> Any:
+        # Like redis-py's Script, callers load on NOSCRIPT; scripts with an implementation count as loaded.
+        if sha not in self._loaded and sha not in self._scripts:
+            raise NoScriptError("No matching script. Please use EVAL.")
+        return self._run_script(sha, numkeys, keys_and_args)
+
+    # --- pub/sub ---------------------------------------------------------------------------
+
+    @_command
+    def publish(self, channel: str, message: Any) -> int:
+        receivers = 0
+        for sub in tuple(self._subscribers.get(channel, ())):
+            sub._deliver({"type": "message", "pattern": None, "channel": channel, "data": message})
+            receivers += 1
+        for pattern, subs in self._psubscribers.items():
+            if fnmatch.fnmatchcase(channel, pattern):
+                for sub in tuple(subs):
+                    sub._deliver({"type": "pmessage", "pattern": pattern, "channel": channel, "data": message})
+                    receivers += 1
+        return receivers
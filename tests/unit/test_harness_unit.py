@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from pymongo import ReturnDocument, UpdateOne
+
+from scripts.harness import SCENARIOS, compare, run_scenario
+from tests.unit.fake_mongo import FakeMongoClient
+from tests.unit.fake_redis import FakeRedis
+
+
+async def test_fake_redis_pipeline_scripts_and_pubsub():
+    r = FakeRedis()
+    pipe = r.pipeline()
+    pipe.incr("n").incr("n").expire("n", 60)
+    assert await pipe.execute() == [1, 2, True]
+    assert (r.commands, r.round_trips) == (3, 1)
+
+    script = "return redis.call('INCRBY', KEYS[1], ARGV[1])"
+    r.define_script(script, lambda redis, keys, args: redis.call("incrby", keys[0], int(args[0])))
+    assert await r.eval(script, 1, "n", 5) == 7
+    assert await r.register_script(script)(keys=["n"], args=[1]) == 8
+
+    sub = r.pubsub()
+    await sub.psubscribe("turns:*")
+    assert await r.publish("turns:u1", "hi") == 1
+    msg = await sub.get_message(ignore_subscribe_messages=True, timeout=0.1)
+    assert msg is not None and (msg["channel"], msg["data"]) == ("turns:u1", "hi")
+
+
+async def test_fake_mongo_queries_updates_and_aggregation():
+    db = FakeMongoClient()["t"]
+    await db.p.insert_many([{"_id": i, "user_id": f"u{i % 3}", "v": i} for i in range(9)])
+
+    assert [d["_id"] async for d in db.p.find({"user_id": {"$in": ["u1"]}, "v": {"$gt": 1}}, sort=[("v", -1)])] == [7, 4]
+    assert await db.p.find({"user_id": "u0"}, projection={"v": 1, "_id": 0}, limit=1).to_list() == [{"v": 0}]
+
+    before = await db.c.find_one_and_update(
+        {"_id": "k"}, {"$setOnInsert": {"n": 0}, "$inc": {"hits": 1}}, upsert=True, return_document=ReturnDocument.BEFORE
+    )
+    await db.c.bulk_write([UpdateOne({"_id": "k"}, {"$inc": {"hits": 2}, "$max": {"top": 3}}, upsert=True)])
+    assert before is None and await db.c.find_one({"_id": "k"}) == {"_id": "k", "n": 0, "hits": 3, "top": 3}
+
+    pipeline = [
+        {"$match": {"user_id": {"$in": ["u0", "u2"]}}},
+        {"$sort": {"user_id": 1, "v": -1}},
+        {"$group": {"_id": "$user_id", "latest": {"$first": "$v"}, "total": {"$sum": "$v"}}},
+    ]
+    assert await db.p.aggregate(pipeline).to_list() == [
+        {"_id": "u0", "latest": 6, "total": 9},
+        {"_id": "u2", "latest": 8, "total": 15},
+    ]
+
+
+async def test_harness_runs_the_chat_path_in_process():
+    scenario = next(s for s in SCENARIOS if s.name == "chat_enterprise")
+    result = await run_scenario(scenario, requests=40, concurrency=4, warmup=5, seed=1)
+
+    assert result["outcomes"] == {"ok": 40}
+    # Rate limiting, the session index and the message cache all went through the fake Redis;
+    # sessions, messages and analytics were written to the fake Mongo by shutdown.
+    assert result["redis_commands_per_request"] > 0
+    assert result["mongo_round_trips_per_request"] > 0
+
+    slower = {**result, "us_per_request": result["us_per_request"] * 2}
+    assert compare({"scenarios": {"x": result}}, {"scenarios": {"x": result}}) == []
+    assert compare({"scenarios": {"x": result}}, {"scenarios": {"x": slower}})[0].startswith("x: us_per_request")
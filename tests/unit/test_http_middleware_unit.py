@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from services.common.http import CORRELATION_ID_HEADER, SERVER_TIMING_HEADER, install_request_context_middleware
+from services.common.request_context import RequestContext, get_request_context, set_request_context, stage
+
+
+def _app(slow_ms_threshold: float = 250.0) -> FastAPI:
+    app = FastAPI()
+    install_request_context_middleware(app, service="router", slow_ms_threshold=slow_ms_threshold)
+
+    @app.get("/ctx")
+    async def ctx():
+        c = get_request_context()
+        return {"correlation_id": c.correlation_id if c else None}
+
+    @app.get("/staged")
+    async def staged():
+        c = get_request_context()
+        assert c is not None
+        # Handlers replace the context but carry the timings object forward.
+        set_request_context(RequestContext(correlation_id=c.correlation_id, service="router", timings=c.timings))
+        with stage("redis"):
+            pass
+        with stage("redis"):
+            pass
+        with stage("llm"):
+            pass
+        return {"ok": True}
+
+    @app.get("/stream")
+    async def stream():
+        async def gen():
+            for i in range(3):
+                yield f"chunk{i}\n"
+
+        return StreamingResponse(gen(), media_type="text/plain")
+
+    return app
+
+
+@pytest.mark.asyncio
+async def test_incoming_correlation_id_is_propagated_to_context_and_response(asgi_client):
+    async with asgi_client(_app()) as client:
+        r = await client.get("/ctx", headers={CORRELATION_ID_HEADER: "abc-123"})
+    assert r.json() == {"correlation_id": "abc-123"}
+    assert r.headers[CORRELATION_ID_HEADER] == "abc-123"
+
+
+@pytest.mark.asyncio
+async def test_missing_or_oversized_correlation_id_is_generated(asgi_client):
+    async with asgi_client(_app()) as client:
+        r1 = await client.get("/ctx")
+        r2 = await client.get("/ctx", headers={CORRELATION_ID_HEADER: "x" * 200})
+    for r in (r1, r2):
+        cid = r.headers[CORRELATION_ID_HEADER]
+        assert len(cid) == 36 and r.json()["correlation_id"] == cid
+
+
+@pytest.mark.asyncio
+async def test_streaming_response_passes_through_with_header(asgi_client):
+    async with asgi_client(_app()) as client:
+        r = await client.get("/stream")
+    assert r.text == "chunk0\nchunk1\nchunk2\n"
+    assert CORRELATION_ID_HEADER in r.headers
+
+
+@pytest.mark.asyncio
+async def test_slow_request_is_logged_with_status(caplog: pytest.LogCaptureFixture, asgi_client):
+    caplog.set_level(logging.WARNING, logger="router.http")
+    async with asgi_client(_app(slow_ms_threshold=0.0)) as client:
+        await client.get("/ctx")
+    [record] = [r for r in caplog.records if r.getMessage() == "slow_request"]
+    assert record.extra["path"] == "/ctx"  # type: ignore[attr-defined]
+    assert record.extra["status_code"] == 200  # type: ignore[attr-defined]
+
+
+@pytest.mark.asyncio
+async def test_server_timing_header_lists_recorded_stages(asgi_client):
+    async with asgi_client(_app()) as client:
+        plain = await client.get("/ctx")
+        staged = await client.get("/staged")
+    assert SERVER_TIMING_HEADER not in plain.headers
+    names = [entry.split(";")[0] for entry in staged.headers[SERVER_TIMING_HEADER].split(", ")]
+    assert names == ["redis", "llm", "total"]
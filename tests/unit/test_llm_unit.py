@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from dataclasses import replace
+
+import httpx
+import pytest
+
+from services.common.llm import (
+    POOL_DEFAULTS,
+    BatchingLLM,
+    HttpLLM,
+    LLMConfig,
+    LLMError,
+    StubLLM,
+    create_llm_client,
+    llm_config_from_env,
+)
+from services.mock_llm.app import main as mock_llm
+from services.mock_llm.app.main import MockConfig, parse_latency
+
+
+def _http_llm(transport: httpx.AsyncBaseTransport, **overrides) -> HttpLLM:
+    config = replace(POOL_DEFAULTS["standard"], backoff_base_s=0.0, **overrides)
+    client = httpx.AsyncClient(transport=transport, base_url="http://llm")
+    return HttpLLM(config, client=client, rng=random.Random(0))
+
+
+@pytest.fixture
+def mock_backend():
+    before = mock_llm.state.config
+    mock_llm.state.configure(MockConfig(latency="fixed:0", token_ms=0, tokens=5))
+    yield mock_llm.state
+    mock_llm.state.configure(before)
+
+
+async def test_http_llm_completes_and_streams_against_the_mock_server(mock_backend):
+    llm = _http_llm(httpx.ASGITransport(app=mock_llm.app))
+
+    completion = await llm.complete("hi", tone="warm")
+    assert completion.tokens == 5 and len(completion.text.split()) == 5 and completion.attempts == 1
+
+    tokens = [t async for t in llm.stream("hi", max_tokens=3)]
+    assert len(tokens) == 3 and not tokens[0].startswith(" ") and all(t.startswith(" ") for t in tokens[1:])
+
+    mock_backend.configure(MockConfig(latency="fixed:0", token_ms=0, tokens=5, stream_error_rate=1.0))
+    with pytest.raises(LLMError) as e:
+        _ = [t async for t in llm.stream("hi")]
+    assert e.value.reason == "injected"
+
+
+async def test_http_llm_retries_5xx_but_not_4xx():
+    statuses = [503, 503, 200]
+
+    def flaky(request: httpx.Request) -> httpx.Response:
+        status = statuses.pop(0)
+        return httpx.Response(status, json={"text": "ok", "tokens": 1} if status == 200 else {"error": "busy"})
+
+    completion = await _http_llm(httpx.MockTransport(flaky)).complete("hi")
+    assert (completion.text, completion.attempts) == ("ok", 3)
+
+    calls = []
+
+    def bad_request(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(400, json={"error": "bad"})
+
+    with pytest.raises(LLMError) as e:
+        await _http_llm(httpx.MockTransport(bad_request)).complete("hi")
+    assert (e.value.reason, e.value.retryable, len(calls)) == ("status_400", False, 1)
+
+    with pytest.raises(LLMError) as e:
+        await _http_llm(httpx.MockTransport(lambda r: httpx.Response(503)), max_retries=1).complete("hi")
+    assert e.value.reason == "status_503"
+
+
+async def test_http_llm_gives_up_at_the_deadline(mock_backend):
+    mock_backend.configure(MockConfig(latency="fixed:0", hang_rate=1.0, hang_s=5.0))
+    llm = _http_llm(httpx.ASGITransport(app=mock_llm.app), deadline_s=0.05)
+    with pytest.raises(LLMError) as e:
+        await llm.complete("hi")
+    assert e.value.reason == "deadline"
+
+
+async def test_stub_llm_and_env_config(monkeypatch):
+    stub = StubLLM(LLMConfig(pool="priority", stub_latency_s=(0.0, 0.0)))
+    assert (await stub.complete("hi")).text == "Processed by priority pool (stub)."
+    assert "".join([t async for t in stub.stream("hi")]) == stub.reply
+
+    monkeypatch.setenv("LLM_BACKEND", "http")
+    monkeypatch.setenv("LLM_OVERFLOW_TIMEOUT_S", "9")
+    monkeypatch.setenv("LLM_HTTP2", "false")
+    config = llm_config_from_env("overflow")
+    assert (config.backend, config.read_timeout_s, config.http2, config.max_retries) == ("http", 9.0, False, 1)
+    assert isinstance(create_llm_client("overflow"), HttpLLM)
+    monkeypatch.setenv("LLM_OVERFLOW_BATCH_MAX_ITEMS", "16")
+    assert isinstance(create_llm_client("overflow"), BatchingLLM)
+    assert not isinstance(create_llm_client("standard"), BatchingLLM)
+
+    monkeypatch.setenv("LLM_BACKEND", "gpu")
+    with pytest.raises(ValueError):
+        create_llm_client("overflow")
+
+
+async def test_batching_groups_concurrent_calls_into_batch_requests(mock_backend):
+    transport = httpx.ASGITransport(app=mock_llm.app)
+    llm = BatchingLLM(_http_llm(transport, batch_max_items=8, batch_max_wait_s=0.05, batch_max_inflight=1))
+    await llm.start()
+    calls_before, items_before = mock_backend.calls, mock_backend.batched_items
+    try:
+        results = await asyncio.gather(*(llm.complete(f"hi {i}", max_tokens=2 + i % 3) for i in range(20)))
+    finally:
+        await llm.aclose()
+
+    assert [r.tokens for r in results] == [2 + i % 3 for i in range(20)]
+    assert mock_backend.calls - calls_before == 3  # 8 + 8 + 4
+    assert mock_backend.batched_items - items_before == 20
+
+
+async def test_batching_backpressure_and_batch_failures():
+    release = asyncio.Event()
+
+    class SlowBackend(StubLLM):
+        async def complete_batch(self, items):
+            await release.wait()
+            if any(item.prompt == "boom" for item in items):
+                raise LLMError(self.config.pool, "status_503", retryable=True)
+            return await super().complete_batch(items)
+
+    config = LLMConfig(
+        pool="overflow",
+        stub_latency_s=(0.0, 0.0),
+        batch_max_items=2,
+        batch_max_wait_s=0.0,
+        batch_max_inflight=1,
+        batch_max_queue=2,
+        batch_enqueue_timeout_s=0.01,
+    )
+    llm = BatchingLLM(SlowBackend(config))
+    await llm.start()
+    try:
+        # One call at the backend, two queued behind it: the queue is full, so the next call is rejected.
+        first = asyncio.create_task(llm.complete("boom"))
+        await asyncio.sleep(0.01)
+        queued = [asyncio.create_task(llm.complete(f"q{i}")) for i in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(LLMError) as e:
+            await llm.complete("late")
+        assert e.value.reason == "batch_queue_full" and llm.rejected == 1
+
+        release.set()
+        with pytest.raises(LLMError):
+            await first
+        assert [c.text for c in await asyncio.gather(*queued)] == [llm.inner.reply] * 2
+    finally:
+        await llm.aclose()
+
+
+def test_parse_latency_specs():
+    rng = random.Random(0)
+    assert parse_latency("fixed:40")(rng) == 0.04
+    assert 0.01 <= parse_latency("uniform:10,20")(rng) <= 0.02
+    assert parse_latency("lognormal:60,0")(rng) == pytest.approx(0.06)
+    assert parse_latency("exponential:5")(rng) > 0
+    for bad in ("fixed", "uniform:20,10", "lognormal:x,1", "gamma:1"):
+        with pytest.raises(ValueError):
+            parse_latency(bad)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import math
+import random
+import time
+
+import httpx
+
+from scripts.loadgen import (
+    DEFAULT_MIX,
+    Histogram,
+    Request,
+    TierStats,
+    arrivals,
+    classify,
+    run_schedule,
+    send,
+    synthetic_requests,
+)
+
+
+def test_histogram_percentiles_within_bucket_precision():
+    rng = random.Random(7)
+    values = sorted(rng.expovariate(1 / 0.05) for _ in range(20_000))
+    h = Histogram()
+    for v in values:
+        h.record(v)
+
+    for p in (0.5, 0.9, 0.99, 0.999):
+        exact_ms = values[math.ceil(p * len(values)) - 1] * 1000
+        assert abs(h.percentile_ms(p) - exact_ms) <= exact_ms / 128 + 0.001
+    assert h.percentile_ms(1.0) == h.max_us / 1000
+
+    # Merging equals recording everything in one histogram, also through JSON.
+    a, b = Histogram(), Histogram()
+    for i, v in enumerate(values):
+        (a if i % 2 else b).record(v)
+    a.merge(Histogram.from_dict(b.to_dict()))
+    assert a.counts == h.counts and a.count == h.count and (a.min_us, a.max_us) == (h.min_us, h.max_us)
+
+
+def test_arrivals_match_the_rate():
+    constant = list(arrivals(100, 2.0, kind="constant", rng=random.Random(1)))
+    assert len(constant) == 200
+    assert all(0 <= t < 2.0 for t in constant)
+
+    poisson = list(arrivals(1000, 5.0, kind="poisson", rng=random.Random(1)))
+    assert 4700 < len(poisson) < 5300
+    assert poisson == sorted(poisson)
+
+
+def test_classify_outcomes():
+    assert classify(200, {"degraded": False}) == "ok"
+    assert classify(200, {"degraded": True}) == "shed"
+    assert classify(200, {"rate_limited": True, "silent": True}) == "rate_limited"
+    assert classify(200, {"blocked": True}) == "blocked"
+    assert classify(503, {}) == "error"
+
+
+async def test_schedule_sends_the_offered_load_and_counts_outcomes():
+    async def handler(request: httpx.Request) -> httpx.Response:
+        tier = request.read().decode()
+        return httpx.Response(200, json={"degraded": '"free"' in tier, "rate_limited": '"premium"' in tier})
+
+    mix = {"free": 0.5, "premium": 0.25, "enterprise": 0.25}
+    requests = synthetic_requests(400, 0.25, mix, kind="constant", users=5, rng=random.Random(3))
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+        step = await run_schedule(client, requests, rate_rps=400, duration_s=0.25)
+
+    assert step.tiers["free"].outcomes["shed"] == 50
+    assert step.tiers["premium"].outcomes["rate_limited"] == 25
+    assert step.tiers["enterprise"].outcomes["ok"] == 25
+    total = step.total()
+    assert total.sent == total.latency.count == 100
+    # Latency runs from the intended send time, so it is never below the service time.
+    assert total.latency.max_us >= total.service.max_us
+    assert set(DEFAULT_MIX) == set(step.tiers)
+
+
+async def test_malformed_json_body_counts_as_error():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=b"{not json", headers={"content-type": "application/json"})
+
+    stats = TierStats()
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+        await send(client, Request(0.0, "free", "u", "hi"), time.perf_counter(), stats, timeout_s=1.0)
+
+    assert stats.outcomes["error"] == 1
+    assert stats.sent == stats.latency.count == 1
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import logging
+import random
+
+import pytest
+
+from services.common import request_context
+from services.common.logging import SamplingConfig, SamplingFilter
+from services.common.request_context import RequestContext, set_request_context
+
+
+@pytest.fixture(autouse=True)
+def _reset_request_context():
+    # Tests set the context directly; don't leak it into later tests on this thread.
+    token = request_context._ctx_var.set(None)
+    yield
+    request_context._ctx_var.reset(token)
+
+
+def _record(name: str, level: int = logging.INFO, msg: str = "routed") -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, msg, None, None)
+
+
+def test_warnings_and_errors_are_never_sampled_out():
+    f = SamplingFilter(SamplingConfig(default_rate=0.0, per_key_rate_s=0.001, per_key_burst=1))
+    for _ in range(100):
+        assert f.filter(_record("router.http", logging.WARNING, "slow_request")) is True
+        assert f.filter(_record("router", logging.ERROR, "boom")) is True
+    assert f.suppressed == {}
+
+
+def test_logger_rate_applies_to_children_and_counts_suppressed():
+    set_request_context(RequestContext(correlation_id="c", service="router", tier="free"))
+    f = SamplingFilter(SamplingConfig(logger_rates={"router": 0.1}), rng=random.Random(7))
+
+    kept = sum(f.filter(_record("router")) for _ in range(1000))
+    assert 50 < kept < 150
+    assert f.suppressed["router"]["sampled"] == 1000 - kept
+
+    # Child loggers inherit the parent's rate; unrelated loggers keep the default.
+    assert f._logger_rate("router.http") == 0.1
+    assert f._logger_rate("worker-standard") == 1.0
+
+
+def test_enterprise_tier_kept_at_full_rate():
+    f = SamplingFilter(
+        SamplingConfig(default_rate=0.0, tier_rates={"enterprise": 1.0}, per_key_rate_s=0.001, per_key_burst=1)
+    )
+    set_request_context(RequestContext(correlation_id="c", service="router", tier="enterprise"))
+    assert all(f.filter(_record("router")) for _ in range(50))
+
+    set_request_context(RequestContext(correlation_id="c", service="router", tier="free"))
+    assert not any(f.filter(_record("router")) for _ in range(50))
+    assert f.suppressed["router"]["sampled"] == 50
+
+
+def test_per_key_token_bucket_limits_each_message_independently():
+    set_request_context(RequestContext(correlation_id="c", service="worker-overflow", tier="free"))
+    f = SamplingFilter(SamplingConfig(per_key_rate_s=0.001, per_key_burst=3))
+
+    assert [f.filter(_record("worker-overflow", msg="processed")) for _ in range(5)] == [True] * 3 + [False] * 2
+    # A different key has its own bucket.
+    assert f.filter(_record("worker-overflow", msg="startup")) is True
+    assert f.suppressed["worker-overflow"] == {"sampled": 0, "rate_limited": 2}
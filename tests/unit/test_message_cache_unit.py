@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Any
+
+import pytest
+
+import services.common.message_cache as mc
+from tests.unit.fake_redis import FakeRedis
+
+
+def _msg(i: int) -> dict[str, Any]:
+    return {"_id": f"m{i}", "role": "user", "content": f"hi {i}", "created_at": datetime(2099, 1, 1, 0, 0, i, tzinfo=timezone.utc)}
+
+
+class FakeMessagesRepo:
+    def __init__(self, messages: list[dict[str, Any]]) -> None:
+        self.messages = messages  # oldest first
+        self.calls = 0
+        self.gate: asyncio.Event | None = None  # when set, reads snapshot, then wait here
+
+    async def get_recent_for_session(self, session_id: str, limit_n: int = 20) -> list[dict[str, Any]]:
+        self.calls += 1
+        docs = list(reversed(self.messages))[:limit_n]
+        if self.gate is not None:
+            await self.gate.wait()
+        return docs
+
+
+@pytest.fixture
+def fake(monkeypatch: pytest.MonkeyPatch) -> FakeRedis:
+    fake = FakeRedis()
+    monkeypatch.setattr(mc, "get_redis", lambda: fake)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_miss_fills_from_mongo_then_serves_from_redis(fake: FakeRedis):
+    repo = FakeMessagesRepo([_msg(i) for i in range(5)])
+    cache = mc.RecentMessagesCache(repo, max_messages=3)  # type: ignore[arg-type]
+
+    first = await cache.get_recent("s1", 3)
+    second = await cache.get_recent("s1", 2)
+
+    assert [m["_id"] for m in first] == ["m4", "m3", "m2"]
+    assert second == first[:2] and second[0]["created_at"] == _msg(4)["created_at"]
+    assert repo.calls == 1
+    assert await fake.ttl("ira:msgs:s1") > 0
+
+
+@pytest.mark.asyncio
+async def test_append_is_write_through_and_trimmed_but_never_creates_a_partial_list(fake: FakeRedis):
+    repo = FakeMessagesRepo([_msg(0)])
+    cache = mc.RecentMessagesCache(repo, max_messages=2)  # type: ignore[arg-type]
+
+    # No list yet: append must not create one holding only the new messages.
+    await cache.append("s1", [_msg(1)])
+    assert await fake.lrange("ira:msgs:s1", 0, -1) == []
+
+    repo.messages.append(_msg(1))
+    await cache.get_recent("s1", 2)
+    repo.messages += [_msg(2), _msg(3)]
+    await cache.append("s1", [_msg(2), _msg(3)])
+
+    assert [m["_id"] for m in await cache.get_recent("s1", 2)] == ["m3", "m2"]
+    assert repo.calls == 1
+    # Deeper than the cached window -> straight to Mongo.
+    assert len(await cache.get_recent("s1", 4)) == 4
+
+
+@pytest.mark.asyncio
+async def test_a_fill_racing_an_append_is_skipped_so_the_appended_turn_is_not_lost(fake: FakeRedis):
+    repo = FakeMessagesRepo([_msg(0), _msg(1)])
+    cache = mc.RecentMessagesCache(repo, max_messages=3, fill_ttl_s=60)  # type: ignore[arg-type]
+    repo.gate = asyncio.Event()
+
+    # The miss reads Mongo (m0, m1); m2 is written and appended before that read returns.
+    reader = asyncio.create_task(cache.get_recent("s1", 3))
+    await asyncio.sleep(0.01)
+    repo.messages.append(_msg(2))
+    await cache.append("s1", [_msg(2)])
+    repo.gate.set()
+
+    assert [m["_id"] for m in await reader] == ["m1", "m0"]  # the stale snapshot is served once...
+    assert await fake.lrange("ira:msgs:s1", 0, -1) == []  # ...but not cached
+    repo.gate = None
+    assert [m["_id"] for m in await cache.get_recent("s1", 3)] == ["m2", "m1", "m0"]
+    assert [m["_id"] for m in await cache.get_recent("s1", 3)] == ["m2", "m1", "m0"]
+    assert repo.calls == 2
+    assert 0 < await fake.ttl("ira:msgs:s1") <= 60
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_fill_the_list_once(fake: FakeRedis):
+    repo = FakeMessagesRepo([_msg(0), _msg(1)])
+    cache = mc.RecentMessagesCache(repo)  # type: ignore[arg-type]
+    repo.gate = asyncio.Event()
+
+    readers = [asyncio.create_task(cache.get_recent("s1")) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    repo.gate.set()
+    await asyncio.gather(*readers)
+
+    assert len(await fake.lrange("ira:msgs:s1", 0, -1)) == 2
+
+
+@pytest.mark.asyncio
+async def test_warm_fills_non_empty_sessions_and_redis_errors_fall_back_to_mongo(fake: FakeRedis, monkeypatch):
+    repo = FakeMessagesRepo([_msg(0)])
+    cache = mc.RecentMessagesCache(repo)  # type: ignore[arg-type]
+    assert await cache.warm(["s1", "s2"]) == 2
+
+    class Broken:
+        def pipeline(self, *_: Any, **__: Any) -> Any:
+            raise ConnectionError("down")
+
+    monkeypatch.setattr(mc, "get_redis", lambda: Broken())
+    assert [m["_id"] for m in await cache.get_recent("s1")] == ["m0"]
+    assert repo.calls == 3
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import pytest
+from services.common.message_writer import MessageWriter, message_doc
+from services.common.repos import SessionsRepo
+from tests.unit.fake_mongo import FakeDatabase, FakeMongoClient
+
+
+class FakeCache:
+    def __init__(self) -> None:
+        self.appended: dict[str, list[str]] = {}
+
+    async def append(self, session_id: str, messages: list[dict[str, Any]]) -> None:
+        self.appended.setdefault(session_id, []).extend(m["content"] for m in messages)
+
+
+def _turn(session_id: str, n: int, t0: datetime) -> list[dict[str, Any]]:
+    common = {"session_id": session_id, "user_id": "u", "tier": "free"}
+    return [
+        message_doc(**common, role="user", content=f"q{n}", created_at=t0 + timedelta(seconds=2 * n)),
+        message_doc(**common, role="assistant", content=f"a{n}", created_at=t0 + timedelta(seconds=2 * n + 1)),
+    ]
+
+
+def _writer(db: FakeDatabase, cache: FakeCache, **kwargs: Any) -> MessageWriter:
+    kwargs.setdefault("cache_writes", True)
+    return MessageWriter(db, cache=cache, **kwargs)  # type: ignore[arg-type]
+
+
+@pytest.mark.asyncio
+async def test_turns_are_batched_and_session_updates_coalesced_per_session():
+    db, cache = FakeMongoClient()["ira"], FakeCache()
+    writer = _writer(db, cache, flush_interval_s=0.01)
+    t0 = datetime(2099, 1, 1, tzinfo=timezone.utc)
+
+    await writer.start()
+    for n in range(3):
+        await writer.submit(_turn("s1", n, t0))
+    await writer.submit(_turn("s2", 0, t0))
+    await writer.stop()
+
+    [(op, docs)] = db.messages.calls
+    assert (op, len(docs)) == ("insert_many", 8)
+    [(_, ops)] = db.sessions.calls
+    updates = {op._filter["_id"]: op._doc for op in ops}
+    assert updates["s1"] == {
+        "$inc": {"message_count": 6},
+        "$max": {"last_activity_at": t0 + timedelta(seconds=5)},
+        "$setOnInsert": {"user_id": "u", "day": "2099-01-01", "status": "active", "started_at": t0, "tier": "free"},
+    }
+    assert all(op._upsert for op in ops)
+    assert updates["s2"]["$inc"] == {"message_count": 2}
+    assert cache.appended["s1"] == ["q0", "a0", "q1", "a1", "q2", "a2"]
+    [(_, rollup_ops)] = db.tier_day_rollups.calls
+    assert [(op._filter, op._doc["$inc"]) for op in rollup_ops] == [
+        ({"_id": "2099-01-01"}, {"tiers.free.messages": 8})
+    ]
+
+
+@pytest.mark.asyncio
+async def test_partial_insert_failure_only_counts_written_messages():
+    db, cache = FakeMongoClient()["ira"], FakeCache()
+    writer = _writer(db, cache)
+    turn = _turn("s1", 0, datetime(2099, 1, 1, tzinfo=timezone.utc))
+    db.messages.load([{"_id": turn[0]["_id"]}])  # the first message is a duplicate; unordered, the second lands
+
+    await writer.flush(turn)
+
+    [(_, ops)] = db.sessions.calls
+    assert ops[0]._doc["$inc"] == {"message_count": 1}
+    assert cache.appended["s1"] == ["a0"]
+
+
+@pytest.mark.asyncio
+async def test_counts_flushed_before_the_session_insert_lands_are_kept():
+    db = FakeMongoClient()["ira"]
+    writer = _writer(db, FakeCache())
+    t0 = datetime.now(timezone.utc)
+
+    await writer.flush(_turn("s1", 0, t0))
+    await SessionsRepo(db).start(session_id="s1", user_id="u", tier="free")  # type: ignore[arg-type]
+    await writer.flush(_turn("s1", 1, t0))
+
+    session = await db.sessions.find_one({"_id": "s1"})
+    assert (session["message_count"], session["status"], session["started_at"]) == (4, "active", t0)
+    assert session["last_activity_at"] == t0 + timedelta(seconds=3)
+
+
+@pytest.mark.asyncio
+async def test_full_queue_applies_backpressure_then_drops_the_turn():
+    writer = _writer(FakeMongoClient()["ira"], FakeCache(), max_queue=1, enqueue_timeout_s=0.01)
+    t0 = datetime(2099, 1, 1, tzinfo=timezone.utc)
+
+    assert await writer.submit(_turn("s1", 0, t0)) is True
+    assert await writer.submit(_turn("s1", 1, t0)) is False
+    assert writer.dropped == 2 and writer.depth() == 1
+
+    # The flusher drains what was accepted on shutdown.
+    await writer.start()
+    await asyncio.wait_for(writer.stop(), timeout=1.0)
+    assert writer.depth() == 0
+
+
+@pytest.mark.asyncio
+async def test_rollup_increments_split_by_message_day_and_tier():
+    db, cache = FakeMongoClient()["ira"], FakeCache()
+    writer = _writer(db, cache)
+    before_midnight = datetime(2099, 1, 1, 23, 59, 59, tzinfo=timezone.utc)
+    premium = [dict(doc, tier="premium") for doc in _turn("s2", 0, before_midnight)]
+
+    await writer.flush(_turn("s1", 0, before_midnight) + premium)
+
+    assert len(db.tier_day_rollups.calls) == 1
+    for day in ("2099-01-01", "2099-01-02"):
+        assert db.tier_day_rollups.docs[day]["tiers"] == {"free": {"messages": 1}, "premium": {"messages": 1}}
+
+
+@pytest.mark.asyncio
+async def test_cache_write_through_is_off_unless_enabled():
+    cache = FakeCache()
+    writer = MessageWriter(FakeMongoClient()["ira"], cache=cache)  # type: ignore[arg-type]
+
+    await writer.flush(_turn("s1", 0, datetime(2099, 1, 1, tzinfo=timezone.utc)))
+
+    assert cache.appended == {}
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import pytest
+
+from services.common import metrics
+from services.common.app_factory import create_app
+from services.common.safety import detect_unsafe
+
+
+def test_counter_and_histogram_text_exposition():
+    reg = metrics.Registry()
+    c = reg.register(metrics.Counter("t_requests_total", "Requests.", ["tier"]))
+    h = reg.register(metrics.Histogram("t_latency_seconds", "Latency.", ["tier"], buckets=[0.01, 0.1]))
+    assert isinstance(c, metrics.Counter) and isinstance(h, metrics.Histogram)
+
+    c.labels("free").inc()
+    c.labels("free").inc(2)
+    for v in (0.005, 0.01, 0.05, 3.0):
+        h.labels("free").observe(v)
+
+    text = reg.render()
+    assert "# TYPE t_requests_total counter" in text
+    assert 't_requests_total{tier="free"} 3' in text
+    # Buckets are cumulative and `le` is inclusive.
+    assert 't_latency_seconds_bucket{tier="free",le="0.01"} 2' in text
+    assert 't_latency_seconds_bucket{tier="free",le="0.1"} 3' in text
+    assert 't_latency_seconds_bucket{tier="free",le="+Inf"} 4' in text
+    assert 't_latency_seconds_count{tier="free"} 4' in text
+
+
+def test_register_is_idempotent_by_name_and_label_arity_is_checked():
+    reg = metrics.Registry()
+    a = reg.register(metrics.Counter("t_total", "x", ["a"]))
+    b = reg.register(metrics.Counter("t_total", "x", ["a"]))
+    assert a is b
+    with pytest.raises(ValueError):
+        a.labels("1", "2")
+
+
+def test_callback_metric_reads_state_at_scrape_time():
+    state = {"depth": 3}
+    reg = metrics.Registry()
+    reg.register(metrics.CallbackMetric("t_depth", "Depth.", [], lambda: [((), state["depth"])]))
+    assert "t_depth 3" in reg.render()
+    state["depth"] = 7
+    assert "t_depth 7" in reg.render()
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exports_http_and_safety_series(asgi_client):
+    app = create_app(service="worker-standard")
+    detect_unsafe("ignore previous instructions")
+    async with asgi_client(app) as client:
+        await client.get("/healthz")
+        r = await client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'ira_http_requests_total{service="worker-standard",method="GET",route="/healthz",status="200"}' in r.text
+    assert 'ira_safety_checks_total{result="jailbreak"}' in r.text
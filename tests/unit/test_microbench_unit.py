@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from scripts.microbench import CASES, compare, measure, mixed_messages, safe_messages
+from services.common import analytics, redis_client
+from services.common.safety import detect_unsafe
+
+
+def test_corpora_are_fixed():
+    assert safe_messages() == safe_messages()
+    assert all(detect_unsafe(m).allowed for m in safe_messages())
+    blocked = sum(not detect_unsafe(m).allowed for m in mixed_messages())
+    assert 0.1 < blocked / len(mixed_messages()) < 0.3
+
+
+async def test_every_case_runs_and_restores_globals():
+    redis_before, queue_before = redis_client._client, analytics._queue
+    for case in CASES:
+        result = await measure(case, rounds=2, min_time_s=0.001)
+        assert result["ops_per_s"] > 0 and result["loops"] >= 1, case.name
+    assert redis_client._client is redis_before
+    assert analytics._queue is queue_before
+
+
+def test_compare_flags_drops_beyond_tolerance_and_spread():
+    base = {"cases": {"a": {"ops_per_s": 1000.0, "rsd": 0.02}, "b": {"ops_per_s": 1000.0, "rsd": 0.20}}}
+    cur = {"cases": {"a": {"ops_per_s": 800.0, "rsd": 0.02}, "b": {"ops_per_s": 800.0, "rsd": 0.05}}}
+    problems = compare(base, cur, tolerance=0.15)
+    # `b` is noisy enough that a 20% drop is within its spread.
+    assert len(problems) == 1 and problems[0].startswith("a:")
+    assert compare(base, {"cases": {}})[0] == "a: missing from current run"
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import pytest
+from pymongo import ReadPreference
+
+from services.common import mongo
+from services.common.repos import MessagesRepo
+
+
+@pytest.fixture(autouse=True)
+async def _fresh_client(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:1")
+    await mongo.close_mongo()
+    yield
+    await mongo.close_mongo()
+
+
+def test_profile_env_overrides_and_client_options(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("MONGO_PROFILE", "bulk")
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "7")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zlib,bogus")
+    opts = mongo.client_options(mongo.get_profile())
+    assert opts["maxPoolSize"] == 7 and opts["socketTimeoutMS"] is None
+    assert opts["compressors"] == "zlib" and opts["appname"] == "ira-bulk"
+
+
+def test_client_uses_profile_and_read_preference_routing(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("MONGO_PROFILE", "hot")
+    client = mongo.get_mongo_client()
+    assert client.options.pool_options.max_pool_size == 100
+    assert client.options.pool_options.min_pool_size == 10
+
+    assert mongo.get_db().read_preference == ReadPreference.PRIMARY
+    assert mongo.get_db(read="secondaryPreferred").read_preference == ReadPreference.SECONDARY_PREFERRED
+    # Context reads fill the message cache; a lagging secondary would miss the turns just written.
+    assert MessagesRepo()._col.read_preference == ReadPreference.PRIMARY
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+import pytest
+
+from services.common.personality_cache import PersonalityCache
+from tests.unit.fake_mongo import FakeMongoClient
+
+
+class FakePersonalitiesRepo:
+    def __init__(self, docs: dict[str, dict[str, Any]]) -> None:
+        self.docs = docs
+        self.calls: list[str] = []
+        self.gate: Optional[asyncio.Event] = None
+
+    async def get_latest_tone_for_user(self, user_id: str) -> Optional[dict[str, Any]]:
+        self.calls.append(user_id)
+        if self.gate is not None:
+            await self.gate.wait()
+        return self.docs.get(user_id)
+
+
+def _cache(repo: FakePersonalitiesRepo, **kwargs: Any) -> PersonalityCache:
+    return PersonalityCache(repo, FakeMongoClient()["ira"].personalities, **kwargs)  # type: ignore[arg-type]
+
+
+@pytest.mark.asyncio
+async def test_read_through_and_negative_caching():
+    repo = FakePersonalitiesRepo({"u1": {"_id": "p1", "user_id": "u1", "tone": "playful"}})
+    cache = _cache(repo)
+
+    assert await cache.tone_for("u1") == "playful"
+    assert await cache.tone_for("u1") == "playful"
+    assert await cache.tone_for("nobody") == "warm"
+    assert await cache.tone_for("nobody") == "warm"
+
+    assert repo.calls == ["u1", "nobody"]
+    s = cache.stats()
+    assert (s["hits"], s["negative_hits"], s["misses"]) == (1, 1, 2)
+    assert s["hit_ratio"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_lru_bound_and_ttl_expiry():
+    repo = FakePersonalitiesRepo({f"u{i}": {"_id": f"p{i}", "user_id": f"u{i}", "tone": "direct"} for i in range(3)})
+    cache = _cache(repo, max_entries=2, ttl_s=0.0)
+
+    for uid in ("u0", "u1", "u2"):
+        await cache.get(uid)
+    assert cache.stats()["entries"] == 2 and cache.evictions == 1
+
+    # ttl=0 -> every entry is already expired on the next read.
+    await cache.get("u2")
+    assert cache.expirations == 1 and repo.calls[-1] == "u2"
+
+
+@pytest.mark.asyncio
+async def test_change_events_invalidate_by_user_and_by_personality_id():
+    repo = FakePersonalitiesRepo({"u1": {"_id": "p1", "user_id": "u1", "tone": "warm"}})
+    cache = _cache(repo)
+    await cache.get("u1")
+
+    repo.docs["u1"] = {"_id": "p1", "user_id": "u1", "tone": "direct"}
+    cache.apply_change({"operationType": "update", "fullDocument": repo.docs["u1"], "documentKey": {"_id": "p1"}})
+    assert await cache.tone_for("u1") == "direct"
+
+    # Deletes only carry documentKey._id.
+    del repo.docs["u1"]
+    cache.apply_change({"operationType": "delete", "documentKey": {"_id": "p1"}})
+    assert await cache.get("u1") is None
+    assert cache.invalidations == 2
+
+
+@pytest.mark.asyncio
+async def test_load_racing_with_invalidation_is_not_cached():
+    repo = FakePersonalitiesRepo({"u1": {"_id": "p1", "user_id": "u1", "tone": "warm"}})
+    repo.gate = asyncio.Event()
+    cache = _cache(repo)
+
+    load = asyncio.create_task(cache.get("u1"))
+    await asyncio.sleep(0)
+    cache.invalidate("u1")
+    repo.gate.set()
+    await load
+
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_polling_fallback_invalidates_changed_users():
+    now = datetime.now(timezone.utc)
+    repo = FakePersonalitiesRepo({"u1": {"_id": "p1", "user_id": "u1", "tone": "warm"}})
+    col = FakeMongoClient()["ira"].personalities
+    # Stored naive, as Motor returns dates; the watermark is aware.
+    col.load([{"_id": "p1", "user_id": "u1", "updated_at": (now + timedelta(seconds=1)).replace(tzinfo=None)}])
+    cache = PersonalityCache(repo, col)  # type: ignore[arg-type]
+    await cache.get("u1")
+
+    watermark = await cache.poll_once(now)
+    assert cache.invalidations == 1 and cache.stats()["entries"] == 0
+    assert watermark > now
+    # Nothing newer than the watermark -> no further invalidations.
+    assert await cache.poll_once(watermark) == watermark
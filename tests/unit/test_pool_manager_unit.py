@@ -5,6 +5,7 @@ import asyncio
 import httpx
 import pytest
 
+from services.common.request_context import RequestContext, set_request_context
 from services.router.app.pools import PoolConfig, PoolManager, PoolOverloaded
 
 
@@ -50,3 +51,23 @@ async def test_latency_ewma_updates():
     assert mgr.state["overflow"].ewma_latency_ms > 0
     await mgr.aclose()
 
+
+
+@pytest.mark.asyncio
+async def test_call_process_records_queue_upstream_and_worker_stages():
+    mgr = PoolManager([PoolConfig(name="overflow", base_url="http://test", max_concurrency=1)])  # type: ignore[list-item]
+    mgr._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(
+            lambda req: httpx.Response(
+                200, json={"reply": "ok"}, headers={"Server-Timing": "safety;dur=0.05, llm;dur=12.5, total;dur=13"}
+            )
+        )
+    )
+    ctx = RequestContext(correlation_id="c", service="router")
+    set_request_context(ctx)
+
+    await mgr.call_process(pool="overflow", payload={"x": 1})
+    stages = ctx.timings.as_dict()
+    assert set(stages) == {"queue", "upstream", "worker-safety", "worker-llm"}
+    assert stages["worker-llm"] == 12.5
+    await mgr.aclose()
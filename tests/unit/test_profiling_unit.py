@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from services.common import profiling
+from services.common.app_factory import create_app
+
+
+@pytest.mark.asyncio
+async def test_profile_route_absent_when_disabled(monkeypatch: pytest.MonkeyPatch, asgi_client):
+    monkeypatch.delenv("PROFILING_ENABLED", raising=False)
+    async with asgi_client(create_app(service="worker-overflow")) as client:
+        r = await client.post("/debug/profile", params={"seconds": 0.1})
+    assert r.status_code == 404
+
+
+def test_profiling_enabled_without_token_fails_startup(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("PROFILING_ENABLED", "true")
+    monkeypatch.delenv("PROFILING_TOKEN", raising=False)
+    with pytest.raises(ValueError, match="PROFILING_TOKEN"):
+        create_app(service="worker-overflow")
+
+
+def _block_loop(ms: float) -> None:
+    end = time.perf_counter() + ms / 1000.0
+    while time.perf_counter() < end:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_sample_profile_reports_collapsed_stacks_and_slow_callbacks():
+    async def blocker() -> None:
+        await asyncio.sleep(0.05)
+        _block_loop(120)
+
+    task = asyncio.create_task(blocker())
+    result = await profiling.run_profile(seconds=0.4, interval_ms=2, slow_callback_ms=60)
+    await task
+
+    assert result["samples"] > 0
+    assert "_block_loop" in result["collapsed"]
+    assert result["loop_lag"]["max_ms"] >= 60
+    [slow] = result["slow_callbacks"]
+    assert slow["stack"] is not None and slow["stack"].endswith("test_profiling_unit:_block_loop")
+
+
+@pytest.mark.asyncio
+async def test_profile_endpoint_requires_token_and_supports_cprofile(monkeypatch: pytest.MonkeyPatch, asgi_client):
+    monkeypatch.setenv("PROFILING_ENABLED", "true")
+    monkeypatch.setenv("PROFILING_TOKEN", "s3cret")
+    app = create_app(service="worker-overflow")
+    async with asgi_client(app) as client:
+        denied = await client.post("/debug/profile", params={"seconds": 0.1})
+        r = await client.post(
+            "/debug/profile", params={"seconds": 0.1, "mode": "cprofile"}, headers={"X-Admin-Token": "s3cret"}
+        )
+    assert denied.status_code == 403
+    assert r.status_code == 200
+    body = r.json()
+    assert body["mode"] == "cprofile" and "cumulative" in body["top"]
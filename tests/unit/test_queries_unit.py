@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from typing import Any
+
+from scripts.queries import CASES, compare, docs_examined, is_covered, percentile, plan_stages
+
+
+def test_plan_helpers_read_find_and_aggregate_explains():
+    covered_find = {
+        "queryPlanner": {
+            "winningPlan": {"stage": "LIMIT", "inputStage": {"stage": "PROJECTION_COVERED", "inputStage": {"stage": "IXSCAN"}}}
+        },
+        "executionStats": {"totalDocsExamined": 0, "totalKeysExamined": 1},
+    }
+    assert plan_stages(covered_find) == ["LIMIT", "PROJECTION_COVERED", "IXSCAN"]
+    assert docs_examined(covered_find) == 0
+
+    # Aggregates nest the plan under `$cursor`; SBE plans nest it under `queryPlan`.
+    fetching_agg = {
+        "stages": [
+            {
+                "$cursor": {
+                    "queryPlanner": {"winningPlan": {"queryPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}},
+                    "executionStats": {"totalDocsExamined": 3},
+                }
+            },
+            {"$group": {}},
+        ]
+    }
+    assert plan_stages(fetching_agg) == ["FETCH", "IXSCAN"]
+    assert docs_examined(fetching_agg) == 3
+    assert not is_covered(plan_stages(fetching_agg), docs_examined(fetching_agg))
+
+    # The latest-tone $sort + $group answered from the index.
+    distinct_agg = {
+        "stages": [
+            {
+                "$cursor": {
+                    "queryPlanner": {"winningPlan": {"stage": "PROJECTION_COVERED", "inputStage": {"stage": "DISTINCT_SCAN"}}},
+                    "executionStats": {"totalDocsExamined": 0, "totalKeysExamined": 2},
+                }
+            },
+            {"$group": {}},
+        ]
+    }
+    assert is_covered(plan_stages(distinct_agg), docs_examined(distinct_agg))
+    assert is_covered(plan_stages(covered_find), docs_examined(covered_find))
+    assert not is_covered(["IXSCAN"], 0)  # no covered stage: nothing says the keys were enough
+
+
+def _result(stages: list[str], *, docs: int = 0, p95: float = 2.0, p99: float = 3.0, covered: bool = True) -> dict:
+    return {
+        "latency_ms": {"p50": 1.0, "p95": p95, "p99": p99},
+        "explain": {"stages": stages, "indexes": ["user_day_status_startedAt"], "keys_examined": 1, "docs_examined": docs, "covered": covered},
+    }
+
+
+def test_compare_flags_plan_examined_and_latency_regressions_only():
+    base = {"cases": {"sessions.get_active_for_user_today": _result(["PROJECTION_COVERED", "IXSCAN"])}}
+
+    same = {"cases": {"sessions.get_active_for_user_today": _result(["PROJECTION_COVERED", "IXSCAN"], p95=2.4, p99=3.5)}}
+    assert compare(base, same) == []
+
+    worse = {"cases": {"sessions.get_active_for_user_today": _result(["FETCH", "IXSCAN"], docs=1, p99=9.0, covered=False)}}
+    problems = compare(base, worse)
+    assert any("plan changed" in p for p in problems)
+    assert any("docs_examined 0 -> 1" in p for p in problems)
+    assert any("no longer covered" in p for p in problems)
+    assert any(p.endswith("p99 3.00ms -> 9.00ms") for p in problems)
+
+    assert compare(base, {"cases": {}}) == ["sessions.get_active_for_user_today: missing from current run"]
+
+
+def test_percentile_uses_nearest_rank_on_sorted_values():
+    values = [float(v) for v in range(1, 101)]
+    assert (percentile(values, 0.5), percentile(values, 0.99), percentile([], 0.5)) == (51.0, 99.0, 0.0)
+
+
+class RecordingDb:
+    def __init__(self) -> None:
+        self.commands: list[dict[str, Any]] = []
+
+    async def command(self, cmd: dict[str, Any]) -> dict[str, Any]:
+        self.commands.append(cmd)
+        return {}
+
+
+async def test_explains_use_the_query_shapes_the_repos_send():
+    db = RecordingDb()
+    explained = {}
+    for case in CASES:
+        await case.explain(db, "k")  # type: ignore[arg-type]
+        explained[case.name] = db.commands[-1]["explain"]
+
+    # Batched lookups: the `$in` find / aggregation their BatchLoader sends, not a single-key find.
+    assert explained["users.get_by_id"] == {"find": "users", "filter": {"_id": {"$in": ["k"]}}}
+    assert explained["personalities.get_latest_for_user"]["pipeline"][0] == {"$match": {"user_id": {"$in": ["k"]}}}
+    assert explained["personalities.get_latest_tone_for_user"]["aggregate"] == "personalities"
+    assert explained["messages.get_recent_for_session"]["sort"] == {"created_at": -1}
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+import gc
+
+import pytest
+
+from services.common.repos import BatchLoader, PersonalitiesRepo, SessionsRepo, SingleFlight, UsersRepo
+from tests.unit.fake_mongo import FakeMongoClient
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_are_coalesced_and_batched_into_one_query():
+    db = FakeMongoClient(latency_s=0.01)["ira"]
+    db.users.load([{"_id": "u1"}, {"_id": "u2"}])
+    repo = UsersRepo(db)  # type: ignore[arg-type]
+
+    results = await asyncio.gather(*(repo.get_by_id(uid) for uid in ("u1", "u1", "u1", "u2", "missing")))
+
+    assert [r and r["_id"] for r in results] == ["u1", "u1", "u1", "u2", None]
+    assert db.users.calls == [("find", {"_id": {"$in": ["u1", "u2", "missing"]}})]
+    assert len(repo._flight) == 0
+
+    # Nothing is cached once the flight lands.
+    await repo.get_by_id("u1")
+    assert len(db.users.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_personalities_batch_returns_latest_per_user():
+    db = FakeMongoClient()["ira"]
+    db.personalities.load(
+        [
+            {"_id": "p1", "user_id": "u1", "tone": "warm", "updated_at": 1},
+            {"_id": "p2", "user_id": "u1", "tone": "direct", "updated_at": 2},
+            {"_id": "p3", "user_id": "u2", "tone": "playful", "updated_at": 1},
+        ]
+    )
+    repo = PersonalitiesRepo(db)  # type: ignore[arg-type]
+
+    a, b = await asyncio.gather(repo.get_latest_for_user("u1"), repo.get_latest_for_user("u2"))
+    assert (a["tone"], b["tone"]) == ("direct", "playful")
+    assert [op for op, _ in db.personalities.calls] == ["aggregate"]
+
+
+@pytest.mark.asyncio
+async def test_session_lookups_coalesce_per_repo_only():
+    client = FakeMongoClient(latency_s=0.01)
+    repo, other = SessionsRepo(client["a"]), SessionsRepo(client["b"])  # type: ignore[arg-type]
+
+    await asyncio.gather(*(repo.get_active_for_user_today("u1") for _ in range(3)), other.get_active_for_user_today("u1"))
+
+    assert len(client["a"].sessions.calls) == 1 and len(client["b"].sessions.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_repos_on_a_new_client_do_not_reuse_loaders_bound_to_the_old_one():
+    old, new = FakeMongoClient(), FakeMongoClient()
+    await old["ira"].users.insert_one({"_id": "u1", "tier": "free"})
+    await new["ira"].users.insert_one({"_id": "u1", "tier": "premium"})
+
+    assert (await UsersRepo(old["ira"]).get_by_id("u1"))["tier"] == "free"
+    # Same database name, different client (e.g. after close_mongo() and a reconnect).
+    assert (await UsersRepo(new["ira"]).get_by_id("u1"))["tier"] == "premium"
+    assert (await PersonalitiesRepo(new["ira"]).get_latest_for_user("u1")) is None
+
+
+@pytest.mark.asyncio
+async def test_batch_loader_splits_at_max_batch_and_fails_whole_batch():
+    seen: list[list[int]] = []
+
+    async def load_many(keys: list[int]) -> dict[int, int]:
+        seen.append(keys)
+        if 99 in keys:
+            raise RuntimeError("boom")
+        return {k: k * 10 for k in keys}
+
+    loader: BatchLoader[int, int] = BatchLoader("test", load_many, max_batch=2)
+    assert await asyncio.gather(*(loader.load(k) for k in (1, 2, 3))) == [10, 20, 30]
+    assert seen == [[1, 2], [3]] and loader.batches == 2
+
+    results = await asyncio.gather(loader.load(4), loader.load(99), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_waiters_and_cancelled_waiter_does_not_cancel_load():
+    flight = SingleFlight("test")
+    gate = asyncio.Event()
+    loads = 0
+
+    async def load() -> str:
+        nonlocal loads
+        loads += 1
+        await gate.wait()
+        raise RuntimeError("boom")
+
+    first = asyncio.create_task(flight.do("k", load))
+    second = asyncio.create_task(flight.do("k", load))
+    await asyncio.sleep(0)
+    first.cancel()
+    gate.set()
+
+    with pytest.raises(RuntimeError):
+        await second
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert loads == 1 and len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_in_flight_batches_and_loads_are_held_until_done():
+    gate = asyncio.Event()
+
+    async def load_many(keys: list[int]) -> dict[int, int]:
+        await gate.wait()
+        return {k: k for k in keys}
+
+    loader: BatchLoader[int, int] = BatchLoader("test", load_many)
+    flight = SingleFlight("test")
+    pending = asyncio.gather(loader.load(1), flight.do("k", lambda: loader.load(2)))
+    await asyncio.sleep(0.01)
+    assert len(loader._tasks) >= 1 and len(flight._tasks) == 1
+
+    gc.collect()  # the loop holds tasks weakly; an unreferenced batch would be collected here
+    gate.set()
+    assert await pending == [1, 2]
+    assert len(loader._tasks) == 0 and len(flight._tasks) == 0
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from services.common import rollups
+from tests.unit.fake_mongo import FakeMongoClient
+
+
+def test_backfill_pipeline_merges_whole_days_by_id():
+    pipeline = rollups.backfill_pipeline("2026-01-01", "2026-01-02")
+
+    assert pipeline[0] == {"$match": {"day": {"$gte": "2026-01-01", "$lte": "2026-01-02"}}}
+    assert pipeline[-1] == {
+        "$merge": {"into": rollups.COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}
+    }
+
+
+@pytest.mark.asyncio
+async def test_backfill_rebuilds_days_and_read_days_returns_them():
+    db = FakeMongoClient()["ira"]
+    db.sessions.load(
+        [
+            {"_id": "a", "day": "2026-01-01", "tier": "free", "message_count": 4},
+            {"_id": "b", "day": "2026-01-01", "tier": "free", "message_count": 2},
+            {"_id": "c", "day": "2026-01-01", "tier": "premium"},
+            {"_id": "d", "day": "2026-01-02", "tier": "premium", "message_count": 6},
+            {"_id": "e", "day": "2026-01-03", "tier": "free", "message_count": 1},
+        ]
+    )
+    # A stale day is replaced, not merged into; days outside the range are untouched.
+    db[rollups.COLLECTION].load(
+        [
+            {"_id": "2026-01-01", "tiers": {"enterprise": {"sessions": 9, "messages": 9}}},
+            {"_id": "2025-12-31", "tiers": {"free": {"sessions": 1, "messages": 1}}},
+        ]
+    )
+
+    await rollups.backfill(db, "2026-01-01", "2026-01-02")
+    days = await rollups.read_days(db, "2026-01-01", "2026-01-02")
+
+    assert [d["_id"] for d in days] == ["2026-01-01", "2026-01-02"]
+    assert days[0]["tiers"] == {"free": {"sessions": 2, "messages": 6}, "premium": {"sessions": 1, "messages": 0}}
+    assert days[1]["tiers"] == {"premium": {"sessions": 1, "messages": 6}}
+    assert all(isinstance(d["updated_at"], datetime) for d in days)
+    assert [d["_id"] for d in await rollups.read_days(db, "2025-12-31")] == ["2025-12-31"]
+    [(op, pipeline)] = db.sessions.calls
+    assert op == "aggregate" and "$merge" in pipeline[-1]
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from services.seeder.app.engine import Keys, SeedPlan, active_session_keys_pipeline, day_key, shard_batches
+
+
+NOW = datetime(2099, 1, 31, 12, tzinfo=timezone.utc)
+
+
+def _plan(**kwargs) -> SeedPlan:
+    base = dict(users=500, personalities=400, sessions=600, messages=900, batch_size=64, shard_size=200, now=NOW)
+    base.update(kwargs)
+    return SeedPlan(**base)
+
+
+def _docs(plan: SeedPlan, collection: str) -> list[dict]:
+    return [doc for shard in plan.shards(collection) for batch in shard_batches(plan, shard) for doc in batch]
+
+
+def test_shards_are_deterministic_and_independent_of_order():
+    plan = _plan()
+    shards = plan.shards("messages")
+    forward = [doc for s in shards for b in shard_batches(plan, s) for doc in b]
+    backward = [doc for s in reversed(shards) for b in shard_batches(plan, s) for doc in b]
+
+    assert sorted(forward, key=lambda d: d["_id"]) == sorted(backward, key=lambda d: d["_id"])
+    assert [len(b) for b in shard_batches(plan, shards[0])] == [64, 64, 64, 8]
+    assert len({d["_id"] for d in forward}) == 900
+
+
+def test_links_resolve_without_id_lists():
+    plan = _plan()
+    users = {d["_id"]: d for d in _docs(plan, "users")}
+    sessions = {d["_id"]: d for d in _docs(plan, "sessions")}
+
+    # Sessions are capped at one per user and each user has at most one.
+    assert len(sessions) == 500
+    assert len({s["user_id"] for s in sessions.values()}) == 500
+    assert all(s["tier"] == users[s["user_id"]]["tier"] for s in sessions.values())
+    assert {p["user_id"] for p in _docs(plan, "personalities")} <= users.keys()
+    for m in _docs(plan, "messages"):
+        session = sessions[m["session_id"]]
+        assert m["user_id"] == session["user_id"] and m["tier"] == session["tier"]
+    today = [s for s in sessions.values() if s["day"] == day_key(NOW)]
+    assert today and all(s["status"] == "active" for s in today)
+
+
+def test_ids_and_tiers_depend_only_on_seed():
+    a, b = Keys(_plan()), Keys(_plan(messages=10))
+    assert a.id("users", 7) == b.id("users", 7) != Keys(_plan(seed=1)).id("users", 7)
+    assert [a.tier_of_user(u) for u in range(100)] == [b.tier_of_user(u) for u in range(100)]
+
+
+def test_active_session_keys_are_merged_into_existing_users_only():
+    match, project, merge = active_session_keys_pipeline("2099-01-31")
+    assert match == {"$match": {"day": "2099-01-31"}}
+    assert project["$project"]["_id"] == "$user_id"
+    assert merge["$merge"] == {"into": "users", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}
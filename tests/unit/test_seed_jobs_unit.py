@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+from datetime import datetime, timezone
+
+import pytest
+
+from services.seeder.app import jobs as jobs_mod
+from services.seeder.app.engine import SeedPlan, SeedReport, ShardResult
+from services.seeder.app.jobs import JobConflict, SeedJobs
+
+
+NOW = datetime(2099, 1, 31, 12, tzinfo=timezone.utc)
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+
+class FakeJobsCol:
+    """The subset of motor used by SeedJobs; datetimes come back naive, like from Mongo."""
+
+    def __init__(self):
+        self.docs: dict[str, dict] = {}
+        self.fail_writes = False
+
+    def _matches(self, doc, flt):
+        for key, cond in flt.items():
+            if isinstance(cond, dict) and "$in" in cond:
+                if doc.get(key) not in cond["$in"]:
+                    return False
+            elif doc.get(key) != cond:
+                return False
+        return True
+
+    async def _write(self):
+        await asyncio.sleep(0)  # yields like a round trip, so concurrent requests interleave
+        if self.fail_writes:
+            raise ConnectionError("mongo down")
+
+    async def insert_one(self, doc):
+        await self._write()
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+
+    async def update_one(self, flt, update):
+        await self._write()
+        doc = self.docs[flt["_id"]]
+        for path, value in update.get("$set", {}).items():
+            doc[path] = value
+        for path, value in update.get("$addToSet", {}).items():
+            field, key = path.split(".")
+            values = doc[field].setdefault(key, [])
+            if value not in values:
+                values.append(value)
+        for path, value in update.get("$inc", {}).items():
+            field, key = path.split(".")
+            doc[field][key] = doc[field].get(key, 0) + value
+
+    async def update_many(self, flt, update):
+        for doc in self.docs.values():
+            if self._matches(doc, flt):
+                doc.update(update["$set"])
+
+    def _naive(self, doc):
+        doc = copy.deepcopy(doc)
+        doc["created_at"] = doc["created_at"].replace(tzinfo=None)
+        doc["plan"]["now"] = doc["plan"]["now"].replace(tzinfo=None)
+        return doc
+
+    async def find_one(self, flt, sort=None):
+        found = [d for d in self.docs.values() if self._matches(d, flt)]
+        return self._naive(found[0]) if found else None
+
+    def find(self, flt, projection=None, sort=None, limit=0):
+        return _Cursor([self._naive(d) for d in self.docs.values() if self._matches(d, flt)])
+
+
+def _plan() -> SeedPlan:
+    return SeedPlan(users=300, personalities=0, sessions=0, messages=0, shard_size=100, now=NOW)
+
+
+@pytest.fixture
+def fake_seed(monkeypatch):
+    """Completes shards one at a time through `on_shard`; `gate` pauses it after the first shard."""
+    calls: list[dict] = []
+    gate = asyncio.Event()
+
+    async def seed(plan, *, skip, on_shard, **kwargs):
+        calls.append({"skip": {c: set(v) for c, v in skip.items()}, **kwargs})
+        for shard in plan.shards("users"):
+            if shard.index in skip["users"]:
+                continue
+            n = shard.stop - shard.start
+            await on_shard(ShardResult("users", shard.index, n, n, 0.0, 0.0))
+            await gate.wait()
+        return SeedReport(phases={"load": 1.0})
+
+    monkeypatch.setattr(jobs_mod, "seed", seed)
+    return calls, gate
+
+
+async def test_cancelled_job_resumes_from_checkpoint(fake_seed):
+    calls, gate = fake_seed
+    col = FakeJobsCol()
+    jobs = SeedJobs(col, max_processes=2)
+
+    job = await jobs.start(_plan(), db_name="ira_test", processes=8, defer_indexes=True, drop=True)
+    while not col.docs[job.id]["done"]["users"]:  # first shard checkpointed; the gate holds the second
+        await asyncio.sleep(0)
+    with pytest.raises(JobConflict):
+        await jobs.start(_plan(), db_name="ira_test", processes=1, defer_indexes=True, drop=False)
+
+    await jobs.cancel(job.id)
+    stored = col.docs[job.id]
+    assert stored["status"] == "cancelled"
+    assert stored["done"]["users"] == [0]
+    assert stored["inserted"]["users"] == 100
+    assert calls[0]["processes"] == 2 and calls[0]["drop"] is True
+
+    # A fresh service instance (restart) resumes from the stored checkpoint, without dropping.
+    gate.set()
+    jobs = SeedJobs(col, max_processes=2)
+    resumed = await jobs.resume(job.id)
+    await asyncio.gather(*jobs._tasks.values())
+
+    assert calls[1]["skip"]["users"] == {0}
+    assert calls[1]["drop"] is False
+    view = resumed.view()
+    assert view["status"] == "completed"
+    assert view["docs_inserted"] == view["docs_target"] == 300
+    assert view["collections"]["users"]["shards_done"] == 3
+    assert col.docs[job.id]["status"] == "completed"
+
+
+async def test_recover_marks_running_jobs_interrupted(fake_seed):
+    _, gate = fake_seed
+    gate.set()
+    col = FakeJobsCol()
+    first = SeedJobs(col)
+    job_id = (await first.start(_plan(), db_name="ira_test", processes=1, defer_indexes=False, drop=False)).id
+    await asyncio.gather(*first._tasks.values())
+    col.docs[job_id]["status"] = "running"  # as if the service died mid-run
+
+    jobs = SeedJobs(col)
+    await jobs.recover()
+
+    assert (await jobs.get(job_id)).status == "interrupted"
+
+
+async def test_concurrent_starts_and_resumes_launch_one_job(fake_seed):
+    col = FakeJobsCol()
+    jobs = SeedJobs(col)
+
+    def start():
+        return jobs.start(_plan(), db_name="ira_test", processes=1, defer_indexes=False, drop=False)
+
+    results = await asyncio.gather(start(), start(), return_exceptions=True)
+    assert sum(isinstance(r, JobConflict) for r in results) == 1
+    assert len(jobs._tasks) == 1 and len(col.docs) == 1
+    [job] = [r for r in results if not isinstance(r, Exception)]
+    await jobs.cancel(job.id)
+
+    jobs = SeedJobs(col)
+    results = await asyncio.gather(jobs.resume(job.id), jobs.resume(job.id), return_exceptions=True)
+    assert sum(isinstance(r, JobConflict) for r in results) == 1
+    assert len(jobs._tasks) == 1
+    await jobs.stop()
+
+
+async def test_failed_insert_releases_the_running_slot(fake_seed):
+    _, gate = fake_seed
+    gate.set()
+    col = FakeJobsCol()
+    jobs = SeedJobs(col)
+
+    col.fail_writes = True
+    with pytest.raises(ConnectionError):
+        await jobs.start(_plan(), db_name="ira_test", processes=1, defer_indexes=False, drop=False)
+    assert jobs._jobs == {} and col.docs == {}
+
+    col.fail_writes = False
+    job = await jobs.start(_plan(), db_name="ira_test", processes=1, defer_indexes=False, drop=False)
+    await asyncio.gather(*jobs._tasks.values())
+    assert col.docs[job.id]["status"] == "completed"
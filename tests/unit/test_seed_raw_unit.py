@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import bson
+
+from services.seeder.app.engine import Keys, SeedPlan
+from services.seeder.app.raw import columnar_batches, export_shard, raw_batches, read_export
+
+
+NOW = datetime(2099, 1, 31, 12, tzinfo=timezone.utc)
+
+
+def _plan() -> SeedPlan:
+    return SeedPlan(users=400, personalities=400, sessions=300, messages=700, batch_size=128, shard_size=250, now=NOW)
+
+
+def _docs(plan: SeedPlan, collection: str) -> list[dict]:
+    return [doc for shard in plan.shards(collection) for batch in columnar_batches(plan, shard) for doc in batch]
+
+
+def test_columnar_docs_share_ids_links_and_tiers_with_the_dict_path():
+    plan = _plan()
+    keys = Keys(plan)
+    users = {d["_id"]: d for d in _docs(plan, "users")}
+    sessions = {d["_id"]: d for d in _docs(plan, "sessions")}
+
+    assert [d["tier"] for d in users.values()] == [keys.tier_of_user(u) for u in range(400)]
+    assert all(s["tier"] == users[s["user_id"]]["tier"] for s in sessions.values())
+    for m in _docs(plan, "messages"):
+        assert m["user_id"] == sessions[m["session_id"]]["user_id"]
+        assert 0 < len(m["content"]) <= 221
+    today = [s for s in sessions.values() if s["status"] == "active"]
+    assert today and {s["day"] for s in today} == {"2099-01-31"}
+
+
+def test_raw_batches_are_the_encoded_columnar_batches():
+    plan = _plan()
+    shard = plan.shards("sessions")[0]
+    raw = [doc for batch in raw_batches(plan, shard) for doc in batch]
+    columnar = [doc for batch in columnar_batches(plan, shard) for doc in batch]
+
+    assert [doc.raw for doc in raw] == [bson.encode(doc) for doc in columnar]
+
+
+def test_export_writes_mongoimport_json_lines(tmp_path):
+    plan = _plan()
+    shard = plan.shards("messages")[1]
+
+    assert export_shard(plan, shard, str(tmp_path)) == 250
+    exported = list(read_export(str(tmp_path / "messages" / "00001.json")))
+    expected = [doc for batch in columnar_batches(plan, shard) for doc in batch]
+    assert [d["_id"] for d in exported] == [d["_id"] for d in expected]
+    assert exported[0]["created_at"] == expected[0]["created_at"].as_datetime()
+    assert not list(tmp_path.rglob("*.tmp"))
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Optional
+
+import pytest
+
+import services.common.session_index as si
+from tests.unit.fake_redis import FakeRedis
+
+
+class FakeSessionsRepo:
+    def __init__(self, existing: Optional[dict[str, Any]] = None) -> None:
+        self.existing = existing
+        self.lookups = 0
+        self.started: list[str] = []
+        self.fallbacks = 0
+
+    async def get_active_for_user_today(self, user_id: str) -> Optional[dict[str, Any]]:
+        self.lookups += 1
+        await asyncio.sleep(0)  # let concurrent resolvers interleave
+        return self.existing
+
+    async def start(self, *, session_id: str, user_id: str, tier: str) -> dict[str, Any]:
+        self.started.append(session_id)
+        return {"_id": session_id}
+
+    async def get_or_start_for_user_today(self, *, user_id: str, tier: str) -> tuple[dict[str, Any], bool]:
+        self.fallbacks += 1
+        return {"_id": "from-mongo"}, False
+
+
+@pytest.fixture
+def fake(monkeypatch: pytest.MonkeyPatch) -> FakeRedis:
+    fake = FakeRedis()
+    monkeypatch.setattr(si, "get_redis", lambda: fake)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_existing_mongo_session_is_indexed_then_served_from_redis(fake: FakeRedis):
+    repo = FakeSessionsRepo({"_id": "s-existing"})
+    index = si.ActiveSessionIndex(repo)  # type: ignore[arg-type]
+
+    first = await index.get_or_start(user_id="u1", tier="free")
+    second = await index.get_or_start(user_id="u1", tier="free")
+
+    assert first == second == si.ActiveSession(session_id="s-existing", created=False)
+    assert repo.lookups == 1 and repo.started == []
+
+
+@pytest.mark.asyncio
+async def test_concurrent_first_messages_start_exactly_one_session(fake: FakeRedis):
+    repo = FakeSessionsRepo()
+    index = si.ActiveSessionIndex(repo)  # type: ignore[arg-type]
+
+    results = await asyncio.gather(*(index.get_or_start(user_id="u1", tier="free") for _ in range(5)))
+
+    assert len(repo.started) == 1
+    assert {r.session_id for r in results} == {repo.started[0]}
+    assert sum(r.created for r in results) == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_outage_falls_back_to_mongo_upsert(monkeypatch: pytest.MonkeyPatch):
+    class Broken:
+        async def get(self, key: str) -> None:
+            raise ConnectionError("down")
+
+    monkeypatch.setattr(si, "get_redis", lambda: Broken())
+    repo = FakeSessionsRepo()
+    res = await si.ActiveSessionIndex(repo).get_or_start(user_id="u1", tier="free")  # type: ignore[arg-type]
+    assert res.session_id == "from-mongo" and repo.fallbacks == 1
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from scripts.traces import read_trace, synth_records, to_requests, trace_stats, write_trace
+from services.seeder.app.engine import Keys, SeedPlan
+
+
+PLAN = SeedPlan(users=5_000, personalities=0, sessions=0, messages=0, seed=1337)
+
+
+def test_synth_users_are_seeded_users_with_skewed_activity():
+    records = list(synth_records(users=2_000, rate_rps=200, duration_s=30, plan=PLAN, seed=3))
+    assert records == list(synth_records(users=2_000, rate_rps=200, duration_s=30, plan=PLAN, seed=3))
+    assert 5_500 < len(records) < 6_500
+    assert [r["t"] for r in records] == sorted(r["t"] for r in records)
+
+    keys = Keys(PLAN)
+    seeded = {keys.id("users", u): keys.tier_of_user(u) for u in range(2_000)}
+    assert all(seeded[r["user_id"]] == r["tier"] for r in records)
+    assert all(20 <= r["chars"] <= 220 for r in records)
+
+    stats = trace_stats({"duration_s": 30}, iter(records))
+    # Pareto activity: the top 1% of senders carry far more than 1% of the traffic, and users repeat.
+    assert stats["top_1pct_user_share"] > 0.05
+    assert stats["users"] < len(records)
+
+
+def test_trace_round_trip_and_replay_requests(tmp_path):
+    path = str(tmp_path / "t.jsonl")
+    records = list(synth_records(users=100, rate_rps=50, duration_s=2, plan=PLAN, seed=1))
+    header = write_trace(path, iter(records), source="synth")
+    assert header["requests"] == len(records)
+
+    read_header, read_records = read_trace(path)
+    assert read_header == header
+    assert list(read_records) == records
+
+    requests = list(to_requests(iter(records), speed=2.0, user_suffix="-r1"))
+    assert [r.offset_s for r in requests] == [rec["t"] / 2.0 for rec in records]
+    assert all(r.user_id.endswith("-r1") and len(r.message) == rec["chars"] for r, rec in zip(requests, records))
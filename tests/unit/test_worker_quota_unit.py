@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+import services.common.rate_limit as rl
+from services.common.llm import BatchingLLM, LLMConfig, LLMError, StubLLM
+from services.router.app.tier_router import TierRouter
+from services.worker_overflow.app import main as overflow
+from services.worker_priority.app import main as priority
+from services.worker_standard.app import main as standard
+from tests.unit.fake_redis import FakeRedis
+
+
+WORKERS = {"priority": priority, "standard": standard, "overflow": overflow}
+
+
+class FailingLLM:
+    def __init__(self, pool: str) -> None:
+        self.pool = pool
+
+    async def complete(self, prompt: str, **_: Any) -> Any:
+        raise LLMError(self.pool, "status_503", retryable=True)
+
+
+class FakePersonalities:
+    async def tone_for(self, user_id: str) -> str:
+        return "warm"
+
+
+class WorkerPools:
+    """Routes `call_process` to the worker apps in-process (like PoolManager, minus admission)."""
+
+    def __init__(self, asgi_client: Any) -> None:
+        self.state = {pool: SimpleNamespace(healthy=True) for pool in WORKERS}
+        self.calls: list[str] = []
+        self._client = asgi_client
+
+    async def call_process(self, *, pool: str, payload: dict[str, Any], max_queue_wait_s: float = 0.0) -> Any:
+        self.calls.append(pool)
+        async with self._client(WORKERS[pool].app) as client:
+            return await client.post("/process", json=payload)
+
+
+@pytest.fixture
+def redis(monkeypatch: pytest.MonkeyPatch) -> FakeRedis:
+    fake = FakeRedis()
+    monkeypatch.setattr(rl, "get_redis", lambda: fake)
+
+    async def record_turn(*_: Any, **__: Any) -> None:
+        pass
+
+    for pool, module in WORKERS.items():
+        monkeypatch.setattr(module, "personalities", FakePersonalities())
+        monkeypatch.setattr(module, "record_turn", record_turn)
+        monkeypatch.setattr(module, "llm", StubLLM(LLMConfig(pool=pool, stub_latency_s=(0.0, 0.0))))
+    return fake
+
+
+async def _count(redis: FakeRedis, user_id: str) -> int:
+    return int(await redis.get(f"ira:rl:count:{rl._utc_day_key()}:{user_id}") or 0)
+
+
+async def _route(asgi_client: Any, user_id: str, tier: str) -> tuple[Any, WorkerPools]:
+    pools = WorkerPools(asgi_client)
+    payload = {"user_id": user_id, "message": "hello there", "tier": tier}
+    decision, _ = await TierRouter(pools).route_and_call(tier=tier, payload=payload)  # type: ignore[arg-type]
+    return decision, pools
+
+
+async def test_a_premium_message_falling_through_all_pools_is_counted_once(redis, asgi_client, monkeypatch):
+    monkeypatch.setattr(standard, "llm", FailingLLM("standard"))
+    monkeypatch.setattr(overflow, "llm", FailingLLM("overflow"))
+
+    decision, pools = await _route(asgi_client, "u1", "premium")
+
+    assert (decision.action, decision.pool, pools.calls) == ("forward", "priority", ["standard", "overflow", "priority"])
+    assert await _count(redis, "u1") == 1
+
+
+async def test_a_shed_message_is_not_counted(redis, asgi_client, monkeypatch):
+    for pool, module in WORKERS.items():
+        monkeypatch.setattr(module, "llm", FailingLLM(pool))
+
+    decision, pools = await _route(asgi_client, "u1", "premium")
+
+    assert decision.action == "shed" and len(pools.calls) == 3
+    assert await _count(redis, "u1") == 0
+    # Refunds never leave a key without an expiry behind.
+    assert await redis.ttl(f"ira:rl:count:{rl._utc_day_key()}:u1") > 0
+
+
+async def test_batched_overflow_rejections_and_batch_failures_are_not_counted(redis, asgi_client, monkeypatch):
+    release = asyncio.Event()
+
+    class SlowBackend(StubLLM):
+        fail = False
+
+        async def complete_batch(self, items):
+            await release.wait()
+            if self.fail:
+                raise LLMError(self.config.pool, "status_503", retryable=True)
+            return await super().complete_batch(items)
+
+    config = LLMConfig(
+        pool="overflow",
+        stub_latency_s=(0.0, 0.0),
+        batch_max_items=1,
+        batch_max_wait_s=0.0,
+        batch_max_inflight=1,
+        batch_max_queue=1,
+        batch_enqueue_timeout_s=0.01,
+    )
+    backend = SlowBackend(config)
+    llm = BatchingLLM(backend)
+    monkeypatch.setattr(overflow, "llm", llm)
+    await llm.start()
+    held: list[asyncio.Task] = []
+    try:
+        # One batch at the backend, one queued behind it: the next call finds the queue full.
+        held += [asyncio.create_task(llm.complete(f"held {i}")) for i in range(2)]
+        await asyncio.sleep(0.01)
+        decision, _ = await _route(asgi_client, "u1", "free")
+        assert (decision.action, llm.rejected) == ("shed", 1)
+        assert await _count(redis, "u1") == 0
+
+        release.set()
+        await asyncio.gather(*held)
+        backend.fail = True
+        decision, _ = await _route(asgi_client, "u1", "free")
+        assert decision.action == "shed"
+        assert await _count(redis, "u1") == 0
+    finally:
+        release.set()
+        await asyncio.gather(*held, return_exceptions=True)
+        await llm.aclose()